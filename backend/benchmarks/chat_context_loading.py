@@ -0,0 +1,66 @@
+"""
+Pre-LLM overhead of POST /api/chat: time from request start until the agent is called.
+
+The four context loaders (profile, daily log, recent meals, chat history) run
+against a fake Supabase client whose queries block for --db-latency seconds.
+Loaded concurrently, the overhead should be close to one query, not four.
+
+Usage (from backend/):
+    python -m benchmarks.chat_context_loading --db-latency 0.05 --samples 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeSupabase
+
+import httpx
+import main
+import services.supabase_client as supabase_client
+from routes import chat
+from services.auth import get_user_id
+from services.user_context import snapshot_cache
+
+
+async def _run(args) -> list:
+    overheads = []
+    started_at = {}
+
+    async def fake_chat_with_agent(on_result=None, **kwargs):
+        overheads.append((time.perf_counter() - started_at["t"]) * 1000)
+        result = {"response": "ok", "ui_cards": [], "actions_taken": []}
+        if on_result is not None:
+            await on_result(result)
+        return result
+
+    chat.chat_with_agent = fake_chat_with_agent
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for i in range(args.samples):
+            snapshot_cache.clear()  # Measure cold loads, not cached snapshots
+            started_at["t"] = time.perf_counter()
+            response = await client.post("/api/chat", json={"message": f"hello {i}"})
+            response.raise_for_status()
+    return overheads
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--db-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    supabase_client.supabase = FakeSupabase(latency=args.db_latency)
+    main.app.dependency_overrides[get_user_id] = lambda: "bench-user"
+
+    overheads = asyncio.run(_run(args))
+    print(f"query latency:        {args.db_latency * 1000:.1f} ms")
+    print(f"sequential estimate:  {args.db_latency * 4000:.1f} ms (4 loaders)")
+    print(f"pre-LLM overhead p50: {statistics.median(overheads):.1f} ms")
+    print(f"pre-LLM overhead max: {max(overheads):.1f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
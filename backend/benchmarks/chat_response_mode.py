@@ -0,0 +1,97 @@
+"""
+End-to-end latency of a tool turn on POST /api/chat under each CHAT_RESPONSE_MODE.
+
+The agent LLM is replaced by a fake that blocks for --llm-latency seconds per
+call and always asks for `log_water`; Supabase is faked with --db-latency.
+In `llm` mode every tool turn makes two LLM calls (pick the tool, then write
+the reply); `hybrid` and `template` render the reply from the water card, so
+the turn should take about one LLM call less.
+
+Usage (from backend/):
+    python -m benchmarks.chat_response_mode --llm-latency 0.8 --samples 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeSupabase
+
+import httpx
+from langchain_core.messages import AIMessage
+
+import main
+import services.agent_service as agent_service
+import services.supabase_client as supabase_client
+from config import settings
+from services.auth import get_user_id
+from services.response_templates import RESPONSE_MODES
+from services.user_context import snapshot_cache
+
+
+class FakeAgentLLM:
+    """Stands in for ChatGoogleGenerativeAI: tool call when tools are bound, text otherwise."""
+
+    def __init__(self, latency: float, stats: dict, with_tools: bool = False):
+        self.latency = latency
+        self.stats = stats
+        self.with_tools = with_tools
+
+    def bind_tools(self, tools):
+        return FakeAgentLLM(self.latency, self.stats, with_tools=True)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency)
+        self.stats["calls"] += 1
+        if self.with_tools:
+            return AIMessage(content="", tool_calls=[
+                {"name": "log_water", "args": {"amount_ml": 500}, "id": f"call-{self.stats['calls']}"}
+            ])
+        return AIMessage(content="Nice work - 500 ml of water logged. Keep sipping!")
+
+    async def astream(self, messages):
+        yield await self.ainvoke(messages)
+
+
+async def _run(args, mode: str) -> tuple:
+    settings.chat_response_mode = mode
+    stats = {"calls": 0}
+    agent_service.get_agent_llm = lambda: FakeAgentLLM(args.llm_latency, stats)
+    agent_service.get_agent_llm_with_tools = lambda: FakeAgentLLM(args.llm_latency, stats, with_tools=True)
+
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for i in range(args.samples):
+            snapshot_cache.clear()
+            started = time.perf_counter()
+            # Not a fast-path phrase, so the agent (and its LLM) handles it
+            response = await client.post("/api/chat", json={"message": f"log my bottle please #{i}"})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, stats["calls"] / args.samples
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--db-latency", type=float, default=0.03)
+    parser.add_argument("--modes", nargs="+", default=list(RESPONSE_MODES), choices=RESPONSE_MODES)
+    args = parser.parse_args()
+
+    supabase_client.supabase = FakeSupabase(latency=args.db_latency)
+    main.app.dependency_overrides[get_user_id] = lambda: "bench-user"
+
+    print(f"llm latency: {args.llm_latency * 1000:.0f} ms, db latency: {args.db_latency * 1000:.0f} ms")
+    for mode in args.modes:
+        latencies, calls_per_turn = asyncio.run(_run(args, mode))
+        print(
+            f"{mode:<9} p50 {statistics.median(latencies):7.1f} ms  "
+            f"max {max(latencies):7.1f} ms  llm calls/turn {calls_per_turn:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,118 @@
+"""
+p99 latency of GET /api/daily while POST /api/meals/analyze requests are in flight.
+
+Runs the real FastAPI app in-process against a fake Supabase client whose
+queries block for --db-latency seconds, and a fake Gemini call that awaits for
+--llm-latency seconds. Compares the thread-pool offload (`services.db`) with
+executing queries inline on the event loop, which is what the routes used to do.
+
+Usage (from backend/):
+    python -m benchmarks.daily_under_load --analyze-concurrency 8 --samples 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeSupabase
+
+import httpx
+import main
+import services.db as db
+import services.supabase_client as supabase_client
+from routes import meals
+from services.auth import get_user_id
+
+
+async def _fake_analyze_meal_image(image_data, user_profile=None, calories_consumed=0, llm_latency=0.5):
+    await asyncio.sleep(llm_latency)
+    return {
+        "food": "Dal rice",
+        "total_calories": 450,
+        "macros": {"p": 15, "c": 70, "f": 10},
+        "plate_grade": "B",
+        "reasoning": "Balanced",
+        "tasks": [{"name": "Walk", "calories_to_burn": 120, "duration_minutes": 25}],
+    }
+
+
+async def _inline_run_sync(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _run(mode: str, args) -> dict:
+    original_run_sync = db.run_sync
+    if mode == "inline":
+        db.run_sync = _inline_run_sync
+
+    transport = httpx.ASGITransport(app=main.app)
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def analyze_loop():
+            while not stop.is_set():
+                await client.post(
+                    "/api/meals/analyze",
+                    files={"file": ("meal.jpg", b"\xff\xd8bench", "image/jpeg")},
+                )
+
+        load = [asyncio.create_task(analyze_loop()) for _ in range(args.analyze_concurrency)]
+        await asyncio.sleep(args.warmup)
+
+        latencies = []
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            response = await client.get("/api/daily")
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+        stop.set()
+        await asyncio.gather(*load, return_exceptions=True)
+
+    db.run_sync = original_run_sync
+    return {
+        "mode": mode,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyze-concurrency", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--db-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--warmup", type=float, default=0.5)
+    parser.add_argument("--mode", choices=["both", "offload", "inline"], default="both")
+    args = parser.parse_args()
+
+    supabase_client.supabase = FakeSupabase(latency=args.db_latency)
+
+    async def fake_analyze(image_data, user_profile=None, calories_consumed=0, mime_type: str = "image/jpeg"):
+        return await _fake_analyze_meal_image(image_data, user_profile, calories_consumed, args.llm_latency)
+
+    meals.analyze_meal_image = fake_analyze
+    main.app.dependency_overrides[get_user_id] = lambda: "bench-user"
+
+    modes = ["offload", "inline"] if args.mode == "both" else [args.mode]
+    print(f"GET /api/daily under {args.analyze_concurrency} concurrent /api/meals/analyze "
+          f"(db latency {args.db_latency * 1000:.0f}ms, llm latency {args.llm_latency * 1000:.0f}ms)")
+    for mode in modes:
+        stats = asyncio.run(_run(mode, args))
+        print(f"  {stats['mode']:>8}: p50 {stats['p50_ms']:7.1f}ms  p95 {stats['p95_ms']:7.1f}ms  "
+              f"p99 {stats['p99_ms']:7.1f}ms  max {stats['max_ms']:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,79 @@
+"""
+Stand-ins for external services used by the benchmarks.
+
+FakeSupabase mimics the sync supabase-py query builder closely enough for the
+route handlers: every `.execute()` blocks the calling thread for `latency`
+seconds, like a real PostgREST round trip would.
+"""
+
+import os
+import time
+import uuid
+
+# config.Settings and supabase.create_client need these before `main` is imported
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.payload = None
+        self.is_single = False
+
+    def _chain(self, *args, **kwargs):
+        return self
+
+    select = eq = neq = gt = gte = lt = lte = order = limit = range = in_ = or_ = _chain
+
+    def insert(self, payload, **kwargs):
+        self.payload = payload
+        return self
+
+    update = upsert = insert
+
+    def delete(self, **kwargs):
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        self.client.calls += 1
+        if self.payload is not None:
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            return FakeResult([{"id": str(uuid.uuid4()), **row} for row in rows])
+        row = {
+            "id": str(uuid.uuid4()),
+            "calories_in": 0,
+            "calories_out": 0,
+            "water_ml": 0,
+            "steps": 0,
+            "active_minutes": 0,
+            "daily_calorie_target": 2000,
+            "daily_water_target": 2500,
+        }
+        return FakeResult(row if self.is_single else [row])
+
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> FakeQuery:
+        query = FakeQuery(self, name)
+        query.payload = params
+        return query
@@ -0,0 +1,77 @@
+"""
+Per-request LLM setup cost of a chat turn, before and after sharing clients.
+
+before: what every /api/chat request used to do - build a ChatGoogleGenerativeAI,
+        create the seven agent tools, and `bind_tools` them (schema conversion).
+after:  look up the process-wide clients (services/llm_clients.py) and bind
+        the requesting user's context for the tool calls.
+
+No API calls are made; only client construction and schema work is timed.
+
+Usage (from backend/):
+    python -m benchmarks.llm_client_setup --iterations 200
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+import benchmarks.fakes  # noqa: F401 - sets the env vars config needs
+
+from langchain_core.tools import StructuredTool
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from config import settings
+from services.agent_tools import TOOLS, bind_user_context
+from services.llm_clients import get_agent_llm, get_agent_llm_with_tools, warm_up
+
+# Same as main.py: schema conversion warns about every pydantic title
+logging.getLogger("langchain_google_genai").setLevel(logging.ERROR)
+
+
+def setup_before():
+    llm = ChatGoogleGenerativeAI(
+        model=settings.gemini_model,
+        google_api_key=settings.gemini_api_key,
+        temperature=0.7,
+    )
+    tools = [
+        StructuredTool.from_function(
+            coroutine=t.coroutine, name=t.name, description=t.description, args_schema=t.args_schema
+        )
+        for t in TOOLS
+    ]
+    return llm, llm.bind_tools(tools)
+
+
+def setup_after():
+    bind_user_context(None)
+    return get_agent_llm(), get_agent_llm_with_tools()
+
+
+def _time(fn, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    warm_up()
+    print(f"warm-up (once, at startup): {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    for name, fn in (("before", setup_before), ("after", setup_after)):
+        samples = _time(fn, args.iterations)
+        print(f"{name:<7} p50 {statistics.median(samples):8.3f} ms  max {max(samples):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
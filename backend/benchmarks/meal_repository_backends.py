@@ -0,0 +1,135 @@
+"""
+Meal logging and deletion per DATABASE_BACKEND: Supabase (PostgREST) vs direct Postgres.
+
+Each iteration logs a meal with two burn tasks and then deletes it, through
+the same repository the routes use. The Supabase backend runs on the fake
+client, whose every call blocks for --rest-latency seconds like a PostgREST
+round trip. The Postgres backend runs for real against --database-url (a
+scratch database: pending migrations are applied first and the benchmark
+rows are removed at the end), one transaction per operation.
+
+Usage (from backend/):
+    python -m benchmarks.meal_repository_backends --database-url postgresql://postgres@127.0.0.1:5432/postgres
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import date
+
+from benchmarks.fakes import FakeSupabase
+
+import services.supabase_client as supabase_client
+from config import settings
+from migrations.runner import apply_migrations
+from services import postgres
+from services.repositories import stores
+from services.repositories.meals import PostgresMealRepository, StepwiseMealRepository
+from services.repositories.stores import SupabaseStore
+
+
+def _meal(user_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "food_name": "Chicken rice bowl",
+        "image_description": "A bowl of rice topped with grilled chicken",
+        "ingredients": "rice, chicken, broccoli",
+        "calories": 650,
+        "macros": {"p": 40, "c": 70, "f": 18},
+        "plate_grade": "B",
+        "reasoning": "Balanced, slightly heavy on rice",
+        "source": "photo",
+    }
+
+
+def _tasks(meal: dict, log_date: str) -> list:
+    return [
+        {
+            "user_id": meal["user_id"],
+            "meal_id": meal["id"],
+            "task_type": task_type,
+            "name": name,
+            "description": "",
+            "duration_minutes": 30,
+            "calories_to_burn": 150,
+            "distance_km": None,
+            "steps": None,
+            "status": "pending",
+            "date": log_date,
+        }
+        for task_type, name in (("walking", "Brisk walk"), ("cycling", "Easy ride"))
+    ]
+
+
+async def _run(repository, args) -> dict:
+    timings = {"log_meal": [], "delete_meal": []}
+    log_date = date.today().isoformat()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int) -> None:
+        user_id = args.user_ids[i % len(args.user_ids)]
+        meal = _meal(user_id)
+        async with semaphore:
+            start = time.perf_counter()
+            await repository.log_meal(meal, _tasks(meal, log_date), log_date)
+            timings["log_meal"].append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await repository.delete_meal(user_id, meal["id"])
+            timings["delete_meal"].append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(args.iterations)))
+    return timings
+
+
+def _report(name: str, timings: dict, extra: str) -> None:
+    for operation, samples in timings.items():
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{name:9} {operation:12} p50 {statistics.median(samples):7.1f} ms   p95 {p95:7.1f} ms")
+    print(f"{name:9} {extra}")
+
+
+def _cleanup(cursor, user_ids: list) -> None:
+    cursor.execute("DELETE FROM burn_tasks WHERE user_id = ANY(%s::uuid[])", (user_ids,))
+    cursor.execute("DELETE FROM meal_history WHERE user_id = ANY(%s::uuid[])", (user_ids,))
+    cursor.execute("DELETE FROM daily_logs WHERE user_id = ANY(%s::uuid[])", (user_ids,))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--rest-latency", type=float, default=0.03)
+    parser.add_argument("--database-url", default=settings.database_url)
+    args = parser.parse_args()
+    args.user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+
+    fake = FakeSupabase(latency=args.rest_latency)
+    supabase_client.supabase = fake
+    stores.store = SupabaseStore()
+    timings = asyncio.run(_run(StepwiseMealRepository(), args))
+    _report("supabase", timings, f"{fake.calls / args.iterations:.1f} PostgREST calls per log+delete "
+                                 f"at {args.rest_latency * 1000:.0f} ms each (simulated)")
+
+    if not args.database_url:
+        print("postgres  skipped: pass --database-url (or set DATABASE_URL)")
+        return
+
+    settings.database_url = args.database_url
+    apply_migrations(args.database_url)
+    pool = postgres.get_pool()
+    try:
+        timings = asyncio.run(_run(PostgresMealRepository(), args))
+        _report("postgres", timings, f"2 transactions per log+delete, pool of {settings.database_pool_max}")
+    finally:
+        pool.run(lambda cursor: _cleanup(cursor, args.user_ids))
+        postgres.close_pool()
+
+
+if __name__ == "__main__":
+    main_cli()
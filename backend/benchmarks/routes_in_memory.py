@@ -0,0 +1,98 @@
+"""
+Latency of the database-backed endpoints against the in-memory repository backend.
+
+Every router runs in-process on `MemoryStore`, whose calls each take
+--db-latency seconds on the DB thread pool like a PostgREST round trip
+would. No Supabase project or Gemini key is needed, so this is a hermetic
+baseline for performance work on the routes themselves: p50/p95 per endpoint
+and the number of database calls it makes.
+
+Usage (from backend/):
+    python -m benchmarks.routes_in_memory --db-latency 0.02 --users 20 --rounds 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import benchmarks.fakes  # noqa: F401 - settings env
+
+import httpx
+import main
+from fastapi import Request
+from services.auth import get_user_id
+from services.repositories import stores
+from services.repositories.stores import MemoryStore
+
+ENDPOINTS = [
+    ("GET", "/api/profile", None),
+    ("PUT", "/api/profile", {"name": "Bench", "daily_calorie_target": 2100}),
+    ("GET", "/api/daily", None),
+    ("POST", "/api/daily/water?ml=250", None),
+    ("GET", "/api/meals/history", None),
+    ("GET", "/api/meals/tasks", None),
+    ("GET", "/api/chat/history", None),
+    ("GET", "/api/weekly/summary", None),
+    ("GET", "/api/google-fit/status", None),
+    ("POST", "/api/google-fit/sync", {"steps": 4200, "calories_burned": 180, "active_minutes": 35}),
+]
+
+
+def _name(method: str, path: str) -> str:
+    return f"{method} {path.split('?')[0]}"
+
+
+async def _run(args, store: MemoryStore) -> dict:
+    timings = {_name(method, path): [] for method, path, _ in ENDPOINTS}
+    calls = {}
+
+    async def one_user(client: httpx.AsyncClient, user_id: str) -> None:
+        headers = {"X-Bench-User": user_id}
+        for _ in range(args.rounds):
+            for method, path, body in ENDPOINTS:
+                start = time.perf_counter()
+                response = await client.request(method, path, json=body, headers=headers)
+                timings[_name(method, path)].append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+    # Each simulated user sends its own id in a header
+    def bench_user(request: Request) -> str:
+        return request.headers["X-Bench-User"]
+
+    main.app.dependency_overrides[get_user_id] = bench_user
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # Database calls per request, counted one request at a time (second round: rows exist)
+        headers = {"X-Bench-User": str(uuid.uuid4())}
+        for round_number in range(2):
+            for method, path, body in ENDPOINTS:
+                before = store.calls
+                (await client.request(method, path, json=body, headers=headers)).raise_for_status()
+                calls[_name(method, path)] = store.calls - before
+
+        await asyncio.gather(*(one_user(client, str(uuid.uuid4())) for _ in range(args.users)))
+
+    return {name: (sorted(values), calls[name]) for name, values in timings.items()}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    store = MemoryStore(latency_seconds=args.db_latency)
+    stores.store = store
+
+    results = asyncio.run(_run(args, store))
+    print(f"query latency: {args.db_latency * 1000:.1f} ms, {args.users} concurrent users")
+    for name, (values, calls_per_request) in results.items():
+        p95 = values[int(len(values) * 0.95) - 1]
+        print(f"{name:28} p50 {statistics.median(values):7.1f} ms   p95 {p95:7.1f} ms   db calls {calls_per_request}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -6,10 +6,77 @@ class Settings(BaseSettings):
     # Gemini AI
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.0-flash"  # Model name (can use gemini-2.0-flash, gemini-1.5-flash, etc.)
+    gemini_structured_output: bool = True  # JSON mode with a response schema for meal/menu/pantry analysis
+    gemini_json_repair: bool = True  # Fix unparseable analysis replies with a text-only call (no image re-sent)
     
+    # LLM scheduling (see services/llm_scheduler.py)
+    llm_max_concurrency: int = 8  # Gemini calls in flight per process
+    llm_queue_timeout_seconds: float = 10  # Longest wait for a slot before shedding with 503 (less if the request deadline is closer)
+    llm_max_queue_depth: int = 100  # Waiting calls before new ones are shed with 503
+    llm_max_queued_per_user: int = 4  # Waiting calls per user before shedding with 429
+    
+    # LLM resilience (see services/llm_resilience.py)
+    request_deadline_seconds: float = 30  # Time budget shared by all LLM calls of one request
+    llm_call_timeout_seconds: float = 20  # Cap per attempt
+    llm_max_retries: int = 2  # Extra attempts on timeouts and 429/5xx from Gemini
+    llm_retry_base_seconds: float = 0.5  # Backoff base; attempt n sleeps up to base * 2^n (full jitter)
+    llm_hedge_enabled: bool = False  # Duplicate idempotent calls still running after the p95 latency
+    llm_hedge_min_samples: int = 20  # Calls of a kind observed before hedging starts
+    llm_circuit_failure_threshold: int = 5  # Consecutive retryable failures that open the circuit
+    llm_circuit_cooldown_seconds: float = 30  # Fail fast this long before probing again
+    
+    # Background analysis jobs (see services/analysis_jobs.py)
+    job_queue_backend: str = "memory"  # memory (in-process) or database (analysis_jobs table on DATABASE_BACKEND, shared by all instances; "supabase" is an alias)
+    analysis_job_workers: int = 2  # Workers in the API process (0 = run `python worker.py` instead)
+    analysis_job_lease_seconds: float = 60  # A running job whose worker stops renewing this long is claimed again
+    analysis_job_max_attempts: int = 3  # Runs per job before it is marked failed
+    analysis_job_timeout_seconds: float = 90  # LLM time budget for one run of a job
+    analysis_job_poll_seconds: float = 1.0  # Idle poll interval for workers and job event streams
+    analysis_job_ttl_seconds: float = 24 * 3600  # How long finished jobs can still be fetched
+
     # Supabase
     supabase_url: str = ""
     supabase_service_key: str = ""
+    db_max_workers: int = 16  # Thread pool size for blocking Supabase calls
+    context_load_timeout_seconds: float = 3.0  # Per-loader cap on pre-LLM context queries before falling back
+    
+    # Database backend (see services/repositories; direct Postgres in services/postgres.py)
+    database_backend: str = "supabase"  # supabase (PostgREST over HTTPS), postgres (pooled connections, transactional writes) or memory (process-local, for benchmarks)
+    database_url: str = ""  # postgresql:// connection string (Supabase: Project Settings > Database)
+    database_pool_min: int = 1  # Connections opened up front
+    database_pool_max: int = 16  # Connection cap; keep at least DB_MAX_WORKERS
+    memory_db_latency_ms: float = 0  # Simulated round trip per call with DATABASE_BACKEND=memory
+
+    # Auth
+    supabase_jwt_secret: str = ""  # Project JWT secret - enables offline verification of HS256 tokens
+    auth_verification: str = "local"  # local (verify JWT in-process) or remote (ask Supabase auth per token)
+    auth_cache_size: int = 4096  # Verified tokens kept in memory until they expire (0 disables)
+    
+    # Image preprocessing before Gemini vision calls
+    image_max_edge: int = 1024  # Longest edge in pixels after downscaling
+    image_quality: int = 80  # Re-encode quality (1-95)
+    image_format: str = "JPEG"  # JPEG or WEBP
+    image_workers: int = 2  # Process pool size (0 = preprocess in a thread instead)
+    
+    # Chat
+    chat_history_limit: int = 50  # Messages kept per user; older ones are trimmed after each turn
+    agent_tool_timeout_seconds: float = 10  # Per-tool cap; a slow tool becomes an error card
+    chat_fast_path_enabled: bool = True  # Answer simple intents (log water, daily summary) without the LLM
+    chat_response_mode: str = "hybrid"  # Reply after tools: llm (always synthesize), template, or hybrid
+    chat_default_language: str = "en"  # Template language when Accept-Language has no supported match
+    chat_memory_max_turns: int = 5  # Recent user/assistant turns replayed into the prompt
+    chat_memory_token_budget: int = 1200  # Estimated-token cap on those turns
+    chat_summary_batch_messages: int = 6  # Older messages to collect before refreshing the rolling summary
+    chat_summary_max_words: int = 150
+    
+    # Caching
+    user_context_ttl_seconds: float = 30  # Cross-request cache of profile + today's daily log (0 disables)
+    llm_cache_backend: str = "memory"  # Gemini analysis results: memory, disk, database (llm_result_cache table on DATABASE_BACKEND; "supabase" is an alias) or none
+    llm_cache_ttl_seconds: float = 7 * 24 * 3600  # How long a cached analysis stays valid (0 disables)
+    llm_cache_max_entries: int = 2000  # Entry cap for the memory and database backends
+    llm_cache_dir: str = ".cache/llm"  # Directory for the disk backend
+    llm_cache_max_bytes: int = 256 * 1024 * 1024  # Size cap for the disk backend
+    idempotency_ttl_seconds: float = 24 * 3600  # How long responses are kept for Idempotency-Key replays
     
     # Google Fit (optional - for future integration)
     google_fit_client_id: Optional[str] = ""
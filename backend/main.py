@@ -1,5 +1,7 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import logging
 
 # Suppress noisy LangChain schema warnings
@@ -8,13 +10,35 @@ logging.getLogger("langchain_google_genai").setLevel(logging.ERROR)
 from config import settings
 from routes import profile, daily, meals, suggestions, chat, google_fit, weekly
 from routes import chat_actions
+from services.analysis_jobs import job_workers
+from services.image_processing import shutdown_image_pool
+from services.llm_clients import warm_up
+from services.postgres import close_pool
+from services.llm_scheduler import LLMOverloaded
+from services.llm_resilience import DeadlineMiddleware
+from services.metrics import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up()  # Build the shared Gemini clients before the first request
+    job_workers.start()  # Background meal analysis jobs (ANALYSIS_JOB_WORKERS)
+    yield
+    await job_workers.stop()
+    shutdown_image_pool()
+    close_pool()
+
 
 app = FastAPI(
     title="FitFlow AI API",
     description="AI-powered health and fitness tracking API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Time budget for each request's LLM calls (services/llm_resilience.py)
+app.add_middleware(DeadlineMiddleware)
+
 # CORS middleware - allow mobile app and local development
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +49,16 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """LLM work that was shed or failed: 429 (per-user limit), 503 (busy, provider down) or 504 (deadline), with Retry-After."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/")
 async def root():
     return {
@@ -39,6 +73,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Process-local counters (cache hit/miss rates etc.)."""
+    return metrics.snapshot()
+
+
 # Register API routes
 app.include_router(profile.router, prefix="/api/profile", tags=["profile"])
 app.include_router(daily.router, prefix="/api/daily", tags=["daily"])
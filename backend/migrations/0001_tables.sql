@@ -0,0 +1,178 @@
+-- Tables with the columns the backend reads and writes.
+--
+-- user_id columns carry no foreign key to profiles: rows are written for a
+-- user before GET /api/profile has created their profile (water, meals), and
+-- on Supabase profiles.id is tied to auth.users by the project itself. Row
+-- level security is enabled everywhere; the backend connects as the service
+-- role (or the table owner) and is not affected by it.
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id UUID PRIMARY KEY,
+    age INTEGER CHECK (age > 0 AND age < 150),
+    gender TEXT CHECK (gender IN ('male', 'female', 'other')),
+    weight DECIMAL(5,2) CHECK (weight > 0),
+    height DECIMAL(5,2) CHECK (height > 0),
+    medical_conditions TEXT[] DEFAULT '{}',
+    allergies TEXT[] DEFAULT '{}',
+    preferences TEXT[] DEFAULT '{}',
+    target_goal TEXT,
+    daily_calorie_target INTEGER DEFAULT 2000,
+    daily_water_target INTEGER DEFAULT 2500,
+    notification_enabled BOOLEAN DEFAULT true,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- One row per user and day: increment_daily_metrics and GET /api/daily
+-- upsert on (user_id, date) instead of reading first
+CREATE TABLE IF NOT EXISTS daily_logs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    date DATE NOT NULL,
+    calories_in INTEGER DEFAULT 0 CHECK (calories_in >= 0),
+    calories_out INTEGER DEFAULT 0 CHECK (calories_out >= 0),
+    water_ml INTEGER DEFAULT 0 CHECK (water_ml >= 0),
+    steps INTEGER DEFAULT 0 CHECK (steps >= 0),
+    active_minutes INTEGER DEFAULT 0,
+    google_fit_data JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT daily_logs_user_id_date_key UNIQUE (user_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS meal_history (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    food_name TEXT NOT NULL,
+    image_description TEXT,
+    ingredients TEXT,
+    calories INTEGER CHECK (calories >= 0),
+    macros JSONB NOT NULL DEFAULT '{"p": 0, "c": 0, "f": 0}',
+    plate_grade TEXT,
+    reasoning TEXT,
+    source TEXT DEFAULT 'photo',
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS burn_tasks (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    meal_id UUID REFERENCES meal_history(id) ON DELETE SET NULL,
+    task_type TEXT,
+    name TEXT NOT NULL,
+    description TEXT,
+    duration_minutes INTEGER,
+    calories_to_burn INTEGER,
+    distance_km DECIMAL(5,2),
+    steps INTEGER,
+    status TEXT DEFAULT 'pending',
+    date DATE,
+    completed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- AI-suggested items are upserted in bulk; duplicates are skipped on (user_id, item_name)
+CREATE TABLE IF NOT EXISTS grocery_items (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    item_name TEXT NOT NULL,
+    quantity TEXT,
+    category TEXT DEFAULT 'other',
+    suggested_by_ai BOOLEAN DEFAULT false,
+    recipe_context TEXT,
+    is_purchased BOOLEAN DEFAULT false,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT grocery_items_user_id_item_name_key UNIQUE (user_id, item_name)
+);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    role TEXT CHECK (role IN ('user', 'assistant', 'system')),
+    content TEXT NOT NULL,
+    metadata JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS chat_memory (
+    user_id UUID PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- One row per user; sync_data holds the recent sync snapshots
+CREATE TABLE IF NOT EXISTS google_fit_sync (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    sync_enabled BOOLEAN DEFAULT false,
+    last_sync_time TIMESTAMPTZ,
+    sync_data JSONB DEFAULT '[]',
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT google_fit_sync_user_id_key UNIQUE (user_id)
+);
+
+-- LLM_CACHE_BACKEND=supabase
+CREATE TABLE IF NOT EXISTS llm_result_cache (
+    key TEXT PRIMARY KEY,
+    value JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- JOB_QUEUE_BACKEND=supabase
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    input JSONB,
+    result JSONB,
+    error JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    available_at TIMESTAMPTZ DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION update_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER profiles_updated_at
+    BEFORE UPDATE ON profiles
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+CREATE OR REPLACE TRIGGER daily_logs_updated_at
+    BEFORE UPDATE ON daily_logs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+CREATE OR REPLACE TRIGGER chat_memory_updated_at
+    BEFORE UPDATE ON chat_memory
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+CREATE OR REPLACE TRIGGER google_fit_sync_updated_at
+    BEFORE UPDATE ON google_fit_sync
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+CREATE OR REPLACE TRIGGER analysis_jobs_updated_at
+    BEFORE UPDATE ON analysis_jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+ALTER TABLE profiles ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE meal_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE burn_tasks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE grocery_items ENABLE ROW LEVEL SECURITY;
+ALTER TABLE chat_messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE chat_memory ENABLE ROW LEVEL SECURITY;
+ALTER TABLE google_fit_sync ENABLE ROW LEVEL SECURITY;
+ALTER TABLE llm_result_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE analysis_jobs ENABLE ROW LEVEL SECURITY;
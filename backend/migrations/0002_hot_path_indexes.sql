@@ -0,0 +1,29 @@
+-- Indexes for the queries the routes run on every request. The unique
+-- constraints in 0001 already cover daily_logs (user_id, date),
+-- google_fit_sync (user_id) and grocery_items (user_id, item_name).
+
+-- Meal history, today's meals and weekly summaries: newest first per user
+CREATE INDEX IF NOT EXISTS idx_meal_history_user_created
+    ON meal_history (user_id, created_at DESC);
+
+-- Chat history, prompt context and trim_chat_messages
+CREATE INDEX IF NOT EXISTS idx_chat_messages_user_created
+    ON chat_messages (user_id, created_at DESC);
+
+-- GET /api/meals/tasks: pending and completed tasks since yesterday
+CREATE INDEX IF NOT EXISTS idx_burn_tasks_user_status_created
+    ON burn_tasks (user_id, status, created_at DESC);
+
+-- Tasks of a meal (meal detail, meal deletion) and the meal_id foreign key
+CREATE INDEX IF NOT EXISTS idx_burn_tasks_meal
+    ON burn_tasks (meal_id);
+
+-- purge_llm_result_cache: expired rows, then the oldest beyond the limit
+CREATE INDEX IF NOT EXISTS idx_llm_result_cache_expires
+    ON llm_result_cache (expires_at);
+CREATE INDEX IF NOT EXISTS idx_llm_result_cache_created
+    ON llm_result_cache (created_at);
+
+-- claim_analysis_job: oldest runnable job
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status
+    ON analysis_jobs (status, created_at);
@@ -0,0 +1,105 @@
+-- Functions the backend calls via RPC (PostgREST /rpc, or SELECT * FROM fn(...)
+-- with DATABASE_BACKEND=postgres).
+
+-- Atomically add to a day's counters, creating the row if needed: one round
+-- trip, no lost updates under concurrency. Negative deltas are allowed;
+-- counters never drop below zero.
+CREATE OR REPLACE FUNCTION increment_daily_metrics(
+    p_user_id UUID,
+    p_date DATE,
+    p_calories_in INTEGER DEFAULT 0,
+    p_calories_out INTEGER DEFAULT 0,
+    p_water_ml INTEGER DEFAULT 0
+)
+RETURNS daily_logs AS $$
+    INSERT INTO daily_logs (user_id, date, calories_in, calories_out, water_ml)
+    VALUES (
+        p_user_id,
+        p_date,
+        GREATEST(p_calories_in, 0),
+        GREATEST(p_calories_out, 0),
+        GREATEST(p_water_ml, 0)
+    )
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        calories_in = GREATEST(COALESCE(daily_logs.calories_in, 0) + p_calories_in, 0),
+        calories_out = GREATEST(COALESCE(daily_logs.calories_out, 0) + p_calories_out, 0),
+        water_ml = GREATEST(COALESCE(daily_logs.water_ml, 0) + p_water_ml, 0),
+        updated_at = NOW()
+    RETURNING *;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Keep only the newest p_keep Fit Buddy messages for a user (one set-based DELETE)
+CREATE OR REPLACE FUNCTION trim_chat_messages(p_user_id UUID, p_keep INTEGER DEFAULT 50)
+RETURNS INTEGER AS $$
+    WITH stale AS (
+        SELECT id
+        FROM chat_messages
+        WHERE user_id = p_user_id
+        ORDER BY created_at DESC, id DESC
+        OFFSET p_keep
+    ), deleted AS (
+        DELETE FROM chat_messages
+        WHERE id IN (SELECT id FROM stale)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM deleted;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Drop expired cache rows, then the oldest rows beyond p_max_rows
+CREATE OR REPLACE FUNCTION purge_llm_result_cache(p_max_rows INTEGER DEFAULT 2000)
+RETURNS INTEGER AS $$
+    WITH expired AS (
+        DELETE FROM llm_result_cache
+        WHERE expires_at <= NOW()
+        RETURNING 1
+    ), overflow AS (
+        DELETE FROM llm_result_cache
+        WHERE key IN (
+            SELECT key
+            FROM llm_result_cache
+            ORDER BY created_at DESC
+            OFFSET p_max_rows
+        )
+        RETURNING 1
+    )
+    SELECT ((SELECT COUNT(*) FROM expired) + (SELECT COUNT(*) FROM overflow))::INTEGER;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Claim the oldest runnable analysis job for p_worker_id: queued and due, or
+-- running with an expired lease (its worker died). Expired jobs that are out
+-- of attempts are failed instead. SKIP LOCKED lets workers claim concurrently.
+CREATE OR REPLACE FUNCTION claim_analysis_job(
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER DEFAULT 60,
+    p_max_attempts INTEGER DEFAULT 3
+)
+RETURNS SETOF analysis_jobs AS $$
+BEGIN
+    UPDATE analysis_jobs
+    SET status = 'failed',
+        input = NULL,
+        worker_id = NULL,
+        lease_expires_at = NULL,
+        error = jsonb_build_object('detail', format('Job abandoned after %s attempts', attempts), 'status', 500)
+    WHERE status = 'running'
+      AND lease_expires_at <= NOW()
+      AND attempts >= p_max_attempts;
+
+    RETURN QUERY
+    UPDATE analysis_jobs
+    SET status = 'running',
+        worker_id = p_worker_id,
+        attempts = attempts + 1,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE id = (
+        SELECT id
+        FROM analysis_jobs
+        WHERE (status = 'queued' AND available_at <= NOW())
+           OR (status = 'running' AND lease_expires_at <= NOW())
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,15 @@
+-- History and task lists page by (created_at, id) keyset cursors
+-- (services/pagination.py). With id in the index a page is one index range
+-- scan of `limit` rows, at any depth; the 0002 indexes it extends are dropped.
+
+CREATE INDEX IF NOT EXISTS idx_meal_history_user_created_id
+    ON meal_history (user_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_meal_history_user_created;
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_user_created_id
+    ON chat_messages (user_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_chat_messages_user_created;
+
+CREATE INDEX IF NOT EXISTS idx_burn_tasks_user_status_created_id
+    ON burn_tasks (user_id, status, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_burn_tasks_user_status_created;
@@ -0,0 +1,53 @@
+-- The RPC functions from 0003 ran as SECURITY DEFINER with the default
+-- EXECUTE grant, so anyone holding the anon key could call them: inflate or
+-- zero another user's counters, delete their chat history, purge the cache
+-- or claim queued jobs and read their photos. They now run with the
+-- caller's privileges and a fixed search_path, and only the backend's role
+-- may execute them.
+
+ALTER FUNCTION increment_daily_metrics(UUID, DATE, INTEGER, INTEGER, INTEGER)
+    SECURITY INVOKER SET search_path = public;
+ALTER FUNCTION trim_chat_messages(UUID, INTEGER)
+    SECURITY INVOKER SET search_path = public;
+ALTER FUNCTION purge_llm_result_cache(INTEGER)
+    SECURITY INVOKER SET search_path = public;
+ALTER FUNCTION claim_analysis_job(TEXT, INTEGER, INTEGER)
+    SECURITY INVOKER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION
+    increment_daily_metrics(UUID, DATE, INTEGER, INTEGER, INTEGER),
+    trim_chat_messages(UUID, INTEGER),
+    purge_llm_result_cache(INTEGER),
+    claim_analysis_job(TEXT, INTEGER, INTEGER)
+FROM PUBLIC;
+
+-- Supabase roles; a plain Postgres database (DATABASE_BACKEND=postgres with
+-- its own user) has none of them, and the table owner keeps EXECUTE anyway
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION
+            increment_daily_metrics(UUID, DATE, INTEGER, INTEGER, INTEGER),
+            trim_chat_messages(UUID, INTEGER),
+            purge_llm_result_cache(INTEGER),
+            claim_analysis_job(TEXT, INTEGER, INTEGER)
+        FROM anon;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        REVOKE EXECUTE ON FUNCTION
+            increment_daily_metrics(UUID, DATE, INTEGER, INTEGER, INTEGER),
+            trim_chat_messages(UUID, INTEGER),
+            purge_llm_result_cache(INTEGER),
+            claim_analysis_job(TEXT, INTEGER, INTEGER)
+        FROM authenticated;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT EXECUTE ON FUNCTION
+            increment_daily_metrics(UUID, DATE, INTEGER, INTEGER, INTEGER),
+            trim_chat_messages(UUID, INTEGER),
+            purge_llm_result_cache(INTEGER),
+            claim_analysis_job(TEXT, INTEGER, INTEGER)
+        TO service_role;
+    END IF;
+END;
+$$;
@@ -0,0 +1,6 @@
+-- The daily_logs date a meal's calories were added to. A meal photo job can
+-- finish after midnight and still count the meal on the day it was uploaded,
+-- so deleting the meal must take its calories off that date, not the date of
+-- created_at. NULL for meals logged before this column existed.
+
+ALTER TABLE meal_history ADD COLUMN IF NOT EXISTS log_date DATE;
@@ -0,0 +1,5 @@
+"""
+Versioned database schema: tables, the indexes behind the hot query paths and
+the functions the backend calls via RPC, as `NNNN_name.sql` files applied in
+order by `python -m migrations.runner` (see runner.py).
+"""
@@ -0,0 +1,156 @@
+"""
+Apply the versioned SQL migrations in this package to a Postgres database.
+
+Migrations are `NNNN_name.sql` files applied in version order, each in its
+own transaction, and recorded in `schema_migrations` with a checksum of the
+file. Applied migrations are never re-run; editing one after it was applied
+is an error - add a new file instead. A session advisory lock keeps two
+runners (e.g. two deploys) from applying the same migration at once.
+
+Usage (from backend/):
+    python -m migrations.runner --database-url postgresql://postgres@127.0.0.1:5432/postgres
+    python -m migrations.runner --status
+"""
+
+import argparse
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from config import settings
+
+MIGRATIONS_DIR = Path(__file__).parent
+FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# pg_advisory_lock key: "fitflow migrations"
+LOCK_ID = 0x66697466
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMPTZ DEFAULT NOW()
+)
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    def __str__(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """The migration files in `directory`, oldest first."""
+    migrations: Dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = FILENAME.match(path.name)
+        if not match:
+            raise ValueError(f"Migration file name must look like 0001_name.sql: {path.name}")
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version:04d}: {migrations[version].path.name}, {path.name}")
+        migrations[version] = Migration(version, match.group(2), path)
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def _applied(cursor) -> Dict[int, str]:
+    cursor.execute(CREATE_TABLE)
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def _check_unchanged(migrations: List[Migration], applied: Dict[int, str]) -> None:
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            raise RuntimeError(f"Migration {migration} was changed after it was applied; add a new migration instead")
+
+
+def apply_migrations(database_url: str, target: Optional[int] = None,
+                     migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """Apply pending migrations (up to `target`) in order; the ones applied now."""
+    migrations = load_migrations() if migrations is None else migrations
+    conn = psycopg2.connect(database_url)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_ID,))
+        try:
+            conn.autocommit = False
+            with conn, conn.cursor() as cursor:
+                applied = _applied(cursor)
+            _check_unchanged(migrations, applied)
+
+            newly_applied = []
+            for migration in migrations:
+                if migration.version in applied or (target is not None and migration.version > target):
+                    continue
+                with conn, conn.cursor() as cursor:  # One transaction per migration
+                    cursor.execute(migration.sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (migration.version, migration.name, migration.checksum),
+                    )
+                print(f"[DEBUG] Applied migration {migration}")
+                newly_applied.append(migration)
+            return newly_applied
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_ID,))
+    finally:
+        conn.close()
+
+
+def pending_migrations(database_url: str, migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """Migrations not yet applied to the database."""
+    migrations = load_migrations() if migrations is None else migrations
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cursor:
+            applied = _applied(cursor)
+    finally:
+        conn.close()
+    _check_unchanged(migrations, applied)
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--target", type=int, default=None, help="Apply migrations up to this version only")
+    parser.add_argument("--status", action="store_true", help="List pending migrations without applying them")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("pass --database-url (or set DATABASE_URL)")
+
+    if args.status:
+        pending = pending_migrations(args.database_url)
+        for migration in pending:
+            print(f"pending  {migration}")
+        print(f"{len(pending)} pending migration(s)")
+        return
+
+    applied = apply_migrations(args.database_url, target=args.target)
+    print(f"{len(applied)} migration(s) applied")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from pydantic.json_schema import SkipJsonSchema
 from typing import Optional, List, Dict
 from datetime import datetime
 
@@ -27,6 +28,57 @@ class MealAnalysisResponse(BaseModel):
     task: BurnTaskData
 
 
+# Gemini structured-output models (response schemas for services/gemini.py).
+# Extra keys the model adds are kept, so nothing reaches the routes trimmed.
+class Macros(BaseModel):
+    p: float = 0  # protein (g)
+    c: float = 0  # carbs (g)
+    f: float = 0  # fat (g)
+
+
+class MealItem(BaseModel):
+    name: str
+    calories: float
+    quantity: str = ""
+
+
+class BurnTaskSuggestion(BaseModel):
+    type: str  # walking/running/swimming/gym/yoga/cycling/hiit
+    name: str
+    duration_minutes: int
+    calories_to_burn: int
+    distance_km: Optional[float] = None
+    steps: Optional[int] = None
+    description: str = ""  # Markdown instructions
+
+
+class MealAnalysisResult(MealAnalysisResponse):
+    """Meal photo analysis as returned by Gemini (MEAL_ANALYSIS_PROMPT_TEMPLATE)."""
+    model_config = ConfigDict(extra="allow")
+
+    image_description: str = ""
+    items: List[MealItem] = []
+    total_calories: int
+    macros: Macros = Macros()
+    ingredients: str = ""  # comma-separated
+    excess_calories: int = 0
+    tasks: List[BurnTaskSuggestion] = []
+    # Legacy fields - not requested from Gemini (total_calories/tasks replace them)
+    calories: SkipJsonSchema[Optional[int]] = None
+    burn_task: SkipJsonSchema[Optional[str]] = None
+    task: SkipJsonSchema[Optional[BurnTaskData]] = None
+
+
+class MealTextAnalysisResult(MealAnalysisResult):
+    """Text meal analysis; the model may instead flag input that is not about food."""
+    error: bool = False
+    message: str = ""  # Shown to the user when error is true
+    food: str = ""
+    total_calories: int = 0
+    plate_grade: str = ""
+    reasoning: str = ""
+
+
 # Menu Suggestion Models
 class MenuSuggestionRequest(BaseModel):
     image_url: str
@@ -43,6 +95,11 @@ class MenuSuggestionResponse(BaseModel):
     suggestions: List[MenuSuggestion]
 
 
+class MenuAnalysisResult(MenuSuggestionResponse):
+    """Menu photo analysis as returned by Gemini (MENU_SUGGESTION_PROMPT)."""
+    model_config = ConfigDict(extra="allow")
+
+
 # Cooking Helper Models
 class CookingHelperRequest(BaseModel):
     image_url: str
@@ -61,6 +118,18 @@ class CookingHelperResponse(BaseModel):
     missing_ingredients: List[str]
 
 
+class RecipeResult(Recipe):
+    macros: Macros = Macros()
+
+
+class PantryAnalysisResult(CookingHelperResponse):
+    """Pantry photo analysis as returned by Gemini (COOKING_HELPER_PROMPT)."""
+    model_config = ConfigDict(extra="allow")
+
+    recipes: List[RecipeResult]
+    missing_ingredients: List[str] = []
+
+
 # Chat Models
 class ChatRequest(BaseModel):
     message: str
@@ -1,18 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
-from services.agent_service import chat_with_agent
+from services.db import load_with_fallback
+from services.repositories import chat_messages, meal_history
+from services.agent_service import PROMPT_MEAL_COLUMNS, chat_with_agent, stream_agent
+from services.user_context import UserContext, get_user_context
+from services.idempotency import run_idempotent
+from services.response_templates import resolve_language
+from services.llm_resilience import call_llm
+from services.llm_scheduler import LLMOverloaded
+from services.chat_memory import build_prompt_history, clear_memory, load_summary, refresh_summary
+from services.pagination import decode_cursor, split_page
 from models import ChatRequest, ChatResponse, UICard
+from config import settings
 from datetime import date, timedelta
+from typing import Optional
+import asyncio
+import json
 import uuid
 
 router = APIRouter()
 
 
+async def trim_chat_history(user_id: str):
+    """Keep only the newest `chat_history_limit` messages (one set-based DELETE via RPC)."""
+    try:
+        await chat_messages.trim(user_id, settings.chat_history_limit)
+    except Exception as e:
+        print(f"[WARN] Chat history trim failed: {str(e)}")  # Cleanup is optional
+
+
+async def _load_recent_meals(user_id: str) -> list:
+    """Last 3 days of meals for the chat context (only the columns the prompt uses)."""
+    three_days_ago = (date.today() - timedelta(days=3)).isoformat()
+    return await meal_history.list_recent(user_id, since=three_days_ago, limit=15, columns=PROMPT_MEAL_COLUMNS)
+
+
+async def _load_chat_history(user_id: str) -> list:
+    """Messages of the last `chat_memory_max_turns` turns, oldest first."""
+    messages = await chat_messages.recent(
+        user_id, settings.chat_memory_max_turns * 2, columns="role, content, created_at"
+    )
+    return list(reversed(messages))
+
+
+async def _load_chat_context(user_id: str, user_context: UserContext):
+    """
+    Profile, today's daily log, last 3 days of meals, and the conversation
+    memory (rolling summary + recent turns, see services/chat_memory.py).
+    The loads are independent, so they run concurrently, each with a fallback.
+    """
+    profile, daily_log, meals_history, messages, summary = await asyncio.gather(
+        load_with_fallback("profile", user_context.get_profile(), {}),
+        load_with_fallback("daily_log", user_context.get_daily_log(), {}),
+        load_with_fallback("recent_meals", _load_recent_meals(user_id), []),
+        load_with_fallback("chat_history", _load_chat_history(user_id), []),
+        load_with_fallback("chat_summary", load_summary(user_id), None),
+    )
+    return profile, daily_log, meals_history, build_prompt_history(messages, summary)
+
+
+async def _save_chat_turn(user_id: str, message: str, response_text: str, ui_cards: list):
+    """Persist one exchange. UI cards ride inside the assistant content as a JSON blob."""
+    await chat_messages.insert([{
+        "user_id": user_id,
+        "role": "user",
+        "content": message
+    }])
+    
+    if ui_cards:
+        ai_content = json.dumps({"text": response_text, "ui_cards": ui_cards})
+    else:
+        ai_content = response_text
+
+    await chat_messages.insert([{
+        "user_id": user_id,
+        "role": "assistant",
+        "content": ai_content
+    }])
+
+
 @router.post("", response_model=ChatResponse)
 async def chat_with_buddy(
     request: ChatRequest,
-    user_id: str = Depends(get_user_id)
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    accept_language: Optional[str] = Header(None)
 ):
     """Chat with Fit Buddy AI using LangChain agent with tool calling.
     
@@ -20,55 +95,28 @@ async def chat_with_buddy(
     - response: text message (always present)
     - ui_cards: interactive UI cards (empty for plain text chats)
     - actions_taken: list of tools that were executed
+    
+    A repeated `Idempotency-Key` header returns the first response without
+    running the tools or saving the messages again.
     """
+    return await run_idempotent(
+        "chat", user_id, idempotency_key,
+        lambda: _chat_with_buddy(
+            request, background_tasks, user_id, user_context, resolve_language(accept_language)
+        )
+    )
+
+
+async def _chat_with_buddy(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str,
+    user_context: UserContext,
+    language: str = "en"
+) -> ChatResponse:
     try:
-        supabase = get_supabase()
-        
-        # 1. Get user profile
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        profile = profile_result.data or {}
-        
-        # 2. Get today's daily log
-        target_date = date.today().isoformat()
-        try:
-            daily_result = supabase.table("daily_logs")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("date", target_date)\
-                .single()\
-                .execute()
-            daily_log = daily_result.data or {}
-        except:
-            daily_log = {
-                "calories_in": 0,
-                "calories_out": 0,
-                "water_ml": 0,
-                "steps": 0,
-                "active_minutes": 0
-            }
-        
-        # 3. Get last 3 days of meals
-        three_days_ago = (date.today() - timedelta(days=3)).isoformat()
-        meals_result = supabase.table("meal_history")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .gte("created_at", three_days_ago)\
-            .order("created_at", desc=True)\
-            .limit(15)\
-            .execute()
-        meals_history = meals_result.data or []
-        
-        # 4. Get last 10 messages from chat history
-        try:
-            history_result = supabase.table("chat_messages")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .order("created_at", desc=True)\
-                .limit(10)\
-                .execute()
-            chat_history = list(reversed(history_result.data or []))
-        except:
-            chat_history = []
+        # 1-4. Profile, today's daily log, recent meals and recent messages
+        profile, daily_log, meals_history, chat_history = await _load_chat_context(user_id, user_context)
         
         # 5. Get AI response with agent (tools + structured output)
         agent_result = await chat_with_agent(
@@ -78,47 +126,22 @@ async def chat_with_buddy(
             meals_history=meals_history,
             daily_log=daily_log,
             chat_history=chat_history,
-            supabase=supabase
+            user_context=user_context,
+            language=language,
+            # 6-7. Save the user message and the AI response - once, even when
+            # a double tap joined the same agent call
+            on_result=lambda result: _save_chat_turn(
+                user_id, request.message, result.get("response", ""), result.get("ui_cards", [])
+            )
         )
         
         response_text = agent_result.get("response", "")
         ui_cards_data = agent_result.get("ui_cards", [])
         actions_taken = agent_result.get("actions_taken", [])
         
-        # 6. Save user message to DB
-        supabase.table("chat_messages").insert({
-            "user_id": user_id,
-            "role": "user",
-            "content": request.message
-        }).execute()
-        
-        # 7. Save AI response to DB (inject ui_cards inside content JSON blob if present)
-        import json
-        if ui_cards_data:
-            ai_content = json.dumps({"text": response_text, "ui_cards": ui_cards_data})
-        else:
-            ai_content = response_text
-
-        supabase.table("chat_messages").insert({
-            "user_id": user_id,
-            "role": "assistant",
-            "content": ai_content
-        }).execute()
-        
-        # 8. Cleanup old messages (keep only 50 max)
-        try:
-            all_msgs = supabase.table("chat_messages")\
-                .select("id")\
-                .eq("user_id", user_id)\
-                .order("created_at", desc=True)\
-                .execute()
-            
-            if len(all_msgs.data or []) > 50:
-                old_ids = [m["id"] for m in all_msgs.data[50:]]
-                for old_id in old_ids:
-                    supabase.table("chat_messages").delete().eq("id", old_id).execute()
-        except:
-            pass  # Cleanup is optional
+        # 8. After the response is sent: fold old turns into the summary, then trim them
+        background_tasks.add_task(refresh_summary, user_id)
+        background_tasks.add_task(trim_chat_history, user_id)
         
         session_id = request.session_id or str(uuid.uuid4())
         
@@ -142,6 +165,8 @@ async def chat_with_buddy(
             actions_taken=actions_taken
         )
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"[ERROR] Chat failed: {str(e)}")
         import traceback
@@ -149,24 +174,85 @@ async def chat_with_buddy(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context),
+    accept_language: Optional[str] = Header(None)
+):
+    """Chat with Fit Buddy AI, streamed as Server-Sent Events.
+    
+    Frames:
+    - `card`: a UI card, sent as soon as the tool that produced it finishes
+    - `token`: the next piece of the response text
+    - `done`: `{response, session_id, ui_cards, actions_taken}` once the
+      turn is complete and saved
+    - `error`: `{detail}` if the turn could not be completed; when the AI
+      service is overloaded also `{status, retry_after}` (429/503 semantics)
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    async def frames():
+        try:
+            profile, daily_log, meals_history, chat_history = await _load_chat_context(user_id, user_context)
+            
+            async for event in stream_agent(
+                message=request.message,
+                user_id=user_id,
+                user_profile=profile,
+                meals_history=meals_history,
+                daily_log=daily_log,
+                chat_history=chat_history,
+                user_context=user_context,
+                language=resolve_language(accept_language)
+            ):
+                if event["event"] != "done":
+                    yield _sse(event["event"], event["data"])
+                    continue
+                
+                # Persist once the whole response is known, then close the stream
+                result = event["data"]
+                await _save_chat_turn(user_id, request.message, result["response"], result["ui_cards"])
+                yield _sse("done", {**result, "session_id": session_id})
+        except LLMOverloaded as e:
+            yield _sse("error", {"detail": str(e), "status": e.status_code, "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"[ERROR] Chat stream failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield _sse("error", {"detail": str(e)})
+    
+    # Runs after the stream has been fully sent
+    background_tasks.add_task(refresh_summary, user_id)
+    background_tasks.add_task(trim_chat_history, user_id)
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history")
 async def get_chat_history(
     user_id: str = Depends(get_user_id),
-    limit: int = 20
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page (older messages)")
 ):
-    """Get chat history for the user."""
+    """Get the user's newest chat messages; pass `next_cursor` back as `cursor` for older ones."""
+    older_than = decode_cursor(cursor)
     try:
-        supabase = get_supabase()
-        
-        result = supabase.table("chat_messages")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .limit(limit)\
-            .execute()
-        
+        # One extra row tells whether older messages remain
+        page, next_cursor = split_page(await chat_messages.recent(user_id, limit + 1, older_than=older_than), limit)
         # Return in chronological order
-        messages = list(reversed(result.data or []))
+        messages = list(reversed(page))
         
         import json
         for msg in messages:
@@ -179,10 +265,10 @@ async def get_chat_history(
                 except:
                     pass
                     
-        return {"messages": messages}
+        return {"messages": messages, "next_cursor": next_cursor}
         
     except Exception as e:
-        return {"messages": []}
+        return {"messages": [], "next_cursor": None}
 
 
 @router.delete("/history")
@@ -191,38 +277,38 @@ async def clear_chat_history(
 ):
     """Clear all chat history for the user."""
     try:
-        supabase = get_supabase()
-        supabase.table("chat_messages").delete().eq("user_id", user_id).execute()
+        await chat_messages.delete_all(user_id)
+        await clear_memory(user_id)
         return {"message": "Chat history cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-from fastapi import UploadFile, File, Form
+from fastapi import UploadFile, File, Form, Response
+from services.image_processing import preprocess_image
+from services.llm_clients import get_gemini_model
 
 @router.post("/vision", response_model=ChatResponse)
 async def chat_with_vision(
+    background_tasks: BackgroundTasks,
+    response: Response,
     message: str = Form(""),
     image: UploadFile = File(...),
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Chat with Fit Buddy AI with image analysis."""
     try:
-        import google.generativeai as genai
-        from config import settings
-        
-        supabase = get_supabase()
-        
-        # Get user profile
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        profile = profile_result.data or {}
-        
-        # Read image
+        # Get user profile while the image is read and shrunk for the vision call
         image_data = await image.read()
+        profile, processed = await asyncio.gather(
+            load_with_fallback("profile", user_context.get_profile(), {}),
+            preprocess_image(image_data, image.content_type),
+        )
+        response.headers.update(processed.headers)
         
-        # Configure Gemini vision
-        genai.configure(api_key=settings.gemini_api_key)
-        model = genai.GenerativeModel(settings.gemini_model)
+        # Shared Gemini vision model
+        model = get_gemini_model()
         
         # Build prompt with context
         prompt = f"""You are Fit Buddy, a friendly AI health assistant.
@@ -237,31 +323,36 @@ User Message: {message or 'What can you tell me about this image?'}
 Analyze this image in the context of health, nutrition, or fitness. Be helpful and conversational."""
 
         # Analyze with vision
-        response = await model.generate_content_async([
+        vision_response = await call_llm("vision_chat", lambda: model.generate_content_async([
             prompt,
-            {"mime_type": image.content_type or "image/jpeg", "data": image_data}
-        ])
+            {"mime_type": processed.mime_type, "data": processed.data}
+        ]), user_id, hedge=True)
         
-        ai_response = response.text
+        ai_response = vision_response.text
         
         # Save messages to DB
-        supabase.table("chat_messages").insert({
+        await chat_messages.insert([{
             "user_id": user_id,
             "role": "user",
             "content": f"📷 {message or 'Shared an image'}"
-        }).execute()
+        }])
         
-        supabase.table("chat_messages").insert({
+        await chat_messages.insert([{
             "user_id": user_id,
             "role": "assistant",
             "content": ai_response
-        }).execute()
+        }])
+        
+        background_tasks.add_task(refresh_summary, user_id)
+        background_tasks.add_task(trim_chat_history, user_id)
         
         return ChatResponse(
             response=ai_response,
             session_id=str(uuid.uuid4())
         )
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"[ERROR] Vision chat failed: {str(e)}")
         import traceback
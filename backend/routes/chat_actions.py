@@ -10,7 +10,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.user_context import UserContext, get_user_context, invalidate_user_context
+from services.daily_metrics import remember_daily_log
+from services.repositories import meal_repository, profiles
 from datetime import date
 import uuid
 
@@ -35,13 +37,11 @@ class ConfirmGoalRequest(BaseModel):
 @router.post("/confirm-meal")
 async def confirm_meal_from_chat(
     request: ConfirmMealRequest,
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Save a meal that was previewed via AI chat card."""
     try:
-        supabase = get_supabase()
-        target_date = date.today().isoformat()
-
         # Save meal to history
         meal_record = {
             "id": str(uuid.uuid4()),
@@ -56,38 +56,10 @@ async def confirm_meal_from_chat(
             "source": request.source
         }
 
-        supabase.table("meal_history").insert(meal_record).execute()
-
-        # Update daily calorie count
-        try:
-            daily_result = supabase.table("daily_logs") \
-                .select("*").eq("user_id", user_id).eq("date", target_date).single().execute()
-
-            if daily_result.data:
-                new_calories = daily_result.data["calories_in"] + request.calories
-                supabase.table("daily_logs") \
-                    .update({"calories_in": new_calories}).eq("id", daily_result.data["id"]).execute()
-            else:
-                supabase.table("daily_logs").insert({
-                    "user_id": user_id,
-                    "date": target_date,
-                    "calories_in": request.calories,
-                    "calories_out": 0,
-                    "water_ml": 0,
-                    "steps": 0,
-                    "active_minutes": 0
-                }).execute()
-        except:
-            # Create new daily log
-            supabase.table("daily_logs").insert({
-                "user_id": user_id,
-                "date": target_date,
-                "calories_in": request.calories,
-                "calories_out": 0,
-                "water_ml": 0,
-                "steps": 0,
-                "active_minutes": 0
-            }).execute()
+        # Meal and daily calorie count (atomic increment) - one transaction
+        # with DATABASE_BACKEND=postgres
+        daily_log = await meal_repository.log_meal(meal_record, [], date.today().isoformat())
+        remember_daily_log(user_context, daily_log)
 
         return {
             "message": "Meal logged successfully",
@@ -107,10 +79,8 @@ async def confirm_goal_update(
 ):
     """Update calorie goal from AI chat card confirmation."""
     try:
-        supabase = get_supabase()
-
-        supabase.table("profiles") \
-            .update({"daily_calorie_target": request.new_target}).eq("id", user_id).execute()
+        await profiles.update(user_id, {"daily_calorie_target": request.new_target})
+        invalidate_user_context(user_id, daily_log=False)
 
         return {
             "message": "Calorie goal updated successfully",
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import date, datetime
-from typing import Optional
+from typing import Literal, Optional
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.repositories import daily_logs
+from services.user_context import UserContext, get_user_context, invalidate_user_context
+from services.daily_metrics import increment_daily_metrics
 
 router = APIRouter()
 
@@ -10,24 +12,18 @@ router = APIRouter()
 @router.get("")
 async def get_daily_log(
     log_date: Optional[str] = Query(None, alias="date"),
+    fields: Literal["list", "detail"] = Query("detail", description="list: summary columns, detail: full rows"),
     user_id: str = Depends(get_user_id)
 ):
     """Get daily log for a specific date (defaults to today)."""
-    supabase = get_supabase()
-    
     # Use today if no date provided
     target_date = log_date or date.today().isoformat()
     
     try:
-        result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
+        existing = await daily_logs.get(user_id, target_date, columns=daily_logs.views[fields])
         
-        if result.data:
-            return result.data
+        if existing:
+            return existing
         
         # Create new daily log if not exists
         new_log = {
@@ -41,36 +37,16 @@ async def get_daily_log(
             "google_fit_data": {}
         }
         
-        insert_result = supabase.table("daily_logs").insert(new_log).execute()
-        
-        if insert_result.data:
-            return insert_result.data[0]
+        inserted = await daily_logs.create_if_missing(new_log)
+        if inserted is None:
+            # A concurrent request created it first
+            existing = await daily_logs.get(user_id, target_date, columns=daily_logs.views[fields])
+            return existing or daily_logs.project(new_log, fields)
+        invalidate_user_context(user_id, profile=False)
         
-        return new_log
+        return daily_logs.project(inserted, fields)
         
     except Exception as e:
-        # If single() fails (no data), create new log
-        if "No rows found" in str(e) or "0 rows" in str(e):
-            new_log = {
-                "user_id": user_id,
-                "date": target_date,
-                "calories_in": 0,
-                "calories_out": 0,
-                "water_ml": 0,
-                "steps": 0,
-                "active_minutes": 0,
-                "google_fit_data": {}
-            }
-            
-            try:
-                insert_result = supabase.table("daily_logs").insert(new_log).execute()
-                if insert_result.data:
-                    return insert_result.data[0]
-            except:
-                pass
-            
-            return new_log
-        
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -80,21 +56,15 @@ async def sync_google_fit(user_id: str = Depends(get_user_id)):
     # Note: Full Google Fit integration requires OAuth flow
     # This is a placeholder that returns current data
     
-    supabase = get_supabase()
     target_date = date.today().isoformat()
     
     try:
-        result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
+        current = await daily_logs.get(user_id, target_date)
         
-        if result.data:
+        if current:
             return {
                 "message": "Google Fit sync would happen here",
-                "current_data": result.data
+                "current_data": current
             }
         
         return {
@@ -112,44 +82,13 @@ async def sync_google_fit(user_id: str = Depends(get_user_id)):
 @router.post("/water")
 async def add_water(
     ml: int = 250,
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Add water intake."""
-    supabase = get_supabase()
-    target_date = date.today().isoformat()
-    
     try:
-        # Get current log
-        result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
-        
-        if result.data:
-            new_water = result.data["water_ml"] + ml
-            update_result = supabase.table("daily_logs")\
-                .update({"water_ml": new_water})\
-                .eq("id", result.data["id"])\
-                .execute()
-            
-            if update_result.data:
-                return update_result.data[0]
-        
-        # Create new log with water
-        new_log = {
-            "user_id": user_id,
-            "date": target_date,
-            "calories_in": 0,
-            "calories_out": 0,
-            "water_ml": ml,
-            "steps": 0,
-            "active_minutes": 0
-        }
-        
-        insert_result = supabase.table("daily_logs").insert(new_log).execute()
-        return insert_result.data[0] if insert_result.data else new_log
+        # Single atomic upsert + increment
+        return await increment_daily_metrics(user_context, water_ml=ml)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,7 +3,8 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.repositories import daily_logs, google_fit_sync
+from services.user_context import invalidate_user_context
 
 router = APIRouter()
 
@@ -30,20 +31,14 @@ class ToggleSyncRequest(BaseModel):
 @router.get("/status")
 async def get_sync_status(user_id: str = Depends(get_user_id)):
     """Get Health Connect sync status for user."""
-    supabase = get_supabase()
-    
     try:
-        result = supabase.table("google_fit_sync")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
+        record = await google_fit_sync.get(user_id)
         
-        if result.data:
+        if record:
             return {
-                "sync_enabled": result.data.get("sync_enabled", False),
-                "last_sync_time": result.data.get("last_sync_time"),
-                "sync_data": result.data.get("sync_data", []),
+                "sync_enabled": record.get("sync_enabled", False),
+                "last_sync_time": record.get("last_sync_time"),
+                "sync_data": record.get("sync_data", []),
             }
         
         # No record exists, return default
@@ -54,12 +49,6 @@ async def get_sync_status(user_id: str = Depends(get_user_id)):
         }
         
     except Exception as e:
-        if "No rows found" in str(e) or "0 rows" in str(e):
-            return {
-                "sync_enabled": False,
-                "last_sync_time": None,
-                "sync_data": [],
-            }
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -69,33 +58,23 @@ async def toggle_sync(
     user_id: str = Depends(get_user_id)
 ):
     """Enable or disable Health Connect sync."""
-    supabase = get_supabase()
-    
     try:
         # Check if record exists
-        existing = supabase.table("google_fit_sync")\
-            .select("id")\
-            .eq("user_id", user_id)\
-            .execute()
+        existing = await google_fit_sync.get(user_id, columns="id")
         
-        if existing.data and len(existing.data) > 0:
+        if existing:
             # Update existing record
-            result = supabase.table("google_fit_sync")\
-                .update({
-                    "sync_enabled": request.enabled,
-                    "updated_at": datetime.utcnow().isoformat()
-                })\
-                .eq("user_id", user_id)\
-                .execute()
+            await google_fit_sync.update(user_id, {
+                "sync_enabled": request.enabled,
+                "updated_at": datetime.utcnow().isoformat()
+            })
         else:
             # Create new record
-            result = supabase.table("google_fit_sync")\
-                .insert({
-                    "user_id": user_id,
-                    "sync_enabled": request.enabled,
-                    "sync_data": [],
-                })\
-                .execute()
+            await google_fit_sync.insert([{
+                "user_id": user_id,
+                "sync_enabled": request.enabled,
+                "sync_data": [],
+            }])
         
         return {
             "success": True,
@@ -112,8 +91,6 @@ async def sync_health_data(
     user_id: str = Depends(get_user_id)
 ):
     """Sync health data from mobile device. Keeps last 3 entries."""
-    supabase = get_supabase()
-    
     # Log received data from mobile
     print("=" * 50)
     print("HEALTH CONNECT DATA RECEIVED FROM MOBILE")
@@ -136,59 +113,45 @@ async def sync_health_data(
     
     try:
         # Get existing record
-        existing = supabase.table("google_fit_sync")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .execute()
+        existing = await google_fit_sync.get(user_id)
         
-        if existing.data and len(existing.data) > 0:
+        if existing:
             # Get current sync_data and append new entry
-            current_data = existing.data[0].get("sync_data", []) or []
+            current_data = existing.get("sync_data", []) or []
             current_data.append(new_entry)
             
             # Keep only last 3 entries
             if len(current_data) > 3:
                 current_data = current_data[-3:]
             
-            result = supabase.table("google_fit_sync")\
-                .update({
-                    "sync_data": current_data,
-                    "last_sync_time": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                })\
-                .eq("user_id", user_id)\
-                .execute()
+            await google_fit_sync.update(user_id, {
+                "sync_data": current_data,
+                "last_sync_time": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat()
+            })
         else:
             # Create new record with this entry
-            result = supabase.table("google_fit_sync")\
-                .insert({
-                    "user_id": user_id,
-                    "sync_enabled": True,
-                    "sync_data": [new_entry],
-                    "last_sync_time": datetime.utcnow().isoformat()
-                })\
-                .execute()
+            await google_fit_sync.insert([{
+                "user_id": user_id,
+                "sync_enabled": True,
+                "sync_data": [new_entry],
+                "last_sync_time": datetime.utcnow().isoformat()
+            }])
         
         # Also update today's daily_log with the synced data
         from datetime import date
         today = date.today().isoformat()
         
-        daily_result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", today)\
-            .execute()
+        daily_log = await daily_logs.get(user_id, today)
         
-        if daily_result.data and len(daily_result.data) > 0:
-            supabase.table("daily_logs")\
-                .update({
-                    "steps": request.steps,
-                    "active_minutes": request.active_minutes,
-                    "calories_out": request.calories_burned,
-                    "google_fit_data": new_entry
-                })\
-                .eq("id", daily_result.data[0]["id"])\
-                .execute()
+        if daily_log:
+            await daily_logs.update(daily_log["id"], {
+                "steps": request.steps,
+                "active_minutes": request.active_minutes,
+                "calories_out": request.calories_burned,
+                "google_fit_data": new_entry
+            })
+            invalidate_user_context(user_id, profile=False)
         
         return {
             "success": True,
@@ -203,21 +166,15 @@ async def sync_health_data(
 @router.get("/latest")
 async def get_latest_sync(user_id: str = Depends(get_user_id)):
     """Get the most recent synced health data."""
-    supabase = get_supabase()
-    
     try:
-        result = supabase.table("google_fit_sync")\
-            .select("sync_data, last_sync_time")\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
+        record = await google_fit_sync.get(user_id, columns="sync_data, last_sync_time")
         
-        if result.data:
-            sync_data = result.data.get("sync_data", [])
+        if record:
+            sync_data = record.get("sync_data", [])
             if sync_data and len(sync_data) > 0:
                 return {
                     "latest": sync_data[-1],
-                    "last_sync_time": result.data.get("last_sync_time"),
+                    "last_sync_time": record.get("last_sync_time"),
                     "total_entries": len(sync_data)
                 }
         
@@ -228,12 +185,6 @@ async def get_latest_sync(user_id: str = Depends(get_user_id)):
         }
         
     except Exception as e:
-        if "No rows found" in str(e) or "0 rows" in str(e):
-            return {
-                "latest": None,
-                "last_sync_time": None,
-                "total_entries": 0
-            }
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -246,8 +197,6 @@ async def sync_full_health_data(
     Receive ALL health data from Health Connect.
     Logs everything, then stores only what's needed.
     """
-    supabase = get_supabase()
-    
     # ========== LOG ALL RECEIVED DATA ==========
     print("\n" + "=" * 70)
     print("🏥 FULL HEALTH CONNECT DATA RECEIVED FROM MOBILE")
@@ -352,56 +301,42 @@ async def sync_full_health_data(
     
     try:
         # Get existing record
-        existing = supabase.table("google_fit_sync")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .execute()
+        existing = await google_fit_sync.get(user_id)
         
-        if existing.data and len(existing.data) > 0:
-            current_data = existing.data[0].get("sync_data", []) or []
+        if existing:
+            current_data = existing.get("sync_data", []) or []
             current_data.append(new_entry)
             
             if len(current_data) > 3:
                 current_data = current_data[-3:]
             
-            supabase.table("google_fit_sync")\
-                .update({
-                    "sync_data": current_data,
-                    "last_sync_time": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                })\
-                .eq("user_id", user_id)\
-                .execute()
+            await google_fit_sync.update(user_id, {
+                "sync_data": current_data,
+                "last_sync_time": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat()
+            })
         else:
-            supabase.table("google_fit_sync")\
-                .insert({
-                    "user_id": user_id,
-                    "sync_enabled": True,
-                    "sync_data": [new_entry],
-                    "last_sync_time": datetime.utcnow().isoformat()
-                })\
-                .execute()
+            await google_fit_sync.insert([{
+                "user_id": user_id,
+                "sync_enabled": True,
+                "sync_data": [new_entry],
+                "last_sync_time": datetime.utcnow().isoformat()
+            }])
         
         # Update today's daily_log
         from datetime import date
         today = date.today().isoformat()
         
-        daily_result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", today)\
-            .execute()
+        daily_log = await daily_logs.get(user_id, today)
         
-        if daily_result.data and len(daily_result.data) > 0:
-            supabase.table("daily_logs")\
-                .update({
-                    "steps": request.get('steps', 0),
-                    "active_minutes": int(request.get('steps', 0) / 100),
-                    "calories_out": request.get('totalCaloriesBurned', 0),  # Total burn (BMR + Exercise)
-                    "google_fit_data": new_entry
-                })\
-                .eq("id", daily_result.data[0]["id"])\
-                .execute()
+        if daily_log:
+            await daily_logs.update(daily_log["id"], {
+                "steps": request.get('steps', 0),
+                "active_minutes": int(request.get('steps', 0) / 100),
+                "calories_out": request.get('totalCaloriesBurned', 0),  # Total burn (BMR + Exercise)
+                "google_fit_data": new_entry
+            })
+            invalidate_user_context(user_id, profile=False)
         
         print("✅ Data stored successfully!")
         
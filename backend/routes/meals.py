@@ -1,121 +1,182 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
+from config import settings
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.db import load_with_fallback
 from services.gemini import analyze_meal_image, analyze_meal_text
+from services.llm_scheduler import LLMOverloaded
+from services.user_context import UserContext, get_user_context
+from services.daily_metrics import increment_daily_metrics, remember_daily_log
+from services.image_processing import preprocess_image
+from services.idempotency import run_idempotent, idempotent_id
+from services.analysis_jobs import FINISHED, job_queue, new_job, public_job, register_job_handler
+from services.metrics import metrics
+from services.pagination import decode_cursor, split_page
+from services.repositories import burn_tasks, meal_history, meal_repository
 from models import MealAnalysisRequest
+import asyncio
+import base64
+import json
+import time
 import uuid
 
 router = APIRouter()
 
 
+def _build_burn_tasks(tasks: list, user_id: str, meal_id: str, target_date: str) -> list:
+    """Turn the analysis `tasks` list into burn_tasks rows (skips tasks with nothing to burn)."""
+    task_rows = []
+    for task_data in tasks:
+        if task_data.get("calories_to_burn", 0) > 0:
+            task_rows.append({
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "meal_id": meal_id,
+                "task_type": task_data.get("type", "walking"),
+                "name": task_data.get("name", "Burn calories"),
+                "description": task_data.get("description", ""),
+                "duration_minutes": task_data.get("duration_minutes", 30),
+                "calories_to_burn": task_data.get("calories_to_burn", 0),
+                "distance_km": task_data.get("distance_km"),
+                "steps": task_data.get("steps"),
+                "status": "pending",
+                "date": target_date
+            })
+    return task_rows
+
+
+def _new_meal_id(user_id: str, idempotency_key: Optional[str]) -> str:
+    """Meal ids derived from an Idempotency-Key collide on replay instead of duplicating the meal."""
+    return idempotent_id(user_id, idempotency_key, "meal") if idempotency_key else str(uuid.uuid4())
+
+
+async def _save_analyzed_meal(
+    user_context: UserContext,
+    analysis: dict,
+    meal_record: dict,
+    target_date: str
+) -> dict:
+    """
+    Insert the meal, add its calories to today's log and create its burn tasks.
+    
+    If the meal id already exists (a replayed Idempotency-Key that this process
+    has no stored response for) nothing is written and the existing tasks are returned.
+    """
+    created_tasks = _build_burn_tasks(analysis.get("tasks", []), user_context.user_id, meal_record["id"], target_date)
+    
+    # Meal, daily calorie count (atomic increment) and burn tasks - one
+    # transaction with DATABASE_BACKEND=postgres
+    print(f"[DEBUG] Saving meal to history")
+    daily_log = await meal_repository.log_meal(meal_record, created_tasks, target_date)
+    if daily_log is None:
+        print(f"[DEBUG] Meal {meal_record['id']} already logged, skipping duplicate writes")
+        return {
+            **analysis,
+            "meal_id": meal_record["id"],
+            "created_tasks": await meal_repository.get_meal_tasks(meal_record["id"])
+        }
+    remember_daily_log(user_context, daily_log)
+    print(f"[DEBUG] Meal saved with {len(created_tasks)} burn tasks")
+    
+    return {
+        **analysis,
+        "meal_id": meal_record["id"],
+        "created_tasks": created_tasks
+    }
+
+
+async def _log_photo_meal(
+    user_context: UserContext,
+    image_data: bytes,
+    mime_type: str,
+    user_profile: dict,
+    daily_log: dict,
+    meal_id: str,
+    target_date: str
+) -> dict:
+    """Analyze a preprocessed meal photo and log it (synchronous route and background jobs)."""
+    calories_consumed = daily_log.get("calories_in", 0)
+    print(f"[DEBUG] User profile: {user_profile}")
+    print(f"[DEBUG] Calories consumed today: {calories_consumed}")
+    
+    # Analyze with Gemini (personalized)
+    print("[DEBUG] Calling Gemini API with user profile...")
+    analysis = await analyze_meal_image(image_data, user_profile, calories_consumed, mime_type=mime_type)
+    print(f"[DEBUG] Gemini analysis complete")
+    
+    # Handle new response format (total_calories vs calories)
+    total_calories = analysis.get("total_calories", analysis.get("calories", 0))
+    
+    # Save meal to history
+    meal_record = {
+        "id": meal_id,
+        "user_id": user_context.user_id,
+        "food_name": analysis.get("food", "Unknown Food"),
+        "image_description": analysis.get("image_description", ""),
+        "ingredients": analysis.get("ingredients", ""),
+        "calories": total_calories,
+        "macros": analysis.get("macros", {"p": 0, "c": 0, "f": 0}),
+        "plate_grade": analysis.get("plate_grade", "C"),
+        "reasoning": analysis.get("reasoning", ""),
+        "source": "photo"
+    }
+    
+    return await _save_analyzed_meal(user_context, analysis, meal_record, target_date)
+
+
 @router.post("/analyze")
 async def analyze_meal(
+    response: Response,
     file: UploadFile = File(...),
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Analyze a meal from an uploaded image with personalized context."""
+    """Analyze a meal from an uploaded image with personalized context.
+    
+    Send an `Idempotency-Key` header to make retries safe: a repeated key
+    returns the first result instead of logging the meal twice.
+    """
+    return await run_idempotent(
+        "meals.analyze", user_id, idempotency_key,
+        lambda: _analyze_meal(response, file, user_id, user_context, idempotency_key)
+    )
+
+
+async def _analyze_meal(
+    response: Response,
+    file: UploadFile,
+    user_id: str,
+    user_context: UserContext,
+    idempotency_key: Optional[str]
+) -> dict:
     try:
         print(f"[DEBUG] Starting meal analysis for user: {user_id}")
         print(f"[DEBUG] File received: {file.filename}, content_type: {file.content_type}")
         
-        supabase = get_supabase()
-        
-        # Get user profile for personalized analysis
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        user_profile = profile_result.data if profile_result.data else {}
-        print(f"[DEBUG] User profile: {user_profile}")
-        
-        # Get today's calorie consumption
-        target_date = date.today().isoformat()
-        daily_log = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
-        calories_consumed = daily_log.data.get("calories_in", 0) if daily_log.data else 0
-        print(f"[DEBUG] Calories consumed today: {calories_consumed}")
-        
         # Read image data
         image_data = await file.read()
         print(f"[DEBUG] Image data read, size: {len(image_data)} bytes")
         
-        # Analyze with Gemini (personalized)
-        print("[DEBUG] Calling Gemini API with user profile...")
-        analysis = await analyze_meal_image(image_data, user_profile, calories_consumed)
-        print(f"[DEBUG] Gemini analysis complete")
-        
-        # Handle new response format (total_calories vs calories)
-        total_calories = analysis.get("total_calories", analysis.get("calories", 0))
-        
-        # Save meal to history
-        meal_record = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "food_name": analysis.get("food", "Unknown Food"),
-            "image_description": analysis.get("image_description", ""),
-            "ingredients": analysis.get("ingredients", ""),
-            "calories": total_calories,
-            "macros": analysis.get("macros", {"p": 0, "c": 0, "f": 0}),
-            "plate_grade": analysis.get("plate_grade", "C"),
-            "reasoning": analysis.get("reasoning", ""),
-            "source": "photo"
-        }
-        
-        print(f"[DEBUG] Saving meal to history")
-        supabase.table("meal_history").insert(meal_record).execute()
-        print("[DEBUG] Meal saved to history successfully")
-        
-        # Update daily calorie count
-        if daily_log.data:
-            new_calories = daily_log.data["calories_in"] + total_calories
-            supabase.table("daily_logs")\
-                .update({"calories_in": new_calories})\
-                .eq("id", daily_log.data["id"])\
-                .execute()
-        else:
-            # Create new daily log
-            supabase.table("daily_logs").insert({
-                "user_id": user_id,
-                "date": target_date,
-                "calories_in": total_calories,
-                "calories_out": 0,
-                "water_ml": 0,
-                "steps": 0,
-                "active_minutes": 0
-            }).execute()
-        
-        # Create burn tasks (multiple tasks from new format)
-        tasks = analysis.get("tasks", [])
-        created_tasks = []
-        for task_data in tasks:
-            if task_data.get("calories_to_burn", 0) > 0:
-                burn_task = {
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "meal_id": meal_record["id"],
-                    "task_type": task_data.get("type", "walking"),
-                    "name": task_data.get("name", "Burn calories"),
-                    "description": task_data.get("description", ""),
-                    "duration_minutes": task_data.get("duration_minutes", 30),
-                    "calories_to_burn": task_data.get("calories_to_burn", 0),
-                    "distance_km": task_data.get("distance_km"),
-                    "steps": task_data.get("steps"),
-                    "status": "pending",
-                    "date": target_date
-                }
-                supabase.table("burn_tasks").insert(burn_task).execute()
-                created_tasks.append(burn_task)
-                print(f"[DEBUG] Created burn task: {burn_task['name']}")
-        
-        return {
-            **analysis,
-            "meal_id": meal_record["id"],
-            "created_tasks": created_tasks
-        }
-        
+        # Profile and today's calorie consumption (for personalization) load
+        # while the image is shrunk for the vision call
+        target_date = date.today().isoformat()
+        user_profile, daily_log, image = await asyncio.gather(
+            load_with_fallback("profile", user_context.get_profile(), {}),
+            load_with_fallback("daily_log", user_context.get_daily_log(), {}),
+            preprocess_image(image_data, file.content_type),
+        )
+        response.headers.update(image.headers)
+        
+        return await _log_photo_meal(
+            user_context, image.data, image.mime_type,
+            user_profile, daily_log, _new_meal_id(user_id, idempotency_key), target_date
+        )
+        
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"[ERROR] Meal analysis failed: {str(e)}")
         import traceback
@@ -123,35 +184,166 @@ async def analyze_meal(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _run_meal_photo_job(job: dict) -> dict:
+    """Handler for `meal_photo` jobs queued by /analyze/jobs; returns what /analyze would."""
+    payload = job["input"]
+    user_context = UserContext(job["user_id"])
+    user_profile, daily_log = await asyncio.gather(
+        load_with_fallback("profile", user_context.get_profile(), {}),
+        load_with_fallback("daily_log", user_context.get_daily_log(), {}),
+    )
+    # The meal id comes from the job id, so a job re-run after a worker crash
+    # finds the meal already logged instead of logging it twice
+    return await _log_photo_meal(
+        user_context, base64.b64decode(payload["image"]), payload["mime_type"],
+        user_profile, daily_log, idempotent_id(job["user_id"], job["id"], "meal"), payload["date"]
+    )
+
+
+register_job_handler("meal_photo", _run_meal_photo_job)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _get_own_job(job_id: str, user_id: str) -> dict:
+    job = await job_queue.get(job_id)
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/analyze/jobs", status_code=202)
+async def submit_meal_analysis_job(
+    response: Response,
+    file: UploadFile = File(...),
+    user_id: str = Depends(get_user_id),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Queue a meal photo for analysis and return right away.
+    
+    Returns the job (`job_id`, `status`, ...). Follow it with `GET /jobs/{job_id}`
+    or `GET /jobs/{job_id}/events`; once it has succeeded its `result` is what
+    /analyze returns. Resubmitting with the same `Idempotency-Key` returns the
+    same job.
+    """
+    try:
+        image = await preprocess_image(await file.read(), file.content_type)
+        response.headers.update(image.headers)
+        
+        job_id = idempotent_id(user_id, idempotency_key, "meal_job") if idempotency_key else str(uuid.uuid4())
+        job = await job_queue.enqueue(new_job(job_id, user_id, "meal_photo", {
+            "image": base64.b64encode(image.data).decode(),
+            "mime_type": image.mime_type,
+            "date": date.today().isoformat(),
+        }))
+        metrics.incr("analysis_jobs.submitted")
+        print(f"[DEBUG] Queued meal analysis job {job_id} for user: {user_id}")
+        return public_job(job)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Job routes are two segments deep, but keep them ahead of /{meal_id} with the other static routes
+@router.get("/jobs/{job_id}")
+async def get_meal_analysis_job(
+    job_id: str,
+    user_id: str = Depends(get_user_id)
+):
+    """Status of a meal analysis job: `result` once it succeeded, `error` ({detail, status}) once it failed."""
+    try:
+        return public_job(await _get_own_job(job_id, user_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_meal_analysis_job(
+    job_id: str,
+    user_id: str = Depends(get_user_id)
+):
+    """Follow a meal analysis job as Server-Sent Events.
+    
+    Frames:
+    - `status`: the job, each time its status changes
+    - `done`: the finished job (succeeded or failed); the stream then ends
+    - `error`: `{detail}` if the job could not be read
+    
+    The stream also ends after ANALYSIS_JOB_TIMEOUT_SECONDS if the job is still
+    running - reconnect or poll.
+    """
+    job = await _get_own_job(job_id, user_id)
+    
+    async def frames():
+        current, last_status = job, None
+        stop_at = time.monotonic() + settings.analysis_job_timeout_seconds
+        try:
+            while True:
+                if current["status"] in FINISHED:
+                    yield _sse("done", public_job(current))
+                    return
+                if current["status"] != last_status:
+                    yield _sse("status", public_job(current))
+                    last_status = current["status"]
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                await job_queue.wait(job_id, remaining)
+                current = await job_queue.get(job_id) or current
+        except Exception as e:
+            print(f"[ERROR] Job event stream failed: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/analyze-text")
 async def analyze_meal_from_text(
     request: MealAnalysisRequest,
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Analyze a meal from text description with personalized context."""
+    """Analyze a meal from text description with personalized context.
+    
+    Accepts an `Idempotency-Key` header, like /analyze.
+    """
     if not request.text:
         raise HTTPException(status_code=400, detail="Text description is required")
     
+    return await run_idempotent(
+        "meals.analyze-text", user_id, idempotency_key,
+        lambda: _analyze_meal_from_text(request, user_id, user_context, idempotency_key)
+    )
+
+
+async def _analyze_meal_from_text(
+    request: MealAnalysisRequest,
+    user_id: str,
+    user_context: UserContext,
+    idempotency_key: Optional[str]
+) -> dict:
     try:
         print(f"[DEBUG] Starting text meal analysis for user: {user_id}")
         print(f"[DEBUG] Text received: {request.text}")
         
-        supabase = get_supabase()
-        
-        # Get user profile for personalized analysis
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        user_profile = profile_result.data if profile_result.data else {}
-        print(f"[DEBUG] User profile: {user_profile}")
-        
-        # Get today's calorie consumption
+        # Get user profile and today's calorie consumption (concurrently)
         target_date = date.today().isoformat()
-        daily_log = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
-        calories_consumed = daily_log.data.get("calories_in", 0) if daily_log.data else 0
+        user_profile, daily_log = await asyncio.gather(
+            load_with_fallback("profile", user_context.get_profile(), {}),
+            load_with_fallback("daily_log", user_context.get_daily_log(), {}),
+        )
+        calories_consumed = daily_log.get("calories_in", 0)
+        print(f"[DEBUG] User profile: {user_profile}")
         print(f"[DEBUG] Calories consumed today: {calories_consumed}")
         
         # Analyze with Gemini (personalized)
@@ -172,7 +364,7 @@ async def analyze_meal_from_text(
         
         # Save meal to history
         meal_record = {
-            "id": str(uuid.uuid4()),
+            "id": _new_meal_id(user_id, idempotency_key),
             "user_id": user_id,
             "food_name": analysis.get("food", request.text),
             "image_description": analysis.get("image_description", "N/A - text description"),
@@ -184,59 +376,9 @@ async def analyze_meal_from_text(
             "source": "text"
         }
         
-        print(f"[DEBUG] Saving meal to history")
-        supabase.table("meal_history").insert(meal_record).execute()
-        print("[DEBUG] Meal saved to history successfully")
-        
-        # Update daily calorie count
-        if daily_log.data:
-            new_calories = daily_log.data["calories_in"] + total_calories
-            supabase.table("daily_logs")\
-                .update({"calories_in": new_calories})\
-                .eq("id", daily_log.data["id"])\
-                .execute()
-        else:
-            # Create new daily log
-            supabase.table("daily_logs").insert({
-                "user_id": user_id,
-                "date": target_date,
-                "calories_in": total_calories,
-                "calories_out": 0,
-                "water_ml": 0,
-                "steps": 0,
-                "active_minutes": 0
-            }).execute()
-        
-        # Create burn tasks (multiple tasks from new format)
-        tasks = analysis.get("tasks", [])
-        created_tasks = []
-        for task_data in tasks:
-            if task_data.get("calories_to_burn", 0) > 0:
-                burn_task = {
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "meal_id": meal_record["id"],
-                    "task_type": task_data.get("type", "walking"),
-                    "name": task_data.get("name", "Burn calories"),
-                    "description": task_data.get("description", ""),
-                    "duration_minutes": task_data.get("duration_minutes", 30),
-                    "calories_to_burn": task_data.get("calories_to_burn", 0),
-                    "distance_km": task_data.get("distance_km"),
-                    "steps": task_data.get("steps"),
-                    "status": "pending",
-                    "date": target_date
-                }
-                supabase.table("burn_tasks").insert(burn_task).execute()
-                created_tasks.append(burn_task)
-                print(f"[DEBUG] Created burn task: {burn_task['name']}")
-        
-        return {
-            **analysis,
-            "meal_id": meal_record["id"],
-            "created_tasks": created_tasks
-        }
+        return await _save_analyzed_meal(user_context, analysis, meal_record, target_date)
         
-    except HTTPException:
+    except (HTTPException, LLMOverloaded):
         raise
     except Exception as e:
         print(f"[ERROR] Text meal analysis failed: {str(e)}")
@@ -248,34 +390,35 @@ async def analyze_meal_from_text(
 @router.get("/history")
 async def get_meal_history(
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     today_only: bool = Query(True, description="Only show today and yesterday's meals"),
+    fields: Literal["list", "detail"] = Query("detail", description="list: summary columns, detail: full rows"),
     user_id: str = Depends(get_user_id)
 ):
-    """Get meal history for the user."""
-    supabase = get_supabase()
-    
+    """Get meal history for the user, newest first; pass `next_cursor` back as `cursor` for the next page."""
+    older_than = decode_cursor(cursor)
     try:
         from datetime import timedelta
         today = date.today()
         yesterday = today - timedelta(days=1)
         
-        query = supabase.table("meal_history")\
-            .select("*")\
-            .eq("user_id", user_id)
-        
-        if today_only:
-            query = query.gte("created_at", yesterday.isoformat())
-        
-        result = query\
-            .order("created_at", desc=True)\
-            .range(offset, offset + limit - 1)\
-            .execute()
+        # One extra row tells whether another page follows
+        meals = await meal_history.list_recent(
+            user_id,
+            since=yesterday.isoformat() if today_only else None,
+            limit=limit + 1,
+            offset=0 if cursor else offset,
+            older_than=older_than,
+            columns=meal_history.views[fields]
+        )
+        meals, next_cursor = split_page(meals, limit)
         
         return {
-            "meals": result.data or [],
+            "meals": meals,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -287,49 +430,50 @@ async def get_meal_history(
 async def get_tasks(
     user_id: str = Depends(get_user_id),
     status: Optional[str] = Query(None, description="Filter by status: pending, completed, or None for both"),
-    include_yesterday: bool = Query(True, description="Include yesterday's pending tasks")
+    include_yesterday: bool = Query(True, description="Include yesterday's pending tasks"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size (all tasks when omitted)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    fields: Literal["list", "detail"] = Query("detail", description="list: summary columns, detail: full rows"),
 ):
-    """Get user's burn tasks - pending from today/yesterday, completed from today only."""
+    """Get user's burn tasks, newest first - pending from today/yesterday, completed from today only."""
     print(f"[DEBUG] get_tasks called for user_id: {user_id}, status: {status}")
+    older_than = decode_cursor(cursor)
     
     try:
-        supabase = get_supabase()
         from datetime import timedelta
         today = date.today()
         yesterday = today - timedelta(days=1)
         
         all_tasks = []
+        # Each status list is read one row past the page, then merged on the same keyset
+        fetch = limit + 1 if limit else None
+        columns = burn_tasks.views[fields]
         
         # Get pending tasks (today and yesterday)
         if status is None or status == "pending":
-            pending_query = supabase.table("burn_tasks")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("status", "pending")\
-                .gte("created_at", yesterday.isoformat())
-            
-            pending_result = pending_query.order("created_at", desc=True).execute()
-            all_tasks.extend(pending_result.data or [])
+            all_tasks.extend(await burn_tasks.list_by_status(
+                user_id, "pending", yesterday.isoformat(), limit=fetch, older_than=older_than, columns=columns
+            ))
         
         # Get completed tasks (today only)
         if status is None or status == "completed":
-            completed_query = supabase.table("burn_tasks")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("status", "completed")\
-                .gte("created_at", today.isoformat())
-            
-            completed_result = completed_query.order("created_at", desc=True).execute()
-            all_tasks.extend(completed_result.data or [])
+            all_tasks.extend(await burn_tasks.list_by_status(
+                user_id, "completed", today.isoformat(), limit=fetch, older_than=older_than, columns=columns
+            ))
+        
+        all_tasks.sort(key=lambda task: (task["created_at"], str(task["id"])), reverse=True)
+        next_cursor = None
+        if limit:
+            all_tasks, next_cursor = split_page(all_tasks, limit)
         
         print(f"[DEBUG] Query result: {len(all_tasks)} tasks found")
-        return {"tasks": all_tasks}
+        return {"tasks": all_tasks, "next_cursor": next_cursor}
         
     except Exception as e:
         print(f"[ERROR] get_tasks failed: {str(e)}")
         import traceback
         traceback.print_exc()
-        return {"tasks": []}
+        return {"tasks": [], "next_cursor": None}
 
 
 @router.delete("/tasks/{task_id}")
@@ -338,23 +482,13 @@ async def delete_task(
     user_id: str = Depends(get_user_id)
 ):
     """Delete a burn task."""
-    supabase = get_supabase()
-    
     try:
-        task = supabase.table("burn_tasks")\
-            .select("*")\
-            .eq("id", task_id)\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
-        
-        if not task.data:
+        task = await burn_tasks.get(user_id, task_id)
+        
+        if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        supabase.table("burn_tasks")\
-            .delete()\
-            .eq("id", task_id)\
-            .execute()
+        await burn_tasks.delete(task_id)
         
         return {"message": "Task deleted successfully"}
         
@@ -368,56 +502,31 @@ async def delete_task(
 async def update_task(
     task_id: str,
     status: str = Query(..., description="New status: pending, completed"),
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Update a burn task status and update calories if completed."""
-    supabase = get_supabase()
-    
     try:
         # Get task first to check current status and calories
-        task = supabase.table("burn_tasks")\
-            .select("*")\
-            .eq("id", task_id)\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
-        
-        if not task.data:
+        task = await burn_tasks.get(user_id, task_id)
+        
+        if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        old_status = task.data.get("status", "pending")
-        calories_to_burn = task.data.get("calories_to_burn", 0)
+        old_status = task.get("status", "pending")
+        calories_to_burn = task.get("calories_to_burn", 0)
         
         # Update task status
-        supabase.table("burn_tasks")\
-            .update({"status": status, "completed_at": date.today().isoformat() if status == "completed" else None})\
-            .eq("id", task_id)\
-            .execute()
+        await burn_tasks.update(
+            task_id,
+            {"status": status, "completed_at": date.today().isoformat() if status == "completed" else None}
+        )
         
         # Update daily log calories_out based on status change
-        if old_status != status:
-            today = date.today()
-            daily_log = supabase.table("daily_logs")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("date", today.isoformat())\
-                .single()\
-                .execute()
-            
-            if daily_log.data:
-                current_out = daily_log.data.get("calories_out", 0) or 0
-                
-                if status == "completed" and old_status != "completed":
-                    new_out = current_out + calories_to_burn
-                elif status != "completed" and old_status == "completed":
-                    new_out = max(0, current_out - calories_to_burn)
-                else:
-                    new_out = current_out
-                
-                supabase.table("daily_logs")\
-                    .update({"calories_out": new_out})\
-                    .eq("id", daily_log.data["id"])\
-                    .execute()
+        if status == "completed" and old_status != "completed":
+            await increment_daily_metrics(user_context, calories_out=calories_to_burn)
+        elif status != "completed" and old_status == "completed":
+            await increment_daily_metrics(user_context, calories_out=-calories_to_burn)
         
         return {"message": "Task updated successfully", "status": status}
         
@@ -434,29 +543,19 @@ async def get_meal_detail(
     user_id: str = Depends(get_user_id)
 ):
     """Get detailed information about a specific meal including its tasks."""
-    supabase = get_supabase()
-    
     try:
         # Get meal
-        meal = supabase.table("meal_history")\
-            .select("*")\
-            .eq("id", meal_id)\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
-        
-        if not meal.data:
+        meal = await meal_history.get(user_id, meal_id)
+        
+        if not meal:
             raise HTTPException(status_code=404, detail="Meal not found")
         
         # Get associated tasks
-        tasks = supabase.table("burn_tasks")\
-            .select("*")\
-            .eq("meal_id", meal_id)\
-            .execute()
+        tasks = await burn_tasks.for_meal(meal_id)
         
         return {
-            **meal.data,
-            "tasks": tasks.data or []
+            **meal,
+            "tasks": tasks
         }
         
     except HTTPException:
@@ -468,53 +567,20 @@ async def get_meal_detail(
 @router.delete("/{meal_id}")
 async def delete_meal(
     meal_id: str,
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Delete a meal and its associated tasks, and update daily calories."""
-    supabase = get_supabase()
-    
     try:
-        # Verify ownership and get meal data
-        meal = supabase.table("meal_history")\
-            .select("*")\
-            .eq("id", meal_id)\
-            .eq("user_id", user_id)\
-            .single()\
-            .execute()
-        
-        if not meal.data:
+        # Verify ownership, subtract calories from that day's log and delete
+        # the meal with its tasks - one transaction with DATABASE_BACKEND=postgres
+        deleted = await meal_repository.delete_meal(user_id, meal_id)
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Meal not found")
         
-        meal_calories = meal.data.get("calories", 0)
-        meal_created_at = meal.data.get("created_at", "")
-        meal_date = meal_created_at[:10] if meal_created_at else date.today().isoformat()
-        
-        # Subtract calories from daily log
-        daily_log = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("date", meal_date)\
-            .single()\
-            .execute()
-        
-        if daily_log.data:
-            new_calories = max(0, daily_log.data["calories_in"] - meal_calories)
-            supabase.table("daily_logs")\
-                .update({"calories_in": new_calories})\
-                .eq("id", daily_log.data["id"])\
-                .execute()
-        
-        # Delete associated tasks
-        supabase.table("burn_tasks")\
-            .delete()\
-            .eq("meal_id", meal_id)\
-            .execute()
-        
-        # Delete meal
-        supabase.table("meal_history")\
-            .delete()\
-            .eq("id", meal_id)\
-            .execute()
+        meal, daily_log = deleted
+        remember_daily_log(user_context, daily_log)
+        meal_calories = meal.get("calories", 0)
         
         return {"message": "Meal deleted successfully", "calories_removed": meal_calories}
         
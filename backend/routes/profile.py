@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.repositories import profiles
+from services.user_context import UserContext, get_user_context
 from models import ProfileData
 
 router = APIRouter()
 
 
 @router.get("")
-async def get_profile(user_id: str = Depends(get_user_id)):
+async def get_profile(
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
+):
     """Get user profile."""
-    supabase = get_supabase()
-    
     try:
-        result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
+        profile = await user_context.get_profile()
         
-        if not result.data:
+        if not profile:
             # Create default profile if not exists
             default_profile = {
                 "id": user_id,
@@ -24,10 +26,11 @@ async def get_profile(user_id: str = Depends(get_user_id)):
                 "allergies": [],
                 "preferences": [],
             }
-            supabase.table("profiles").insert(default_profile).execute()
+            await profiles.insert([default_profile])
+            user_context.invalidate(daily_log=False)
             return default_profile
         
-        return result.data
+        return profile
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -35,20 +38,20 @@ async def get_profile(user_id: str = Depends(get_user_id)):
 @router.put("")
 async def update_profile(
     profile: ProfileData,
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Update user profile."""
-    supabase = get_supabase()
-    
     try:
         update_data = profile.model_dump(exclude_unset=True)
         update_data["id"] = user_id
         
-        result = supabase.table("profiles").upsert(update_data).execute()
+        updated = await profiles.upsert(update_data)
         
-        if not result.data:
+        if not updated:
             raise HTTPException(status_code=500, detail="Failed to update profile")
         
-        return result.data[0]
+        user_context.set_profile(updated)
+        return updated
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,91 +1,109 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.db import load_with_fallback
+from services.repositories import grocery_items
+from services.user_context import UserContext, get_user_context
+from services.image_processing import preprocess_image
 from services.gemini import analyze_menu, analyze_pantry
-from datetime import date
+from services.llm_scheduler import LLMOverloaded
+import asyncio
 
 router = APIRouter()
 
 
 @router.post("/menu")
 async def suggest_from_menu(
+    response: Response,
     file: UploadFile = File(...),
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Suggest healthy options from a restaurant menu image."""
     try:
         image_data = await file.read()
         
-        # Get user profile for personalization
-        supabase = get_supabase()
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        profile = profile_result.data or {}
-        
-        # Get today's calorie intake to calculate remaining budget
-        target_date = date.today().isoformat()
-        daily_result = supabase.table("daily_logs")\
-            .select("calories_in")\
-            .eq("user_id", user_id)\
-            .eq("date", target_date)\
-            .single()\
-            .execute()
+        # Profile (personalization) and today's intake (remaining budget) load
+        # while the image is preprocessed
+        profile, daily_log, image = await asyncio.gather(
+            load_with_fallback("profile", user_context.get_profile(), {}),
+            load_with_fallback("daily_log", user_context.get_daily_log(), {}),
+            preprocess_image(image_data, file.content_type),
+        )
+        response.headers.update(image.headers)
         
-        calories_in = daily_result.data.get("calories_in", 0) if daily_result.data else 0
+        calories_in = daily_log.get("calories_in", 0)
         calorie_target = profile.get("daily_calorie_target", 2000)
         calories_remaining = calorie_target - calories_in
         
         # Analyze menu with Gemini
         result = await analyze_menu(
-            image_data=image_data,
+            image_data=image.data,
             allergies=profile.get("allergies", []),
             conditions=profile.get("medical_conditions", []),
             preferences=profile.get("preferences", []),
-            calories_remaining=max(0, calories_remaining)
+            calories_remaining=max(0, calories_remaining),
+            mime_type=image.mime_type
         )
         
         return result
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/cooking")
 async def suggest_cooking(
+    response: Response,
     file: UploadFile = File(...),
-    user_id: str = Depends(get_user_id)
+    user_id: str = Depends(get_user_id),
+    user_context: UserContext = Depends(get_user_context)
 ):
     """Suggest healthy recipes from a fridge/pantry image."""
     try:
         image_data = await file.read()
         
-        # Get user profile for personalization
-        supabase = get_supabase()
-        profile_result = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
-        profile = profile_result.data or {}
+        # Get user profile for personalization while the image is preprocessed
+        profile, image = await asyncio.gather(
+            load_with_fallback("profile", user_context.get_profile(), {}),
+            preprocess_image(image_data, file.content_type),
+        )
+        response.headers.update(image.headers)
         
         # Analyze pantry with Gemini
         result = await analyze_pantry(
-            image_data=image_data,
+            image_data=image.data,
             allergies=profile.get("allergies", []),
             conditions=profile.get("medical_conditions", []),
-            preferences=profile.get("preferences", [])
+            preferences=profile.get("preferences", []),
+            mime_type=image.mime_type
         )
         
-        # Add missing ingredients to grocery list
-        if result.get("missing_ingredients"):
-            for item in result["missing_ingredients"]:
-                try:
-                    supabase.table("grocery_items").insert({
+        # Add missing ingredients to grocery list in one upsert -
+        # items already on the list are skipped by the (user_id, item_name) unique key
+        missing_items = list(dict.fromkeys(
+            item.strip() for item in result.get("missing_ingredients") or [] if item and item.strip()
+        ))
+        if missing_items:
+            try:
+                await grocery_items.add_missing([
+                    {
                         "user_id": user_id,
                         "item_name": item,
                         "suggested_by_ai": True,
                         "recipe_context": "Suggested for healthy recipes",
                         "is_purchased": False
-                    }).execute()
-                except:
-                    pass  # Ignore duplicates
+                    }
+                    for item in missing_items
+                ])
+            except Exception as e:
+                # The grocery list is a side effect - never fail the recipe response
+                print(f"[WARN] Failed to add grocery items: {str(e)}")
         
         return result
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any
 from services.auth import get_user_id
-from services.supabase_client import get_supabase
+from services.repositories import chat_messages, daily_logs, meal_history
 
 router = APIRouter()
 
@@ -10,21 +10,13 @@ router = APIRouter()
 @router.get("/summary")
 async def get_weekly_summary(user_id: str = Depends(get_user_id)):
     """Get weekly summary of calories, steps, etc."""
-    supabase = get_supabase()
-    
     # Get last 7 days dates
     today = date.today()
     seven_days_ago = today - timedelta(days=6)
     
     try:
         # Fetch daily logs for last 7 days
-        result = supabase.table("daily_logs")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .gte("date", seven_days_ago.isoformat())\
-            .lte("date", today.isoformat())\
-            .order("date")\
-            .execute()
+        logs = await daily_logs.list_range(user_id, seven_days_ago.isoformat(), today.isoformat())
         
         daily_data = []
         total_calories_in = 0
@@ -33,9 +25,8 @@ async def get_weekly_summary(user_id: str = Depends(get_user_id)):
         
         # Create a map of existing data
         data_map = {}
-        if result.data:
-            for record in result.data:
-                data_map[record["date"]] = record
+        for record in logs:
+            data_map[record["date"]] = record
         
         # Fill in all 7 days (including missing ones)
         for i in range(7):
@@ -93,8 +84,6 @@ async def cleanup_old_data(user_id: str = Depends(get_user_id)):
     Delete data older than 7 days for the user.
     Should be called once per day on first app open.
     """
-    supabase = get_supabase()
-    
     cutoff_date = (date.today() - timedelta(days=7)).isoformat()
     
     print(f"\n{'='*50}")
@@ -111,39 +100,25 @@ async def cleanup_old_data(user_id: str = Depends(get_user_id)):
     try:
         # Delete old daily logs
         try:
-            daily_result = supabase.table("daily_logs")\
-                .delete()\
-                .eq("user_id", user_id)\
-                .lt("date", cutoff_date)\
-                .execute()
-            
-            deleted_counts["daily_logs"] = len(daily_result.data) if daily_result.data else 0
+            deleted_counts["daily_logs"] = len(await daily_logs.delete_before(user_id, cutoff_date))
             print(f"Deleted {deleted_counts['daily_logs']} old daily_logs")
         except Exception as e:
             print(f"Warning: Could not delete daily_logs: {e}")
         
         # Delete old meals (based on created_at date)
         try:
-            meals_result = supabase.table("meal_history")\
-                .delete()\
-                .eq("user_id", user_id)\
-                .lt("created_at", f"{cutoff_date}T00:00:00")\
-                .execute()
-            
-            deleted_counts["meal_history"] = len(meals_result.data) if meals_result.data else 0
+            deleted_counts["meal_history"] = len(
+                await meal_history.delete_before(user_id, f"{cutoff_date}T00:00:00")
+            )
             print(f"Deleted {deleted_counts['meal_history']} old meal_history records")
         except Exception as e:
             print(f"Warning: Could not delete meal_history: {e}")
         
         # Delete old chat messages (based on created_at date)
         try:
-            chat_result = supabase.table("chat_messages")\
-                .delete()\
-                .eq("user_id", user_id)\
-                .lt("created_at", f"{cutoff_date}T00:00:00")\
-                .execute()
-            
-            deleted_counts["chat_messages"] = len(chat_result.data) if chat_result.data else 0
+            deleted_counts["chat_messages"] = len(
+                await chat_messages.delete_before(user_id, f"{cutoff_date}T00:00:00")
+            )
             print(f"Deleted {deleted_counts['chat_messages']} old chat_messages")
         except Exception as e:
             print(f"Warning: Could not delete chat_messages: {e}")
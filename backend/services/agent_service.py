@@ -7,26 +7,44 @@ Handles the ReAct loop manually (no langgraph dependency needed).
 Flow:
 1. Build messages (system + history + user message)
 2. Call LLM with bound tools
-3. If LLM returns tool_calls → execute tools → feed results back → call LLM again
+3. If LLM returns tool_calls → execute tools → reply from card templates, or
+   feed results back → call LLM again (see CHAT_RESPONSE_MODE)
 4. Return final text response + any UI cards from tool results
+
+Messages the rule-based intent router recognises (services/intent_router.py)
+are answered before step 2, without any LLM call.
+
+`stream_agent` runs the same flow but yields UI cards and model tokens as
+they are produced (used by POST /api/chat/stream).
 """
 
+import asyncio
 import json
-from typing import List, Optional, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List, Optional, Dict, Any, AsyncIterator, Awaitable, Callable
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from config import settings
-from services.agent_tools import create_tools
+from services.agent_tools import TOOLS, bind_user_context, tools_conflict
+from services.llm_clients import get_agent_llm, get_agent_llm_with_tools
+from services.llm_resilience import call_llm, guarded_stream
+from services.llm_scheduler import LLMOverloaded
+from services.intent_router import try_fast_path
+from services.response_templates import template_reply
+from services.user_context import UserContext
+from services.metrics import metrics
+from services.singleflight import SingleFlight
 from datetime import date, timedelta
 
 
-def get_agent_llm():
-    """Get LangChain ChatGoogleGenerativeAI instance for the agent."""
-    return ChatGoogleGenerativeAI(
-        model=settings.gemini_model,
-        google_api_key=settings.gemini_api_key,
-        temperature=0.7,
-    )
+# Concurrent identical turns from the same user share one agent run
+_inflight = SingleFlight("agent")
+
+
+# Tools by name, for executing the model's tool calls
+TOOL_MAP = {t.name: t for t in TOOLS}
+
+
+# The meal columns the system prompts read (here and in the langchain_chat fallback)
+PROMPT_MEAL_COLUMNS = "food_name, calories, plate_grade"
 
 
 def build_enhanced_system_prompt(user_profile: dict, meals_history: list, daily_log: dict) -> str:
@@ -115,8 +133,14 @@ You have access to tools that can take real actions. Use them when appropriate:
 
 
 def build_message_history(chat_history: list, system_context: str) -> list:
-    """Convert chat history from DB to LangChain message format."""
-    messages = [SystemMessage(content=system_context)]
+    """
+    Convert chat history from DB to LangChain message format.
+
+    Gemini takes one system message, as the first message - a conversation
+    summary row (role "system") is appended to the system prompt instead.
+    """
+    summaries = [msg.get('content', '') for msg in chat_history if msg.get('role') == 'system']
+    messages = [SystemMessage(content="\n\n".join([system_context] + summaries))]
 
     for msg in chat_history:
         if msg.get('role') == 'user':
@@ -147,12 +171,19 @@ async def chat_with_agent(
     meals_history: list,
     daily_log: dict,
     chat_history: list,
-    supabase
+    user_context=None,
+    language: str = "en",
+    on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
     """
     Chat with the AI agent. Returns both text response and UI cards.
     
-    Falls back gracefully to plain text if tool calling fails.
+    Falls back gracefully to plain text if tool calling fails. If the same user
+    sends the same message while an identical turn is still running (double tap,
+    app retry), the second call waits for and shares the first one's result, so
+    the LLM is asked - and the tools run - only once. `on_result(result)` (e.g.
+    saving the turn) runs once as part of that shared call, never for the
+    callers that joined it.
     
     Returns:
         {
@@ -161,79 +192,200 @@ async def chat_with_agent(
             "actions_taken": ["log_water", ...]
         }
     """
+    async def run() -> Dict[str, Any]:
+        result = await _run_agent(
+            message, user_id, user_profile, meals_history, daily_log, chat_history, user_context, language
+        )
+        if on_result is not None:
+            await on_result(result)
+        return result
+
+    key = (user_id, " ".join(message.split()), language)
+    result = await _inflight.do(key, run)
+    return dict(result)
+
+
+def _prepare_turn(
+    message: str,
+    user_profile: dict,
+    meals_history: list,
+    daily_log: dict,
+    chat_history: list
+):
+    """Pick the shared LLM and tool-bound LLM and build the message list for one turn."""
+    llm = get_agent_llm()
+    llm_with_tools = get_agent_llm_with_tools()
+
+    # Build system context
+    system_context = build_enhanced_system_prompt(user_profile, meals_history, daily_log)
+
+    # Build message history
+    messages = build_message_history(chat_history, system_context)
+
+    # Add current user message
+    messages.append(HumanMessage(content=message))
+
+    return llm, llm_with_tools, messages
+
+
+async def _execute_tool_call(tool_call: dict) -> str:
+    """Run one tool call; failures and timeouts become an error card instead of raising."""
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+
+    print(f"[AGENT] Calling tool: {tool_name} with args: {tool_args}")
+
+    if tool_name not in TOOL_MAP:
+        print(f"[AGENT] Unknown tool: {tool_name}")
+        return json.dumps({
+            "card_type": "error",
+            "data": {"message": f"Unknown tool: {tool_name}"}
+        })
+
     try:
-        llm = get_agent_llm()
+        result = await asyncio.wait_for(
+            TOOL_MAP[tool_name].ainvoke(tool_args),
+            settings.agent_tool_timeout_seconds
+        )
+        print(f"[AGENT] Tool {tool_name} returned: {str(result)[:200]}")
+        return result
+    except asyncio.TimeoutError:
+        print(f"[AGENT] Tool {tool_name} timed out")
+        metrics.incr(f"agent_tools.{tool_name}.timeouts")
+        return json.dumps({
+            "card_type": "error",
+            "data": {"message": f"Tool {tool_name} timed out"}
+        })
+    except Exception as e:
+        print(f"[AGENT] Tool {tool_name} failed: {str(e)}")
+        return json.dumps({
+            "card_type": "error",
+            "data": {"message": f"Tool {tool_name} failed: {str(e)}"}
+        })
 
-        # Create tools bound to this user's context
-        tools = create_tools(user_id, supabase)
 
-        # Bind tools to the LLM
-        llm_with_tools = llm.bind_tools(tools)
+def _start_tool_calls(user_context: UserContext, tool_calls: list) -> List[asyncio.Task]:
+    """
+    Start all tool calls of a turn concurrently, acting for `user_context`.
+    A call that conflicts with an earlier one (see agent_tools.TOOL_STATE)
+    waits for it, so writes to the same counters keep the order the model
+    asked for. Tasks are returned in call order.
+    """
+    tasks = []
+    for index, tool_call in enumerate(tool_calls):
+        waits_for = [
+            tasks[earlier]
+            for earlier in range(index)
+            if tools_conflict(tool_calls[earlier]["name"], tool_call["name"])
+        ]
+        tasks.append(asyncio.ensure_future(_execute_after(waits_for, user_context, tool_call)))
+    return tasks
+
+
+async def _execute_after(waits_for: list, user_context: UserContext, tool_call: dict) -> str:
+    bind_user_context(user_context)  # Scoped to this task's copy of the context
+    if waits_for:
+        await asyncio.wait(waits_for)
+    return await _execute_tool_call(tool_call)
+
+
+def build_synthesis_prompt(tool_results: list) -> str:
+    """Prompt for the second LLM call that turns tool results into a short reply."""
+    # WORKAROUND: Gemini thinking models currently crash with "missing thought_signature" 
+    # if we pass raw ToolMessages back in multi-turn. We bypass this by having the raw LLM summarize the results.
+    synthesis_prompt = "You just executed tools to fetch/update data. The UI has automatically displayed cards with this data to the user.\n"
+    synthesis_prompt += "Here is the raw data that was returned:\n\n"
+    for res in tool_results:
+        synthesis_prompt += f"{res}\n"
+    synthesis_prompt += "\nPlease write a very brief, friendly 1-2 sentence response confirming this. Do not list out all the data numbers since the user can see the UI card. Be conversational."
+    return synthesis_prompt
+
+
+def _chunk_text(chunk) -> str:
+    """Text carried by a streamed message chunk (content may be a string or a list of parts)."""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content or []
+    )
 
-        # Build system context
-        system_context = build_enhanced_system_prompt(user_profile, meals_history, daily_log)
 
-        # Build message history
-        messages = build_message_history(chat_history, system_context)
+async def _fallback_response(
+    message: str,
+    user_profile: dict,
+    meals_history: list,
+    daily_log: dict,
+    chat_history: list,
+    error: Exception
+) -> str:
+    """Plain-text answer used when the agent fails, so chat never breaks (shares the request deadline)."""
+    try:
+        from services.langchain_chat import chat_with_context_basic
+        return await chat_with_context_basic(
+            message=message,
+            user_profile=user_profile,
+            meals_history=meals_history,
+            daily_log=daily_log,
+            chat_history=chat_history
+        )
+    except LLMOverloaded:
+        raise  # Out of time or provider down - report it instead of an apology
+    except Exception as fallback_error:
+        print(f"[AGENT ERROR] Fallback also failed: {str(fallback_error)}")
+        return f"I'm having trouble right now. Agent error: {str(error)[:100]}. Fallback error: {str(fallback_error)[:100]}"
+
+
+async def _run_agent(
+    message: str,
+    user_id: str,
+    user_profile: dict,
+    meals_history: list,
+    daily_log: dict,
+    chat_history: list,
+    user_context=None,
+    language: str = "en"
+) -> Dict[str, Any]:
+    """One agent turn: LLM call, tool execution, synthesis, with plain-chat fallback."""
+    if user_context is None:
+        user_context = UserContext(user_id)
 
-        # Add current user message
-        messages.append(HumanMessage(content=message))
+    # Simple intents ("drank a glass of water", "how am I doing?") skip the LLM
+    fast_result = await try_fast_path(message, user_context, language)
+    if fast_result is not None:
+        return fast_result
+
+    try:
+        llm, llm_with_tools, messages = _prepare_turn(
+            message, user_profile, meals_history, daily_log, chat_history
+        )
 
         # === First LLM call (may include tool_calls) ===
-        response = await llm_with_tools.ainvoke(messages)
+        response = await call_llm("agent", lambda: llm_with_tools.ainvoke(messages), user_id, hedge=True)
 
         ui_cards = []
         actions_taken = []
 
         # === Check if the LLM wants to call tools ===
         if response.tool_calls:
-            # Execute each tool call
-            tool_map = {t.name: t for t in tools}
-            tool_results = []
-
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-
-                print(f"[AGENT] Calling tool: {tool_name} with args: {tool_args}")
-                actions_taken.append(tool_name)
-
-                if tool_name in tool_map:
-                    try:
-                        result = tool_map[tool_name].invoke(tool_args)
-                        tool_results.append(result)
-                        print(f"[AGENT] Tool {tool_name} returned: {str(result)[:200]}")
-                    except Exception as e:
-                        print(f"[AGENT] Tool {tool_name} failed: {str(e)}")
-                        tool_results.append(json.dumps({
-                            "card_type": "error",
-                            "data": {"message": f"Tool {tool_name} failed: {str(e)}"}
-                        }))
-                else:
-                    print(f"[AGENT] Unknown tool: {tool_name}")
-                    tool_results.append(json.dumps({
-                        "card_type": "error",
-                        "data": {"message": f"Unknown tool: {tool_name}"}
-                    }))
+            # Execute the tool calls (concurrently where they do not conflict)
+            actions_taken = [tool_call["name"] for tool_call in response.tool_calls]
+            tool_results = await asyncio.gather(*_start_tool_calls(user_context, response.tool_calls))
 
             # Extract UI cards from tool results
             ui_cards = extract_ui_cards_from_tool_results(tool_results)
 
-            # === Second LLM call with tool results ===
-            # WORKAROUND: Gemini thinking models currently crash with "missing thought_signature" 
-            # if we pass raw ToolMessages back in multi-turn. We bypass this by having the raw LLM summarize the results.
-            
-            synthesis_prompt = "You just executed tools to fetch/update data. The UI has automatically displayed cards with this data to the user.\n"
-            synthesis_prompt += "Here is the raw data that was returned:\n\n"
-            for res in tool_results:
-                synthesis_prompt += f"{res}\n"
-            synthesis_prompt += "\nPlease write a very brief, friendly 1-2 sentence response confirming this. Do not list out all the data numbers since the user can see the UI card. Be conversational."
-            
-            messages.append(HumanMessage(content=synthesis_prompt))
-            
-            # Use base LLM (no tools bound) to prevent infinite tool loops and schema crashes
-            final_response = await llm.ainvoke(messages)
-            response_text = final_response.content
+            # Cards that already say it all get a templated reply (CHAT_RESPONSE_MODE)
+            response_text = template_reply(ui_cards, language)
+
+            if response_text is None:
+                # === Second LLM call with tool results ===
+                messages.append(HumanMessage(content=build_synthesis_prompt(tool_results)))
+                
+                # Use base LLM (no tools bound) to prevent infinite tool loops and schema crashes
+                final_response = await call_llm("agent_synthesis", lambda: llm.ainvoke(messages), user_id, hedge=True)
+                response_text = final_response.content
 
         else:
             # No tools called — plain text response
@@ -245,6 +397,8 @@ async def chat_with_agent(
             "actions_taken": actions_taken
         }
 
+    except LLMOverloaded:
+        raise  # Falling back would only add load
     except Exception as e:
         print(f"[AGENT ERROR] Agent failed, falling back to basic chat: {str(e)}")
         import traceback
@@ -252,24 +406,111 @@ async def chat_with_agent(
 
         # === FALLBACK: Use the old simple chat method ===
         # This ensures plain text chat NEVER breaks even if tool calling fails
-        try:
-            from services.langchain_chat import chat_with_context_basic
-            fallback_response = await chat_with_context_basic(
-                message=message,
-                user_profile=user_profile,
-                meals_history=meals_history,
-                daily_log=daily_log,
-                chat_history=chat_history
+        fallback_response = await _fallback_response(
+            message, user_profile, meals_history, daily_log, chat_history, e
+        )
+        return {
+            "response": fallback_response,
+            "ui_cards": [],
+            "actions_taken": []
+        }
+
+
+async def stream_agent(
+    message: str,
+    user_id: str,
+    user_profile: dict,
+    meals_history: list,
+    daily_log: dict,
+    chat_history: list,
+    user_context=None,
+    language: str = "en"
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of chat_with_agent.
+    
+    Yields events as they become available:
+        {"event": "card", "data": {...ui card...}}     - as soon as its tool finishes
+        {"event": "token", "data": {"text": "..."}}   - model text, chunk by chunk
+        {"event": "done", "data": {"response", "ui_cards", "actions_taken"}}
+    
+    Plain answers stream straight from the first LLM call; after tool calls
+    the synthesis call is streamed. Falls back to basic chat (sent as a single
+    token event) if the agent fails before any text was streamed.
+    """
+    if user_context is None:
+        user_context = UserContext(user_id)
+
+    fast_result = await try_fast_path(message, user_context, language)
+    if fast_result is not None:
+        for card in fast_result["ui_cards"]:
+            yield {"event": "card", "data": card}
+        yield {"event": "token", "data": {"text": fast_result["response"]}}
+        yield {"event": "done", "data": fast_result}
+        return
+
+    ui_cards = []
+    actions_taken = []
+    response_text = ""
+
+    try:
+        llm, llm_with_tools, messages = _prepare_turn(
+            message, user_profile, meals_history, daily_log, chat_history
+        )
+
+        # === First LLM call, streamed - text arrives before we know if tools follow ===
+        response = None
+        async with guarded_stream("agent", user_id) as timed:
+            async for chunk in timed(llm_with_tools.astream(messages)):
+                response = chunk if response is None else response + chunk
+                text = _chunk_text(chunk)
+                if text:
+                    response_text += text
+                    yield {"event": "token", "data": {"text": text}}
+
+        if response is not None and response.tool_calls:
+            actions_taken = [tool_call["name"] for tool_call in response.tool_calls]
+            tasks = _start_tool_calls(user_context, response.tool_calls)
+
+            # Cards go out in completion order; the synthesis prompt keeps call order
+            for next_done in asyncio.as_completed(tasks):
+                for card in extract_ui_cards_from_tool_results([await next_done]):
+                    ui_cards.append(card)
+                    yield {"event": "card", "data": card}
+            tool_results = [task.result() for task in tasks]
+
+            templated = template_reply(ui_cards, language)
+            if templated is not None:
+                response_text += templated
+                yield {"event": "token", "data": {"text": templated}}
+            else:
+                # === Second LLM call, streamed token by token ===
+                messages.append(HumanMessage(content=build_synthesis_prompt(tool_results)))
+                async with guarded_stream("agent_synthesis", user_id) as timed:
+                    async for chunk in timed(llm.astream(messages)):
+                        text = _chunk_text(chunk)
+                        if text:
+                            response_text += text
+                            yield {"event": "token", "data": {"text": text}}
+
+    except LLMOverloaded:
+        raise  # Falling back would only add load
+    except Exception as e:
+        print(f"[AGENT ERROR] Streaming agent failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+        if not response_text:
+            response_text = await _fallback_response(
+                message, user_profile, meals_history, daily_log, chat_history, e
             )
-            return {
-                "response": fallback_response,
-                "ui_cards": [],
-                "actions_taken": []
-            }
-        except Exception as fallback_error:
-            print(f"[AGENT ERROR] Fallback also failed: {str(fallback_error)}")
-            return {
-                "response": f"I'm having trouble right now. Agent error: {str(e)[:100]}. Fallback error: {str(fallback_error)[:100]}",
-                "ui_cards": [],
-                "actions_taken": []
-            }
+            yield {"event": "token", "data": {"text": response_text}}
+
+    yield {
+        "event": "done",
+        "data": {
+            "response": response_text,
+            "ui_cards": ui_cards,
+            "actions_taken": actions_taken
+        }
+    }
@@ -0,0 +1,372 @@
+"""
+Background jobs for photo meal analysis.
+
+`POST /api/meals/analyze/jobs` stores the preprocessed photo as a job and
+answers 202 with its id right away. A pool of workers runs the Gemini call
+and the meal writes; the client polls `GET /api/meals/jobs/{id}` or
+subscribes to `GET /api/meals/jobs/{id}/events` (SSE). The upload request no
+longer waits on the vision call, so it stays well inside serverless function
+time limits.
+
+Queue backends (JOB_QUEUE_BACKEND):
+  - memory:   in-process; jobs do not survive a restart (tests, single process)
+  - database: `analysis_jobs` table on the DATABASE_BACKEND store, shared by
+              every API instance and worker (see docs/database-architecture.md);
+              `supabase` is accepted too
+
+A worker claims a job with a lease (ANALYSIS_JOB_LEASE_SECONDS) and renews it
+while the job runs. If the worker dies, the lease runs out and the next claim
+picks the job up again, up to ANALYSIS_JOB_MAX_ATTEMPTS runs. Handlers must
+be safe to re-run - the meal handler derives the meal id from the job id, so
+a second run finds the meal already logged instead of logging it twice.
+
+Workers run inside the API process (ANALYSIS_JOB_WORKERS, started in
+main.py) or on their own with `python worker.py`.
+"""
+
+import asyncio
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from config import settings
+from services.llm_resilience import deadline_scope
+from services.llm_scheduler import LLMOverloaded, set_llm_user
+from services.metrics import metrics
+from services.repositories import DuplicateKey
+from services.repositories import analysis_jobs as jobs_table
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(kind: str, handler: JobHandler) -> None:
+    """Run jobs of `kind` with `handler(job)`; its return value becomes the job result."""
+    _handlers[kind] = handler
+
+
+def new_job(job_id: str, user_id: str, kind: str, payload: dict) -> dict:
+    return {
+        "id": job_id,
+        "user_id": user_id,
+        "kind": kind,
+        "status": QUEUED,
+        "input": payload,
+        "result": None,
+        "error": None,
+        "attempts": 0,
+    }
+
+
+def public_job(job: dict) -> dict:
+    """The job as returned to clients (no input payload or lease bookkeeping)."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+    }
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MemoryJobQueue:
+    """
+    In-process queue. Lease expiry works the same as in the shared backend,
+    so a crashed worker task's job is picked up by another worker.
+    """
+
+    def __init__(self, lease_seconds: float, max_attempts: int, ttl_seconds: float):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, dict] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._work = asyncio.Event()
+
+    def _notify(self, job_id: str) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _update(self, job: dict, **fields) -> None:
+        job.update(fields, updated_at=_now_iso())
+        self._notify(job["id"])
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j["id"] for j in self._jobs.values() if j["status"] in FINISHED and j["_updated"] < cutoff]:
+            del self._jobs[job_id]
+            self._changed.pop(job_id, None)
+
+    async def enqueue(self, job: dict) -> dict:
+        """Add `job`; a job with the same id already queued is returned instead."""
+        self._purge()
+        existing = self._jobs.get(job["id"])
+        if existing is not None:
+            return dict(existing)
+        now = _now_iso()
+        self._jobs[job["id"]] = {**job, "created_at": now, "updated_at": now, "available_at": 0.0, "_updated": time.time()}
+        self._work.set()
+        return dict(self._jobs[job["id"]])
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        now = time.time()
+        for job in self._jobs.values():
+            ready = job["status"] == QUEUED and job["available_at"] <= now
+            abandoned = job["status"] == RUNNING and job["lease_expires_at"] <= now
+            if not (ready or abandoned):
+                continue
+            if job["attempts"] >= self.max_attempts:
+                self._update(job, status=FAILED, input=None, _updated=now,
+                             error={"detail": f"Job abandoned after {job['attempts']} attempts", "status": 500})
+                continue
+            self._update(job, status=RUNNING, worker_id=worker_id, attempts=job["attempts"] + 1,
+                         lease_expires_at=now + self.lease_seconds, _updated=now)
+            return dict(job)
+        self._work.clear()
+        return None
+
+    def _owned(self, job_id: str, worker_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != RUNNING or job.get("worker_id") != worker_id:
+            return None
+        return job
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend the lease; False if the job was claimed by someone else meanwhile."""
+        job = self._owned(job_id, worker_id)
+        if job is None:
+            return False
+        job["lease_expires_at"] = time.time() + self.lease_seconds
+        return True
+
+    async def finish(self, job_id: str, worker_id: str, status: str, result: dict = None, error: dict = None) -> None:
+        job = self._owned(job_id, worker_id)
+        if job is not None:
+            self._update(job, status=status, result=result, error=error, input=None, worker_id=None, _updated=time.time())
+
+    async def retry(self, job_id: str, worker_id: str, delay_seconds: float, error: dict) -> None:
+        job = self._owned(job_id, worker_id)
+        if job is not None:
+            self._update(job, status=QUEUED, error=error, worker_id=None,
+                         available_at=time.time() + delay_seconds, _updated=time.time())
+            self._work.set()
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """Return when the job changes, or after `timeout` seconds."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def wait_for_work(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._work.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class DatabaseJobQueue:
+    """
+    Jobs in the `analysis_jobs` table on the DATABASE_BACKEND store. Claims
+    go through the `claim_analysis_job` function (FOR UPDATE SKIP LOCKED), so
+    any number of workers can share the table. Finished jobs older than
+    `ttl_seconds` are deleted now and then on enqueue.
+    """
+
+    def __init__(self, lease_seconds: float, max_attempts: int, ttl_seconds: float,
+                 poll_seconds: float, purge_every: int = 100):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.purge_every = purge_every
+
+    def _in(self, seconds: float) -> str:
+        return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+    async def enqueue(self, job: dict) -> dict:
+        try:
+            await jobs_table.insert([job])
+        except DuplicateKey:
+            pass
+        if random.randrange(self.purge_every) == 0:
+            await jobs_table.delete_finished_before(list(FINISHED), self._in(-self.ttl_seconds))
+        return await self.get(job["id"])
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await jobs_table.get(job_id)
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        return await jobs_table.claim(worker_id, int(self.lease_seconds), self.max_attempts)
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        rows = await jobs_table.update_owned(job_id, worker_id, {"lease_expires_at": self._in(self.lease_seconds)})
+        return bool(rows)
+
+    async def finish(self, job_id: str, worker_id: str, status: str, result: dict = None, error: dict = None) -> None:
+        await jobs_table.update_owned(job_id, worker_id, {
+            "status": status,
+            "result": result,
+            "error": error,
+            "input": None,  # The photo is not needed any more
+            "worker_id": None,
+            "lease_expires_at": None,
+        })
+
+    async def retry(self, job_id: str, worker_id: str, delay_seconds: float, error: dict) -> None:
+        await jobs_table.update_owned(job_id, worker_id, {
+            "status": QUEUED,
+            "error": error,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "available_at": self._in(delay_seconds),
+        })
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        await asyncio.sleep(min(self.poll_seconds, timeout))
+
+    async def wait_for_work(self, timeout: float) -> None:
+        await asyncio.sleep(min(self.poll_seconds, timeout))
+
+
+def create_job_queue():
+    """Build the queue configured by JOB_QUEUE_BACKEND."""
+    backend_name = settings.job_queue_backend.lower()
+    common = dict(
+        lease_seconds=settings.analysis_job_lease_seconds,
+        max_attempts=settings.analysis_job_max_attempts,
+        ttl_seconds=settings.analysis_job_ttl_seconds,
+    )
+    if backend_name == "memory":
+        return MemoryJobQueue(**common)
+    if backend_name in ("database", "supabase"):
+        return DatabaseJobQueue(poll_seconds=settings.analysis_job_poll_seconds, **common)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {settings.job_queue_backend}")
+
+
+job_queue = create_job_queue()
+
+
+# --- Workers ---
+
+async def _keep_lease(queue, job_id: str, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        try:
+            if not await queue.heartbeat(job_id, worker_id):
+                print(f"[WARN] Lost the lease on job {job_id}")
+                return
+        except Exception as e:
+            print(f"[WARN] Job heartbeat failed: {str(e)}")  # Next beat retries
+
+
+async def run_job(queue, job: dict, worker_id: str) -> None:
+    """Run one claimed job and record its outcome."""
+    job_id = job["id"]
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        await queue.finish(job_id, worker_id, FAILED, error={"detail": f"Unknown job kind: {job['kind']}", "status": 500})
+        return
+
+    lease = asyncio.ensure_future(_keep_lease(queue, job_id, worker_id))
+    started = time.monotonic()
+    try:
+        set_llm_user(job["user_id"])
+        with deadline_scope(settings.analysis_job_timeout_seconds):
+            result = await handler(job)
+    except LLMOverloaded as e:
+        error = {"detail": str(e), "status": e.status_code}
+        if job["attempts"] < queue.max_attempts:
+            print(f"[WARN] Job {job_id} shed ({e.reason}), retrying in {e.retry_after}s")
+            metrics.incr("analysis_jobs.retried")
+            await queue.retry(job_id, worker_id, e.retry_after, error)
+        else:
+            metrics.incr("analysis_jobs.failed")
+            await queue.finish(job_id, worker_id, FAILED, error=error)
+    except HTTPException as e:
+        metrics.incr("analysis_jobs.failed")
+        await queue.finish(job_id, worker_id, FAILED, error={"detail": e.detail, "status": e.status_code})
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} failed: {str(e)}")
+        traceback.print_exc()
+        metrics.incr("analysis_jobs.failed")
+        await queue.finish(job_id, worker_id, FAILED, error={"detail": str(e), "status": 500})
+    else:
+        metrics.incr("analysis_jobs.succeeded")
+        await queue.finish(job_id, worker_id, SUCCEEDED, result=result)
+    finally:
+        lease.cancel()
+        metrics.incr("analysis_jobs.run_ms_total", (time.monotonic() - started) * 1000)
+
+
+class JobWorkerPool:
+    """`concurrency` worker loops claiming and running jobs from `queue`."""
+
+    def __init__(self, queue, concurrency: int):
+        self.queue = queue
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [asyncio.ensure_future(self._work(f"{prefix}:{i}")) for i in range(self.concurrency)]
+        if self._tasks:
+            print(f"[DEBUG] Started {len(self._tasks)} analysis job workers")
+
+    async def stop(self) -> None:
+        # Jobs cut off here are claimed again once their lease runs out
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                metrics.incr("analysis_jobs.claim_errors")
+                print(f"[WARN] Job claim failed: {str(e)}")
+                await asyncio.sleep(settings.analysis_job_poll_seconds)
+                continue
+            if job is None:
+                await self.queue.wait_for_work(settings.analysis_job_poll_seconds)
+                continue
+            if job["attempts"] > 1:
+                metrics.incr("analysis_jobs.reruns")
+            try:
+                await run_job(self.queue, job, worker_id)
+            except Exception as e:
+                # Recording the outcome failed; the lease runs out and the job is retried
+                metrics.incr("analysis_jobs.errors")
+                print(f"[WARN] Job {job['id']} outcome not saved: {str(e)}")
+
+
+job_workers = JobWorkerPool(job_queue, settings.analysis_job_workers)
@@ -1,9 +1,104 @@
+import hashlib
+import time
+from typing import Optional
+
+import jwt
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from config import settings
 from services.supabase_client import get_supabase
+from services.db import run_sync
+from services.llm_scheduler import set_llm_user
+from services.ttl_cache import TTLCache
 
 security = HTTPBearer()
 
+SUPABASE_JWT_AUDIENCE = "authenticated"
+
+
+class TokenCache:
+    """
+    Thread-safe LRU cache of verified users keyed by SHA-256 of the token.
+    Each entry expires at the token's own `exp` claim.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = TTLCache(max_size, clock=time.time)
+
+    @staticmethod
+    def key_for(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        return self._entries.get(self.key_for(token))
+
+    def set(self, token: str, user: dict, expires_at: float) -> None:
+        self._entries.set(self.key_for(token), user, expires_at - time.time())
+
+
+token_cache = TokenCache(settings.auth_cache_size)
+
+_jwks_client: Optional[jwt.PyJWKClient] = None
+
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    """JWKS client for projects using asymmetric signing keys (keys are cached)."""
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(
+            f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+            cache_keys=True,
+        )
+    return _jwks_client
+
+
+async def _verify_locally(token: str) -> Optional[dict]:
+    """
+    Verify a Supabase JWT offline. Returns the decoded claims, or None when no
+    verification key is configured for the token's algorithm.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg", "")
+
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            return None
+        key = settings.supabase_jwt_secret
+    elif algorithm in ("RS256", "ES256"):
+        # First use fetches the JWKS over the network; afterwards keys come from memory
+        signing_key = await run_sync(_get_jwks_client().get_signing_key_from_jwt, token)
+        key = signing_key.key
+    else:
+        raise jwt.InvalidTokenError(f"Unsupported token algorithm: {algorithm}")
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+async def _verify_remotely(token: str) -> dict:
+    """Verify the token with the Supabase auth server (one network round trip)."""
+    supabase = get_supabase()
+    user_response = await run_sync(supabase.auth.get_user, token)
+
+    if not user_response or not user_response.user:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token"
+        )
+
+    # The server has validated the token, so its exp claim can be trusted for caching
+    claims = jwt.decode(token, options={"verify_signature": False})
+    return {
+        "sub": user_response.user.id,
+        "email": user_response.user.email,
+        "exp": claims.get("exp", 0),
+    }
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(security)
@@ -11,24 +106,31 @@ async def get_current_user(
     """
     Verify JWT token from Supabase and return user info.
     This dependency validates the access token sent from the mobile app.
+
+    With AUTH_VERIFICATION=local the signature is checked in-process using the
+    project JWT secret (HS256) or the project's JWKS (RS256/ES256). If no key is
+    available for the token, or AUTH_VERIFICATION=remote, the Supabase auth
+    server is asked instead. Verified tokens are cached until they expire.
     """
     token = credentials.credentials
-    
+
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     try:
-        supabase = get_supabase()
-        # Verify the JWT token with Supabase
-        user_response = supabase.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid or expired token"
-            )
-        
-        return {
-            "id": user_response.user.id,
-            "email": user_response.user.email,
+        claims = None
+        if settings.auth_verification == "local":
+            claims = await _verify_locally(token)
+        if claims is None:
+            claims = await _verify_remotely(token)
+
+        user = {
+            "id": claims["sub"],
+            "email": claims.get("email"),
         }
+        token_cache.set(token, user, float(claims.get("exp", 0)))
+        return user
     except Exception as e:
         raise HTTPException(
             status_code=401,
@@ -36,6 +138,7 @@ async def get_current_user(
         )
 
 
-def get_user_id(current_user: dict = Depends(get_current_user)) -> str:
-    """Extract user ID from current user."""
+async def get_user_id(current_user: dict = Depends(get_current_user)) -> str:
+    """Extract user ID from current user (and attribute this request's LLM calls to them)."""
+    set_llm_user(current_user["id"])  # async, so it runs in the request's own context
     return current_user["id"]
@@ -0,0 +1,159 @@
+"""
+Bounded conversation memory for Fit Buddy prompts.
+
+Instead of replaying raw `chat_messages` rows (assistant rows can hold a full
+JSON blob of UI cards), each prompt gets:
+  - a rolling summary of older turns, kept per user in `chat_memory`;
+  - the most recent turns, up to CHAT_MEMORY_MAX_TURNS and
+    CHAT_MEMORY_TOKEN_BUDGET (estimated tokens), with card payloads reduced
+    to a short "[shown: water_card]" note.
+
+The summary is refreshed after the response is sent (`refresh_summary`, run
+as a background task before the history trim): messages older than the
+recent window and newer than `summarized_through` are folded into the
+existing summary with one small LLM call, once at least
+CHAT_SUMMARY_BATCH_MESSAGES of them have piled up.
+"""
+
+import json
+from typing import List, Optional
+from langchain_core.messages import HumanMessage
+from config import settings
+from services.llm_clients import get_summary_llm
+from services.llm_resilience import call_llm, deadline_scope
+from services.llm_scheduler import PRIORITY_BACKGROUND
+from services.metrics import metrics
+from services.repositories import chat_memory, chat_messages
+from services.singleflight import SingleFlight
+
+# Rough chars-per-token for Gemini on English text; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """You maintain a running memory of a conversation between a user and Fit Buddy, an AI health assistant.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Rewrite the summary so it also covers the new messages. Keep facts that matter for future advice:
+goals, preferences, dislikes, health details, foods eaten, plans and promises made. Drop greetings and
+small talk. Write plain sentences, at most {max_words} words. Return only the summary."""
+
+# Concurrent refreshes for one user share a single run
+_inflight = SingleFlight("chat_memory")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def strip_ui_cards(content: str) -> str:
+    """Assistant content without the UI card JSON - just its text and the card types shown."""
+    if not content or not content.lstrip().startswith("{"):
+        return content or ""
+    try:
+        payload = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return content
+    if not isinstance(payload, dict) or "text" not in payload:
+        return content
+
+    text = payload.get("text") or ""
+    card_types = [card.get("card_type", "card") for card in payload.get("ui_cards") or [] if isinstance(card, dict)]
+    if card_types:
+        text = f"{text} [shown: {', '.join(card_types)}]".strip()
+    return text
+
+
+def select_recent_turns(messages: list, max_turns: int, token_budget: int) -> list:
+    """
+    Newest messages (oldest first in the result) within `max_turns` turns and
+    `token_budget` tokens. Card payloads are stripped before counting.
+    """
+    selected = []
+    tokens = 0
+    for msg in reversed(messages):
+        if len(selected) >= max_turns * 2:
+            break
+        content = strip_ui_cards(msg.get("content", ""))
+        cost = estimate_tokens(content)
+        if selected and tokens + cost > token_budget:
+            break
+        tokens += cost
+        selected.append({"role": msg.get("role"), "content": content})
+    return list(reversed(selected))
+
+
+def build_prompt_history(messages: list, summary: Optional[str]) -> list:
+    """
+    History rows for the agent: the summary (as a system row, which
+    build_message_history folds into the system prompt) then the recent turns.
+    """
+    recent = select_recent_turns(messages, settings.chat_memory_max_turns, settings.chat_memory_token_budget)
+    metrics.incr("chat_memory.prompt_tokens", sum(estimate_tokens(m["content"]) for m in recent))
+    if not summary:
+        return recent
+    return [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}] + recent
+
+
+async def load_summary(user_id: str) -> Optional[str]:
+    row = await chat_memory.get(user_id, columns="summary")
+    return row.get("summary") if row else None
+
+
+def _transcript(messages: List[dict]) -> str:
+    lines = []
+    for msg in messages:
+        speaker = "User" if msg.get("role") == "user" else "Fit Buddy"
+        lines.append(f"{speaker}: {strip_ui_cards(msg.get('content', ''))}")
+    return "\n".join(lines)
+
+
+async def _refresh_summary(user_id: str) -> None:
+    row = await chat_memory.get(user_id, columns="summary, summarized_through") or {}
+    summary = row.get("summary") or ""
+    summarized_through = row.get("summarized_through")
+
+    messages = await chat_messages.after(
+        user_id, summarized_through, settings.chat_history_limit, columns="role, content, created_at"
+    )
+
+    # Only messages that have left the recent window are summarized
+    pending = messages[:max(len(messages) - settings.chat_memory_max_turns * 2, 0)]
+    if len(pending) < settings.chat_summary_batch_messages:
+        return
+
+    prompt = SUMMARY_PROMPT.format(
+        summary=summary or "(none yet)",
+        transcript=_transcript(pending),
+        max_words=settings.chat_summary_max_words,
+    )
+    response = await call_llm(
+        "chat_summary", lambda: get_summary_llm().ainvoke([HumanMessage(content=prompt)]),
+        user_id, PRIORITY_BACKGROUND
+    )
+    metrics.incr("chat_memory.summaries")
+
+    await chat_memory.save({
+        "user_id": user_id,
+        "summary": response.content.strip(),
+        "summarized_through": pending[-1]["created_at"],
+    })
+    print(f"[DEBUG] Chat memory summarized {len(pending)} messages for {user_id}")
+
+
+async def refresh_summary(user_id: str) -> None:
+    """Fold messages that left the recent window into the user's summary (background task)."""
+    try:
+        # Runs after the response, so it gets its own time budget rather than the request's
+        with deadline_scope(settings.request_deadline_seconds):
+            await _inflight.do(user_id, lambda: _refresh_summary(user_id))
+    except Exception as e:
+        metrics.incr("chat_memory.errors")
+        print(f"[WARN] Chat memory refresh failed: {str(e)}")  # Next turn retries
+
+
+async def clear_memory(user_id: str) -> None:
+    await chat_memory.delete(user_id)
@@ -0,0 +1,37 @@
+"""
+Atomic updates of the per-day counters in `daily_logs`.
+
+Counters (calories_in, calories_out, water_ml) are never read-modify-written
+from Python. `increment_daily_metrics` calls the `increment_daily_metrics`
+Postgres function (see docs/database-architecture.md), which upserts on
+(user_id, date) and adds the deltas in a single statement - one round trip,
+and concurrent requests cannot overwrite each other's updates.
+"""
+
+from typing import Optional
+from services.repositories import daily_logs
+from services.user_context import UserContext
+
+
+def remember_daily_log(user_context: UserContext, row: Optional[dict]) -> None:
+    """Keep the user's context snapshot in step with a daily_logs row returned by a write."""
+    if row:
+        user_context.set_daily_log(row)
+    else:
+        user_context.invalidate(profile=False)
+
+
+async def increment_daily_metrics(
+    user_context: UserContext,
+    calories_in: int = 0,
+    calories_out: int = 0,
+    water_ml: int = 0,
+    log_date: Optional[str] = None,
+) -> dict:
+    """
+    Add deltas (may be negative) to a day's counters, creating the row if needed.
+    Returns the updated daily_logs row and refreshes the user's context snapshot.
+    """
+    row = await daily_logs.increment(user_context.user_id, calories_in, calories_out, water_ml, log_date)
+    remember_daily_log(user_context, row)
+    return row or {}
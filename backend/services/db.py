@@ -0,0 +1,70 @@
+"""
+Non-blocking access to the Supabase client.
+
+The supabase-py client is synchronous: every `.execute()` is a blocking HTTP
+round trip to PostgREST. Calling it directly from an `async def` handler stalls
+the uvicorn event loop for every other request in the worker, so all queries go
+through a bounded thread pool instead.
+
+Usage:
+    result = await run_query(
+        supabase.table("profiles").select("*").eq("id", user_id).single()
+    )
+
+Independent reads for one request should be started together so the request
+waits for the slowest query rather than the sum of all of them:
+
+    profile, meals = await asyncio.gather(
+        load_with_fallback("profile", user_context.get_profile(), {}),
+        load_with_fallback("meals", run_query(meals_query), None),
+    )
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+from config import settings
+from services.metrics import metrics
+
+# Bounded pool - caps concurrent PostgREST calls per worker process
+_executor = ThreadPoolExecutor(
+    max_workers=settings.db_max_workers,
+    thread_name_prefix="supabase-db",
+)
+
+
+async def run_sync(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the DB thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+async def run_query(query) -> Any:
+    """Execute a PostgREST query builder without blocking the event loop.
+
+    Pass the builder *without* calling `.execute()` - it is called on the pool.
+    """
+    return await run_sync(query.execute)
+
+
+async def load_with_fallback(
+    name: str,
+    loader: Awaitable[Any],
+    fallback: Any,
+    timeout: Optional[float] = None,
+) -> Any:
+    """Await a context loader, returning `fallback` if it fails or takes longer than `timeout`.
+
+    For optional context (prompt personalization, history) where a degraded answer
+    beats a failed request. The timeout defaults to CONTEXT_LOAD_TIMEOUT_SECONDS.
+    """
+    try:
+        return await asyncio.wait_for(loader, timeout or settings.context_load_timeout_seconds)
+    except asyncio.TimeoutError:
+        print(f"[WARN] Loading {name} timed out, using fallback")
+        metrics.incr(f"context_loader.{name}.timeouts")
+    except Exception as e:
+        print(f"[WARN] Loading {name} failed, using fallback: {str(e)}")
+        metrics.incr(f"context_loader.{name}.errors")
+    return fallback
@@ -1,8 +1,13 @@
-import google.generativeai as genai
 from config import settings
-import json
-import base64
-from typing import Optional
+from typing import Optional, Type
+from pydantic import BaseModel
+from models import MealAnalysisResult, MealTextAnalysisResult, MenuAnalysisResult, PantryAnalysisResult
+from services.llm_cache import llm_cache, cache_key
+from services.llm_clients import get_gemini_model
+from services.llm_resilience import call_llm
+from services.llm_scheduler import LLMOverloaded
+from services.singleflight import SingleFlight
+from services.structured_output import generation_config, parse_structured
 
 # Import prompts from prompts.py
 from services.prompts import (
@@ -13,39 +18,35 @@ from services.prompts import (
     CHAT_SYSTEM_PROMPT
 )
 
-# Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
 
-# Models - Using model from environment config
-vision_model = genai.GenerativeModel(settings.gemini_model)
-text_model = genai.GenerativeModel(settings.gemini_model)
+# Identical analyses in flight at the same time (double taps, retries) share one call
+_inflight = SingleFlight("gemini")
 
 
-def _parse_json_response(text: str) -> dict:
-    """Parse JSON from Gemini response, handling markdown code blocks."""
-    # Remove markdown code blocks if present
-    text = text.strip()
-    if text.startswith('```json'):
-        text = text[7:]
-    elif text.startswith('```'):
-        text = text[3:]
-    if text.endswith('```'):
-        text = text[:-3]
-    
-    return json.loads(text.strip())
+async def _generate_json(kind: str, contents, schema: Type[BaseModel]) -> dict:
+    """One analysis call (safe to hedge); the reply is validated against `schema`, repaired if needed."""
+    config = generation_config(schema) if settings.gemini_structured_output else None
+    response = await call_llm(kind, lambda: get_gemini_model().generate_content_async(
+        contents, generation_config=config
+    ), hedge=True)
+    print(f"[DEBUG] Gemini {kind} response received, raw text: {response.text[:300]}...")
+    return await parse_structured(kind, response.text, schema)
+
+
+async def _cached_analysis(kind: str, key: str, compute) -> dict:
+    """Run an analysis at most once per key: coalesce concurrent calls, then cache the result."""
+    return await _inflight.do(key, lambda: llm_cache.get_or_compute(kind, key, compute))
 
 
 async def analyze_meal_image(
     image_data: bytes,
     user_profile: dict = None,
-    calories_consumed: int = 0
+    calories_consumed: int = 0,
+    mime_type: str = "image/jpeg"
 ) -> dict:
     """Analyze a meal image using Gemini Vision with personalized context."""
     try:
         print(f"[DEBUG] analyze_meal_image called, image size: {len(image_data)} bytes")
-        print(f"[DEBUG] User profile: {user_profile}")
-        print(f"[DEBUG] Calories consumed today: {calories_consumed}")
-        
         # Default profile values
         profile = user_profile or {}
         gender = profile.get("gender", "unknown")
@@ -66,22 +67,25 @@ async def analyze_meal_image(
             preferred_tasks=", ".join(preferred_tasks) if preferred_tasks else "walking"
         )
         
-        # Create image part for Gemini
-        image_parts = [
-            {"mime_type": "image/jpeg", "data": base64.b64encode(image_data).decode()}
-        ]
-        print("[DEBUG] Image encoded to base64")
-        
-        print("[DEBUG] Sending request to Gemini Vision API...")
-        response = await vision_model.generate_content_async([
-            prompt,
-            {"inline_data": image_parts[0]}
-        ])
-        print(f"[DEBUG] Gemini response received, raw text: {response.text[:300]}...")
+        async def compute() -> dict:
+            # Raw bytes go straight into the request blob - no base64 copy
+            print("[DEBUG] Sending request to Gemini Vision API...")
+            result = await _generate_json("meal_image", [
+                prompt,
+                {"mime_type": mime_type, "data": image_data}
+            ], MealAnalysisResult)
+            print(f"[DEBUG] JSON parsed successfully")
+            return result
         
-        result = _parse_json_response(response.text)
-        print(f"[DEBUG] JSON parsed successfully")
-        return result
+        # calories_consumed is left out of the key: it changes as soon as the
+        # first upload is logged, and retries/re-uploads must still hit
+        key = cache_key("meal_image", MEAL_ANALYSIS_PROMPT_TEMPLATE, image_data, {
+            "gender": gender, "age": age, "height": height, "weight": weight,
+            "calorie_target": calorie_target, "preferred_tasks": preferred_tasks,
+        })
+        return await _cached_analysis("meal_image", key, compute)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"[ERROR] analyze_meal_image failed: {str(e)}")
         import traceback
@@ -105,6 +109,7 @@ async def analyze_meal_text(
         calorie_target = profile.get("daily_calorie_target", 2000)
         preferred_tasks = profile.get("preferred_tasks", ["walking"])
         
+        text = " ".join(text.split())
         prompt = MEAL_TEXT_PROMPT.format(
             text=text,
             gender=gender,
@@ -115,8 +120,17 @@ async def analyze_meal_text(
             calories_consumed=calories_consumed,
             preferred_tasks=", ".join(preferred_tasks) if preferred_tasks else "walking"
         )
-        response = await text_model.generate_content_async(prompt)
-        return _parse_json_response(response.text)
+        async def compute() -> dict:
+            return await _generate_json("meal_text", prompt, MealTextAnalysisResult)
+        
+        # Same key fields as the photo path - calories_consumed left out
+        key = cache_key("meal_text", MEAL_TEXT_PROMPT, text, {
+            "gender": gender, "age": age, "height": height, "weight": weight,
+            "calorie_target": calorie_target, "preferred_tasks": preferred_tasks,
+        })
+        return await _cached_analysis("meal_text", key, compute)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to analyze meal text: {str(e)}")
 
@@ -126,10 +140,15 @@ async def analyze_menu(
     allergies: list = [],
     conditions: list = [],
     preferences: list = [],
-    calories_remaining: int = 2000
+    calories_remaining: int = 2000,
+    mime_type: str = "image/jpeg"
 ) -> dict:
     """Analyze a menu image and suggest healthy options."""
     try:
+        # Sorted lists and a 50 kcal budget bucket let users with the same
+        # constraints share cached results for the same menu
+        allergies, conditions, preferences = sorted(allergies or []), sorted(conditions or []), sorted(preferences or [])
+        calories_remaining = int(round(calories_remaining / 50.0)) * 50
         prompt = MENU_SUGGESTION_PROMPT.format(
             allergies=", ".join(allergies) if allergies else "None",
             conditions=", ".join(conditions) if conditions else "None",
@@ -137,16 +156,19 @@ async def analyze_menu(
             calories_remaining=calories_remaining
         )
         
-        image_parts = [
-            {"mime_type": "image/jpeg", "data": base64.b64encode(image_data).decode()}
-        ]
-        
-        response = await vision_model.generate_content_async([
-            prompt,
-            {"inline_data": image_parts[0]}
-        ])
+        async def compute() -> dict:
+            return await _generate_json("menu", [
+                prompt,
+                {"mime_type": mime_type, "data": image_data}
+            ], MenuAnalysisResult)
         
-        return _parse_json_response(response.text)
+        key = cache_key("menu", MENU_SUGGESTION_PROMPT, image_data, {
+            "allergies": allergies, "conditions": conditions,
+            "preferences": preferences, "calories_remaining": calories_remaining,
+        })
+        return await _cached_analysis("menu", key, compute)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to analyze menu: {str(e)}")
 
@@ -155,26 +177,30 @@ async def analyze_pantry(
     image_data: bytes,
     allergies: list = [],
     conditions: list = [],
-    preferences: list = []
+    preferences: list = [],
+    mime_type: str = "image/jpeg"
 ) -> dict:
     """Analyze a pantry/fridge image and suggest recipes."""
     try:
+        allergies, conditions, preferences = sorted(allergies or []), sorted(conditions or []), sorted(preferences or [])
         prompt = COOKING_HELPER_PROMPT.format(
             allergies=", ".join(allergies) if allergies else "None",
             conditions=", ".join(conditions) if conditions else "None",
             preferences=", ".join(preferences) if preferences else "None"
         )
         
-        image_parts = [
-            {"mime_type": "image/jpeg", "data": base64.b64encode(image_data).decode()}
-        ]
-        
-        response = await vision_model.generate_content_async([
-            prompt,
-            {"inline_data": image_parts[0]}
-        ])
+        async def compute() -> dict:
+            return await _generate_json("pantry", [
+                prompt,
+                {"mime_type": mime_type, "data": image_data}
+            ], PantryAnalysisResult)
         
-        return _parse_json_response(response.text)
+        key = cache_key("pantry", COOKING_HELPER_PROMPT, image_data, {
+            "allergies": allergies, "conditions": conditions, "preferences": preferences,
+        })
+        return await _cached_analysis("pantry", key, compute)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to analyze pantry: {str(e)}")
 
@@ -198,11 +224,13 @@ async def chat(
             steps=daily_log.get("steps", 0)
         )
         
-        response = await text_model.generate_content_async([
+        response = await call_llm("chat", lambda: get_gemini_model().generate_content_async([
             system_prompt,
             f"User message: {message}"
-        ])
+        ]))
         
         return response.text
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise Exception(f"Chat failed: {str(e)}")
@@ -0,0 +1,63 @@
+"""
+Idempotency-Key support for write endpoints.
+
+Clients may send an `Idempotency-Key` header (any unique string, e.g. a UUID
+generated when the user taps "log"). Requests carrying the same key for the
+same user and endpoint:
+  - while the first is still running, wait for it and get the same response;
+  - after it finished, get the stored response back without re-running it.
+
+The response store is per process. Across processes and restarts the meal
+routes additionally derive the meal_history id from the key
+(`idempotent_id`), so a replay hits the primary key and is recognised as a
+duplicate instead of inserting a second row.
+"""
+
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+from config import settings
+from services.metrics import metrics
+from services.singleflight import SingleFlight
+from services.ttl_cache import TTLCache
+
+IDEMPOTENCY_NAMESPACE = uuid.UUID("8f5b8a0e-4f0c-4d55-9d0b-6a1f3c2e7b41")
+
+# Postgres unique_violation
+UNIQUE_VIOLATION = "23505"
+
+response_store = TTLCache(max_entries=10000)  # Finished responses
+_inflight = SingleFlight("idempotent_request")
+
+
+def idempotent_id(user_id: str, idempotency_key: str, scope: str) -> str:
+    """Deterministic row id for a user's idempotent request."""
+    return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, f"{scope}:{user_id}:{idempotency_key}"))
+
+
+def is_unique_violation(error: Exception) -> bool:
+    return getattr(error, "code", None) == UNIQUE_VIOLATION
+
+
+async def run_idempotent(
+    scope: str,
+    user_id: str,
+    idempotency_key: Optional[str],
+    handler: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Run `handler()` once per (scope, user, key); without a key it just runs."""
+    if not idempotency_key:
+        return await handler()
+
+    key = (scope, user_id, idempotency_key)
+    stored = response_store.get(key)
+    if stored is not None:
+        print(f"[DEBUG] Replaying stored response for idempotency key on {scope}")
+        metrics.incr("idempotency.replayed")
+        return stored
+
+    async def run_and_store():
+        response = await handler()
+        response_store.set(key, response, settings.idempotency_ttl_seconds)
+        return response
+
+    return await _inflight.do(key, run_and_store)
@@ -0,0 +1,106 @@
+"""
+Image preprocessing before Gemini vision calls.
+
+Phone photos arrive as multi-megabyte JPEG/HEIC-converted files with EXIF
+metadata. Gemini gains nothing from a 4000px edge, so every uploaded image is
+decoded, rotated upright (EXIF orientation), stripped of metadata, downscaled
+to IMAGE_MAX_EDGE and re-encoded at IMAGE_QUALITY before it is sent. That
+shrinks the upload to Gemini, the input token count and end-to-end latency.
+
+Decoding and resizing are CPU-bound, so they run in a process pool to keep the
+event loop (and the GIL) free for other requests.
+"""
+
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageOps
+from config import settings
+
+_FORMAT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class ProcessedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+
+    @property
+    def processed_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Response headers reporting the size reduction."""
+        return {
+            "X-Image-Original-Bytes": str(self.original_bytes),
+            "X-Image-Processed-Bytes": str(self.processed_bytes),
+        }
+
+
+def _preprocess(data: bytes, max_edge: int, quality: int, image_format: str) -> Tuple[bytes, str]:
+    """Decode, orient, strip metadata, downscale and re-encode (runs in a worker process)."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        # No exif/icc arguments are passed, so the re-encoded image carries no metadata
+        image.save(output, format=image_format, quality=quality, optimize=True)
+
+    return output.getvalue(), _FORMAT_MIME_TYPES[image_format]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _pool
+
+
+def shutdown_image_pool() -> None:
+    """Stop the worker processes (called on app shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def preprocess_image(data: bytes, content_type: Optional[str] = None) -> ProcessedImage:
+    """
+    Shrink an uploaded image for a vision call.
+
+    Images Pillow cannot decode are passed through untouched, so Gemini still
+    gets a chance at them.
+    """
+    image_format = settings.image_format.upper()
+    args = (data, settings.image_max_edge, settings.image_quality, image_format)
+
+    try:
+        if settings.image_workers > 0:
+            loop = asyncio.get_running_loop()
+            try:
+                processed, mime_type = await loop.run_in_executor(_get_pool(), _preprocess, *args)
+            except BrokenProcessPool:
+                shutdown_image_pool()
+                processed, mime_type = await asyncio.to_thread(_preprocess, *args)
+        else:
+            processed, mime_type = await asyncio.to_thread(_preprocess, *args)
+    except Exception as e:
+        print(f"[WARN] Image preprocessing failed, sending original: {str(e)}")
+        return ProcessedImage(data=data, mime_type=content_type or "image/jpeg", original_bytes=len(data))
+
+    result = ProcessedImage(data=processed, mime_type=mime_type, original_bytes=len(data))
+    print(f"[DEBUG] Image preprocessed: {result.original_bytes} -> {result.processed_bytes} bytes")
+    return result
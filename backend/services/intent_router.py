@@ -0,0 +1,150 @@
+"""
+Rule-based fast path in front of the Fit Buddy agent.
+
+Short, unambiguous messages - "drank a glass of water", "had 500ml water",
+"how am I doing?" - do not need two Gemini calls to pick a tool and then
+describe its card. `classify_intent` matches the whole message against a few
+strict patterns (with a small quantity/unit parser for water); on a match the
+tool logic from `agent_tools` runs directly and the reply is rendered from the
+card by `response_templates`. Anything else - extra content, negations,
+questions about water, amounts out of range - falls through to the agent.
+
+Counters `chat_fast_path.hits` / `chat_fast_path.misses` and the gauge
+`chat_fast_path.hit_ratio` (see /metrics) give the share of chat traffic
+that skipped the LLM.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from config import settings
+from services.agent_tools import TOOL_STATE, log_water_card, daily_summary_card
+from services.metrics import metrics
+from services.response_templates import render_cards
+
+# Millilitres per unit, matched by prefix in this order ("ml" before "l")
+UNIT_ML = [
+    ("ml", 1),
+    ("milli", 1),
+    ("glass", 250),
+    ("cup", 250),
+    ("bottle", 500),
+    ("l", 1000),
+]
+
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "half": 0.5, "half a": 0.5, "half an": 0.5,
+}
+
+MIN_WATER_ML = 50
+MAX_WATER_ML = 5000
+
+_NUMBER = r"(?P<number>\d+(?:\.\d+)?|half an?|half|an?|one|two|three|four|five)"
+_UNIT = r"(?P<unit>ml|millilit(?:re|er)s?|l|lit(?:re|er)s?|ltrs?|glass(?:es)?|cups?|bottles?)"
+
+WATER_PATTERN = re.compile(
+    r"^(?:i\s+)?(?:just\s+)?(?:drank|drunk|had|have\s+had|finished|log|logged|add|added)\s+"
+    + _NUMBER + r"\s*" + _UNIT
+    + r"\s+(?:of\s+)?water(?:\s+(?:today|now|just\s+now))?$"
+)
+
+SUMMARY_PATTERN = re.compile(
+    r"^(?:(?:hey|hi)\s+)?(?:"
+    r"how\s+am\s+i\s+doing(?:\s+today)?"
+    r"|how\s+is\s+my\s+(?:day|progress)(?:\s+going)?"
+    r"|what\s+is\s+my\s+progress(?:\s+today)?"
+    r"|show\s+(?:me\s+)?my\s+(?:stats|progress|summary|analytics)(?:\s+for\s+today)?"
+    r"|(?:daily|today(?:\s+is)?)\s+summary"
+    r")$"
+)
+
+
+@dataclass
+class Intent:
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+def _normalize(message: str) -> str:
+    text = message.lower().replace("’", "'")
+    text = re.sub(r"\b(\w+)'s\b", r"\1 is", text)  # what's -> what is
+    text = text.replace("'", " ")
+    text = re.sub(r"[!?.,]+\s*$", "", text.strip())
+    return " ".join(text.split())
+
+
+def parse_quantity_ml(number: str, unit: str) -> Optional[int]:
+    """'2', 'glasses' -> 500. None if the unit or number is not understood."""
+    amount = WORD_NUMBERS.get(number)
+    if amount is None:
+        try:
+            amount = float(number)
+        except ValueError:
+            return None
+    for prefix, per_unit in UNIT_ML:
+        if unit.startswith(prefix):
+            return int(round(amount * per_unit))
+    return None
+
+
+def classify_intent(message: str) -> Optional[Intent]:
+    """Return a high-confidence intent for the whole message, or None."""
+    text = _normalize(message)
+
+    match = WATER_PATTERN.match(text)
+    if match:
+        amount_ml = parse_quantity_ml(match.group("number"), match.group("unit"))
+        if amount_ml is not None and MIN_WATER_ML <= amount_ml <= MAX_WATER_ML:
+            return Intent("log_water", {"amount_ml": amount_ml})
+        return None
+
+    if SUMMARY_PATTERN.match(text):
+        return Intent("get_daily_summary")
+
+    return None
+
+
+async def try_fast_path(message: str, user_context, language: str = "en") -> Optional[dict]:
+    """
+    Answer the message without the LLM if it is a simple, recognised intent.
+
+    Returns an agent-shaped result (`response`, `ui_cards`, `actions_taken`),
+    or None when the agent should handle the message.
+    """
+    if not settings.chat_fast_path_enabled:
+        return None
+
+    intent = classify_intent(message)
+    metrics.incr("chat_fast_path.requests")
+    metrics.incr("chat_fast_path.misses" if intent is None else "chat_fast_path.hits")
+    metrics.set_gauge("chat_fast_path.hit_ratio", metrics.ratio("chat_fast_path.hits", "chat_fast_path.requests"))
+    if intent is None:
+        return None
+
+    try:
+        if intent.name == "log_water":
+            card = await log_water_card(user_context, intent.args["amount_ml"])
+        else:
+            card = await daily_summary_card(user_context)
+    except Exception as e:
+        print(f"[WARN] Chat fast path {intent.name} failed: {str(e)}")
+        metrics.incr("chat_fast_path.errors")
+        _, writes = TOOL_STATE.get(intent.name, (set(), set()))
+        if not writes:
+            return None  # Read-only - let the agent try
+        # A write may have gone through - do not hand it to the agent to repeat
+        card = {"card_type": "error", "data": {"message": f"Failed to {intent.name.replace('_', ' ')}: {str(e)}"}, "actions": []}
+        return {
+            "response": render_cards([card], language),
+            "ui_cards": [card],
+            "actions_taken": [intent.name]
+        }
+
+    print(f"[DEBUG] Chat fast path: {intent.name} {intent.args}")
+    metrics.incr(f"chat_fast_path.{intent.name}")
+    return {
+        "response": render_cards([card], language),
+        "ui_cards": [card],
+        "actions_taken": [intent.name]
+    }
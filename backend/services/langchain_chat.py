@@ -1,16 +1,14 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from config import settings
+from services.llm_clients import get_agent_llm
+from services.llm_resilience import call_llm
+from services.llm_scheduler import LLMOverloaded
 from datetime import date, timedelta
 
 
 def get_chat_llm():
-    """Get LangChain ChatGoogleGenerativeAI instance."""
-    return ChatGoogleGenerativeAI(
-        model=settings.gemini_model,
-        google_api_key=settings.gemini_api_key,
-        temperature=0.7,
-    )
+    """Shared chat model (same settings as the agent, so the same client)."""
+    return get_agent_llm()
 
 
 def build_system_context(user_profile: dict, meals_history: list, daily_log: dict) -> str:
@@ -73,8 +71,14 @@ Remember: You have access to their meal history and daily progress. Use this con
 
 
 def build_message_history(chat_history: list, system_context: str) -> list:
-    """Convert chat history from DB to LangChain message format."""
-    messages = [SystemMessage(content=system_context)]
+    """
+    Convert chat history from DB to LangChain message format.
+
+    Gemini takes one system message, as the first message - a conversation
+    summary row (role "system") is appended to the system prompt instead.
+    """
+    summaries = [msg.get('content', '') for msg in chat_history if msg.get('role') == 'system']
+    messages = [SystemMessage(content="\n\n".join([system_context] + summaries))]
     
     for msg in chat_history:
         if msg.get('role') == 'user':
@@ -108,10 +112,12 @@ async def chat_with_context_basic(
         messages.append(HumanMessage(content=message))
 
         # Get AI response
-        response = await llm.ainvoke(messages)
+        response = await call_llm("chat_fallback", lambda: llm.ainvoke(messages))
 
         return response.content
 
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise Exception(f"Chat failed: {str(e)}")
 
@@ -0,0 +1,252 @@
+"""
+Content-addressed cache for Gemini analysis results.
+
+A result is keyed by a SHA-256 over:
+  - the analysis kind and the model name,
+  - the prompt template version (a hash of the template text, so editing a
+    prompt invalidates its old results),
+  - the normalized input: preprocessed image bytes or whitespace/case-folded text,
+  - the personalization fields that are formatted into the prompt.
+
+Repeated uploads of the same photo, client retries, identical meal
+descriptions and the same menu scanned by users with the same constraints all
+resolve to the same key and skip the Gemini round trip.
+
+Backends (LLM_CACHE_BACKEND):
+  - memory:   per-process LRU bounded by LLM_CACHE_MAX_ENTRIES
+  - disk:     JSON files under LLM_CACHE_DIR, oldest evicted past LLM_CACHE_MAX_BYTES
+  - database: shared `llm_result_cache` table on the DATABASE_BACKEND store
+              (see docs/database-architecture.md); `supabase` is accepted too
+  - none:     caching disabled
+
+Every entry expires after LLM_CACHE_TTL_SECONDS. A failing backend never fails
+the analysis - the result is just computed again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, Union
+from config import settings
+from services.metrics import metrics
+from services.repositories import llm_result_cache
+from services.ttl_cache import TTLCache
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different inputs share a key."""
+    return " ".join((text or "").split()).casefold()
+
+
+def template_version(template: str) -> str:
+    """Short stable hash of a prompt template."""
+    return hashlib.sha256(template.encode()).hexdigest()[:12]
+
+
+def cache_key(kind: str, template: str, data: Union[bytes, str], personalization: dict) -> str:
+    """Build the content address for one analysis call."""
+    digest = hashlib.sha256()
+    digest.update(f"{kind}\0{settings.gemini_model}\0{template_version(template)}\0".encode())
+    digest.update(data if isinstance(data, bytes) else normalize_text(data).encode())
+    digest.update(b"\0")
+    digest.update(json.dumps(personalization, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class MemoryCacheBackend:
+    """Per-process LRU. Values are stored serialized so callers can mutate results."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = TTLCache(max_entries)
+
+    async def get(self, key: str) -> Optional[dict]:
+        payload = self._entries.get(key)
+        return None if payload is None else json.loads(payload)
+
+    async def set(self, key: str, value: dict, ttl_seconds: float) -> None:
+        self._entries.set(key, json.dumps(value), ttl_seconds)
+
+
+class DiskCacheBackend:
+    """
+    One JSON file per key. Reads touch the file's mtime, so evicting the oldest
+    mtimes once the directory outgrows `max_bytes` approximates LRU.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def _read(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get("expires_at", 0) <= time.time():
+            self._remove(path)
+            return None
+        os.utime(path, None)
+        return entry.get("value")
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _write(self, key: str, value: dict, ttl_seconds: float) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"expires_at": time.time() + ttl_seconds, "value": value})
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(os.path.getsize(p) for p in self._files())
+            else:
+                self._size += len(payload)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used files until the cache is back under 90% of its budget."""
+        files = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._size = total
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: dict, ttl_seconds: float) -> None:
+        await asyncio.to_thread(self._write, key, value, ttl_seconds)
+
+
+class DatabaseCacheBackend:
+    """
+    Shared cache in the `llm_result_cache` table (on the DATABASE_BACKEND
+    store), visible to every worker and instance. Expired rows are filtered
+    on read; roughly one write in `purge_every` also calls
+    `purge_llm_result_cache` to delete expired rows and cap the table at
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, purge_every: int = 100):
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await llm_result_cache.get_live(key)
+
+    async def set(self, key: str, value: dict, ttl_seconds: float) -> None:
+        await llm_result_cache.put(key, value, ttl_seconds)
+        if random.randrange(self.purge_every) == 0:
+            await llm_result_cache.purge(self.max_entries)
+
+
+class LLMResultCache:
+    """Front for a cache backend that counts hits and misses per analysis kind."""
+
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self.ttl_seconds > 0
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        """Return the cached result for `key`, or run `compute()` and store its result."""
+        if not self.enabled:
+            return await compute()
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            print(f"[WARN] LLM cache read failed: {str(e)}")
+            metrics.incr("llm_cache.errors")
+            cached = None
+
+        if cached is not None:
+            print(f"[DEBUG] LLM cache hit: {kind} {key[:12]}")
+            metrics.incr("llm_cache.hits")
+            metrics.incr(f"llm_cache.{kind}.hits")
+            return cached
+
+        metrics.incr("llm_cache.misses")
+        metrics.incr(f"llm_cache.{kind}.misses")
+        result = await compute()
+
+        try:
+            await self.backend.set(key, result, self.ttl_seconds)
+        except Exception as e:
+            print(f"[WARN] LLM cache write failed: {str(e)}")
+            metrics.incr("llm_cache.errors")
+        return result
+
+
+def create_llm_cache() -> LLMResultCache:
+    """Build the cache configured by the LLM_CACHE_* settings."""
+    backend_name = settings.llm_cache_backend.lower()
+    if backend_name == "memory":
+        backend = MemoryCacheBackend(settings.llm_cache_max_entries)
+    elif backend_name == "disk":
+        backend = DiskCacheBackend(settings.llm_cache_dir, settings.llm_cache_max_bytes)
+    elif backend_name in ("database", "supabase"):
+        backend = DatabaseCacheBackend(settings.llm_cache_max_entries)
+    elif backend_name == "none":
+        backend = None
+    else:
+        raise ValueError(f"Unknown LLM_CACHE_BACKEND: {settings.llm_cache_backend}")
+    return LLMResultCache(backend, settings.llm_cache_ttl_seconds)
+
+
+llm_cache = create_llm_cache()
@@ -0,0 +1,65 @@
+"""
+Process-wide Gemini clients.
+
+Building a ChatGoogleGenerativeAI (or a GenerativeModel) creates a new API
+client and connection, and `bind_tools` converts every tool schema to the
+Gemini function-declaration format. None of that depends on the request, so
+each client is built once, on first use, and shared; the connections stay
+open between requests. The agent tools are module-level (agent_tools.TOOLS)
+and get the requesting user through `agent_tools.bind_user_context`, so the
+tool-bound model is shared too.
+
+`warm_up()` runs at startup so the first chat request does not pay for it.
+"""
+
+from functools import lru_cache
+import google.generativeai as genai
+from langchain_google_genai import ChatGoogleGenerativeAI
+from config import settings
+
+AGENT_TEMPERATURE = 0.7
+SUMMARY_TEMPERATURE = 0.2
+
+
+@lru_cache(maxsize=None)
+def _chat_model(temperature: float) -> ChatGoogleGenerativeAI:
+    return ChatGoogleGenerativeAI(
+        model=settings.gemini_model,
+        google_api_key=settings.gemini_api_key,
+        temperature=temperature,
+    )
+
+
+def get_agent_llm() -> ChatGoogleGenerativeAI:
+    """Chat model for the Fit Buddy agent and the plain-chat fallback."""
+    return _chat_model(AGENT_TEMPERATURE)
+
+
+def get_summary_llm() -> ChatGoogleGenerativeAI:
+    """Low-temperature chat model for the rolling conversation summary."""
+    return _chat_model(SUMMARY_TEMPERATURE)
+
+
+@lru_cache(maxsize=None)
+def get_agent_llm_with_tools():
+    """The agent model with the Fit Buddy tools bound (schemas converted once)."""
+    from services.agent_tools import TOOLS
+    return get_agent_llm().bind_tools(TOOLS)
+
+
+@lru_cache(maxsize=None)
+def get_gemini_model() -> genai.GenerativeModel:
+    """google-generativeai model for meal/menu/pantry analysis and vision chat."""
+    genai.configure(api_key=settings.gemini_api_key)
+    return genai.GenerativeModel(settings.gemini_model)
+
+
+def warm_up() -> None:
+    """Build every shared client ahead of the first request."""
+    try:
+        get_agent_llm_with_tools()
+        get_summary_llm()
+        get_gemini_model()
+        print("[DEBUG] LLM clients ready")
+    except Exception as e:
+        print(f"[WARN] LLM client warm-up failed: {str(e)}")  # Built on first use instead
@@ -0,0 +1,308 @@
+"""
+Deadlines, retries, hedging and a circuit breaker for Gemini calls.
+
+  - Deadline: every HTTP request gets REQUEST_DEADLINE_SECONDS
+    (`DeadlineMiddleware`). LLM calls made while serving it - including the
+    agent's plain-chat fallback - share that budget. A call that starts with
+    no time left fails at once with 504.
+  - Retries: each attempt is capped by LLM_CALL_TIMEOUT_SECONDS (and the
+    time left, which also bounds its wait in the scheduler queue). Timeouts and retryable provider errors (429, 500, 503, 504)
+    are retried up to LLM_MAX_RETRIES times with full-jitter exponential
+    backoff, as long as the deadline allows. Other errors (bad request,
+    safety blocks) are raised right away.
+  - Hedging (LLM_HEDGE_ENABLED): if an idempotent call is still running
+    after the p95 latency of recent calls of its kind, a second identical
+    call is started and the first to succeed wins.
+  - Circuit breaker: after LLM_CIRCUIT_FAILURE_THRESHOLD consecutive
+    retryable failures, calls fail fast with 503 for
+    LLM_CIRCUIT_COOLDOWN_SECONDS. Then one probe call is let through, and
+    its outcome closes or re-opens the circuit.
+
+Failures surface as `LLMOverloaded`, so routes answer with a status code
+and Retry-After instead of a 500 (see main.py).
+
+Each attempt takes its own slot from the LLM scheduler (services/llm_scheduler.py).
+"""
+
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from config import settings
+from services.llm_scheduler import PRIORITY_INTERACTIVE, LLMOverloaded, llm_slot
+from services.metrics import metrics
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Latency samples kept per call kind for the hedging threshold
+LATENCY_WINDOW = 200
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+# --- Deadline ---
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Run the block with a fresh deadline `seconds` from now."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the current deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving each HTTP request REQUEST_DEADLINE_SECONDS for its LLM calls."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with deadline_scope(settings.request_deadline_seconds):
+            await self.app(scope, receive, send)
+
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    def check(self) -> bool:
+        """
+        Raise while open; after the cooldown let a single probe through.
+        Returns True for the probe - pass it back to the record_* call that
+        reports its outcome.
+        """
+        if self._opened_at is None:
+            return False
+        remaining = self._opened_at + self.cooldown_seconds - time.monotonic()
+        if remaining > 0 or self._probing:
+            metrics.incr("llm_circuit.rejected")
+            raise LLMOverloaded(503, max(math.ceil(remaining), 1), "circuit_open")
+        self._probing = True
+        return True
+
+    def record_success(self, probe: bool = False) -> None:
+        if self._opened_at is not None:
+            print("[DEBUG] LLM circuit closed")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        metrics.set_gauge("llm_circuit.open", 0)
+
+    def record_failure(self, probe: bool = False) -> None:
+        self._failures += 1
+        if probe or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                print(f"[WARN] LLM circuit opened after {self._failures} failures")
+                metrics.incr("llm_circuit.trips")
+            self._opened_at = time.monotonic()
+            if probe:
+                self._probing = False
+            metrics.set_gauge("llm_circuit.open", 1)
+
+    def record_neutral(self, probe: bool = False) -> None:
+        """The call ended without saying anything about provider health."""
+        if probe:
+            self._probing = False  # Let the next call probe instead
+
+
+circuit_breaker = CircuitBreaker(settings.llm_circuit_failure_threshold, settings.llm_circuit_cooldown_seconds)
+
+
+# --- Latency tracking for hedging ---
+
+_latencies: Dict[str, Deque[float]] = {}
+
+
+def _record_latency(name: str, seconds: float) -> None:
+    _latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(name: str) -> Optional[float]:
+    """p95 latency of recent `name` calls, or None until there are enough samples."""
+    samples = _latencies.get(name)
+    if not samples or len(samples) < settings.llm_hedge_min_samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+
+# --- Calls ---
+
+def _attempt_timeout() -> float:
+    remaining = time_left()
+    if remaining is None:
+        return settings.llm_call_timeout_seconds
+    if remaining <= 0:
+        metrics.incr("llm_calls.deadline_exceeded")
+        raise LLMOverloaded(504, 1, "deadline")
+    return min(settings.llm_call_timeout_seconds, remaining)
+
+
+async def _attempt(fn: Callable[[], Awaitable[Any]], timeout: float, user_id: Optional[str], priority: int) -> Any:
+    async with llm_slot(user_id, priority, max_wait=time_left()):
+        # The queue wait came out of the same deadline
+        capped = min(timeout, _attempt_timeout())
+        try:
+            return await asyncio.wait_for(fn(), capped)
+        except asyncio.TimeoutError:
+            if capped < timeout:
+                metrics.incr("llm_calls.deadline_exceeded")
+                raise LLMOverloaded(504, 1, "deadline")
+            raise
+
+
+async def _hedged_attempt(name: str, fn, timeout: float, user_id: Optional[str], priority: int) -> Any:
+    """One attempt, plus a duplicate once it runs past the p95 latency; first success wins."""
+    delay = hedge_delay(name)
+    primary = asyncio.ensure_future(_attempt(fn, timeout, user_id, priority))
+    if delay is None or delay >= timeout:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+
+    metrics.incr(f"llm_calls.{name}.hedged")
+    hedge = asyncio.ensure_future(_attempt(fn, timeout - delay, user_id, priority))
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        metrics.incr(f"llm_calls.{name}.hedge_won")
+                    return task.result()
+        return primary.result()  # Both failed - raise the primary's error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_llm(
+    name: str,
+    fn: Callable[[], Awaitable[Any]],
+    user_id: Optional[str] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    hedge: bool = False,
+) -> Any:
+    """
+    Run `fn()` (one LLM request) with the request deadline, retries, optional
+    hedging and the circuit breaker. Only pass `hedge=True` for calls that are
+    safe to send twice.
+    """
+    attempts = settings.llm_max_retries + 1
+    for attempt in range(attempts):
+        probe = circuit_breaker.check()
+        timeout = _attempt_timeout()
+        started = time.monotonic()
+        try:
+            if hedge and settings.llm_hedge_enabled:
+                result = await _hedged_attempt(name, fn, timeout, user_id, priority)
+            else:
+                result = await _attempt(fn, timeout, user_id, priority)
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, asyncio.TimeoutError) and timeout < settings.llm_call_timeout_seconds:
+                # Cut short by the request deadline, not a sign of provider trouble
+                circuit_breaker.record_neutral(probe)
+                metrics.incr("llm_calls.deadline_exceeded")
+                raise LLMOverloaded(504, 1, "deadline") from e
+            circuit_breaker.record_failure(probe)
+            metrics.incr(f"llm_calls.{name}.retryable_errors")
+            backoff = random.uniform(0, settings.llm_retry_base_seconds * (2 ** attempt))
+            remaining = time_left()
+            if attempt + 1 >= attempts or (remaining is not None and remaining <= backoff):
+                print(f"[ERROR] LLM call {name} failed after {attempt + 1} attempts: {type(e).__name__}: {str(e)}")
+                raise LLMOverloaded(503, max(math.ceil(backoff), 1), "provider_error") from e
+            print(f"[WARN] LLM call {name} attempt {attempt + 1} failed ({type(e).__name__}), retrying in {backoff:.2f}s")
+            metrics.incr(f"llm_calls.{name}.retries")
+            await asyncio.sleep(backoff)
+            continue
+        except BaseException:
+            circuit_breaker.record_neutral(probe)
+            raise
+
+        circuit_breaker.record_success(probe)
+        _record_latency(name, time.monotonic() - started)
+        return result
+
+
+async def _timed_chunks(stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Yield `stream`'s chunks, waiting at most LLM_CALL_TIMEOUT_SECONDS (and the
+    time left) for each one, so a stalled stream cannot hold its slot forever.
+    """
+    try:
+        while True:
+            timeout = _attempt_timeout()
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                if timeout < settings.llm_call_timeout_seconds:
+                    metrics.incr("llm_calls.deadline_exceeded")
+                    raise LLMOverloaded(504, 1, "deadline")
+                raise
+            yield chunk
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+@asynccontextmanager
+async def guarded_stream(name: str, user_id: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Deadline, circuit breaker and scheduler slot for a streamed LLM call.
+    Streams are not retried or hedged - tokens may already be on the wire.
+
+    Iterate the stream through the yielded wrapper - `async for chunk in
+    timed(llm.astream(...))` - so every chunk wait is timed out. A stalled
+    stream counts as a provider failure and gives its slot back.
+    """
+    probe = circuit_breaker.check()
+    _attempt_timeout()
+    try:
+        async with llm_slot(user_id, priority, max_wait=time_left()):
+            yield _timed_chunks
+    except RETRYABLE_ERRORS as e:
+        circuit_breaker.record_failure(probe)
+        metrics.incr(f"llm_calls.{name}.retryable_errors")
+        raise LLMOverloaded(503, 1, "provider_error") from e
+    except BaseException:
+        circuit_breaker.record_neutral(probe)
+        raise
+    circuit_breaker.record_success(probe)
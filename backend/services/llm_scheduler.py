@@ -0,0 +1,200 @@
+"""
+Process-wide admission control for Gemini calls.
+
+Every LLM call (meal/menu/pantry analysis, agent turns, fallback chat, vision
+chat, summaries) runs inside `llm_slot()`. At most LLM_MAX_CONCURRENCY calls
+run at once; the rest wait in a queue:
+
+  - priorities: interactive work (requests a user is waiting on) is always
+    served before background work (conversation summaries);
+  - fair share: within a priority, waiting users are served round-robin, so
+    one user's burst of meal photos cannot starve everyone else;
+  - load shedding: a user with LLM_MAX_QUEUED_PER_USER calls already waiting
+    gets 429, a full queue (LLM_MAX_QUEUE_DEPTH) or a wait longer than
+    LLM_QUEUE_TIMEOUT_SECONDS gets 503, a wait that outlasts the request
+    deadline gets 504 - all with Retry-After (see the handler in main.py). Failing fast beats piling up behind provider rate
+    limits.
+
+The user is taken from the request (set by `auth.get_user_id`) unless given.
+Gauges `llm_scheduler.in_flight`, `llm_scheduler.queue_depth` and
+`llm_scheduler.wait_ms_avg` plus `llm_scheduler.shed.*` counters are served
+at /metrics.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+from config import settings
+from services.metrics import metrics
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+
+ANONYMOUS_USER = "anonymous"
+
+_current_user: ContextVar[str] = ContextVar("llm_user", default=ANONYMOUS_USER)
+
+
+def set_llm_user(user_id: str) -> None:
+    """Attribute LLM calls made by the current request to `user_id`."""
+    _current_user.set(user_id)
+
+
+class LLMOverloaded(Exception):
+    """An LLM call was shed or gave up; clients should retry after `retry_after` seconds."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"AI service unavailable ({reason}), please retry in {retry_after}s")
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        queue_timeout_seconds: float,
+        max_queue_depth: int,
+        max_queued_per_user: int,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_per_user = max_queued_per_user
+        self._in_flight = 0
+        # priority -> user -> waiters; users rotate to the back after being served
+        self._queues: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._depth = 0
+        self._queued_per_user: Dict[str, int] = {}
+        self._service_seconds = 2.0  # Moving average of slot hold time, for Retry-After
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ):
+        """
+        Hold one of the LLM slots for the duration of the block. `max_wait`
+        (the caller's remaining deadline) caps the queue wait below
+        LLM_QUEUE_TIMEOUT_SECONDS; running out of it is shed with 504.
+        """
+        await self._acquire(user_id or _current_user.get(), priority, max_wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.monotonic() - started)
+            self._release()
+
+    def _retry_after(self) -> int:
+        estimate = (self._depth + 1) * self._service_seconds / max(self.max_concurrency, 1)
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def _shed(self, status_code: int, reason: str) -> LLMOverloaded:
+        metrics.incr(f"llm_scheduler.shed.{reason}")
+        print(f"[WARN] LLM call shed ({reason}), queue depth {self._depth}")
+        return LLMOverloaded(status_code, self._retry_after(), reason)
+
+    def _admitted(self, waited_seconds: float) -> None:
+        metrics.incr("llm_scheduler.admitted")
+        metrics.incr("llm_scheduler.wait_ms_total", waited_seconds * 1000)
+        metrics.set_gauge("llm_scheduler.wait_ms_avg", metrics.ratio("llm_scheduler.wait_ms_total", "llm_scheduler.admitted"))
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("llm_scheduler.in_flight", self._in_flight)
+        metrics.set_gauge("llm_scheduler.queue_depth", self._depth)
+
+    async def _acquire(self, user_id: str, priority: int, max_wait: Optional[float] = None) -> None:
+        if self._in_flight < self.max_concurrency and self._depth == 0:
+            self._in_flight += 1
+            self._admitted(0)
+            return
+
+        if self._queued_per_user.get(user_id, 0) >= self.max_queued_per_user:
+            raise self._shed(429, "user_limit")
+        if self._depth >= self.max_queue_depth:
+            raise self._shed(503, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user_id, deque()).append(waiter)
+        self._depth += 1
+        self._queued_per_user[user_id] = self._queued_per_user.get(user_id, 0) + 1
+        metrics.incr("llm_scheduler.queued")
+        self._update_gauges()
+
+        wait_seconds = self.queue_timeout_seconds
+        deadline_bound = max_wait is not None and max_wait < wait_seconds
+        if deadline_bound:
+            wait_seconds = max(max_wait, 0)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # The slot was handed over just as we gave up
+            else:
+                self._dequeue(priority, user_id, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed(504, "deadline") if deadline_bound else self._shed(503, "timeout")
+            raise
+        self._admitted(time.monotonic() - started)
+
+    def _dequeue(self, priority: int, user_id: str, waiter: asyncio.Future) -> None:
+        queue = self._queues[priority].get(user_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[priority][user_id]
+        self._waiter_left(user_id)
+
+    def _waiter_left(self, user_id: str) -> None:
+        self._depth -= 1
+        remaining = self._queued_per_user.get(user_id, 1) - 1
+        if remaining > 0:
+            self._queued_per_user[user_id] = remaining
+        else:
+            self._queued_per_user.pop(user_id, None)
+        self._update_gauges()
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Oldest waiter of the next user in line, highest priority first."""
+        for priority in PRIORITIES:
+            users = self._queues[priority]
+            while users:
+                user_id, queue = next(iter(users.items()))
+                waiter = queue.popleft()
+                if queue:
+                    users.move_to_end(user_id)
+                else:
+                    del users[user_id]
+                self._waiter_left(user_id)
+                if not waiter.done():
+                    return waiter
+        return None
+
+    def _release(self) -> None:
+        waiter = self._next_waiter()
+        if waiter is None:
+            self._in_flight -= 1
+        else:
+            waiter.set_result(None)  # The slot passes straight to the waiter
+        self._update_gauges()
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    queue_timeout_seconds=settings.llm_queue_timeout_seconds,
+    max_queue_depth=settings.llm_max_queue_depth,
+    max_queued_per_user=settings.llm_max_queued_per_user,
+)
+llm_slot = llm_scheduler.slot
@@ -0,0 +1,45 @@
+"""
+In-process metrics exposed at GET /metrics.
+
+Counters only ever go up. Gauges hold the latest value of something that moves
+both ways (queue depth, open circuits). Values are per worker process.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, self._gauges.get(name, 0))
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """numerator / denominator counters, 0 when nothing has been counted."""
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            return round(self._counters.get(numerator, 0) / total, 4) if total else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(sorted(self._counters.items())),
+                "gauges": dict(sorted(self._gauges.items())),
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,148 @@
+"""
+Direct Postgres access for DATABASE_BACKEND=postgres.
+
+A psycopg2 ThreadedConnectionPool (DATABASE_POOL_MIN..DATABASE_POOL_MAX
+connections to DATABASE_URL) shared by the process. psycopg2 is blocking, so
+like the Supabase client it runs on the DB thread pool (services/db.py);
+callers `await run_transaction(fn)` and `fn(cursor)` runs on a pooled
+connection inside one transaction - committed when it returns, rolled back if
+it raises. Several statements therefore cost one pool checkout and no HTTP
+round trips, and either all of them apply or none do.
+
+Rows come back as plain dicts with JSON-friendly values (ISO dates, string
+UUIDs, floats), the same shapes PostgREST returns.
+"""
+
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from config import settings
+from services.db import run_sync
+from services.metrics import metrics
+
+
+class PostgresPool:
+    """ThreadedConnectionPool that waits for a free connection instead of raising when exhausted."""
+
+    def __init__(self, dsn: str, min_connections: int, max_connections: int):
+        # UTC sessions, so timestamps come back like PostgREST's
+        self._pool = ThreadedConnectionPool(min_connections, max_connections, dsn, options="-c timezone=UTC")
+        self._available = threading.BoundedSemaphore(max_connections)
+
+    def run(self, fn: Callable[[Any], Any]) -> Any:
+        """Run `fn(cursor)` in a transaction on a pooled connection (blocking)."""
+        with self._available:
+            conn = self._pool.getconn()
+            broken = False
+            try:
+                with conn:  # Commit on success, roll back on error
+                    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                        return fn(cursor)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True  # Server restarted or connection dropped - do not reuse it
+                metrics.incr("postgres.broken_connections")
+                raise
+            finally:
+                self._pool.putconn(conn, close=broken or conn.closed != 0)
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+@lru_cache(maxsize=None)
+def get_pool() -> PostgresPool:
+    if not settings.database_url:
+        raise RuntimeError("DATABASE_BACKEND=postgres needs DATABASE_URL")
+    return PostgresPool(settings.database_url, settings.database_pool_min, settings.database_pool_max)
+
+
+async def run_transaction(fn: Callable[[Any], Any]) -> Any:
+    """Run `fn(cursor)` in one transaction on the DB thread pool."""
+    metrics.incr("postgres.transactions")
+    return await run_sync(get_pool().run, fn)
+
+
+def close_pool() -> None:
+    if get_pool.cache_info().currsize:
+        get_pool().close()
+        get_pool.cache_clear()
+
+
+# --- Helpers for transaction functions ---
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def row_dict(row: Optional[dict]) -> Optional[dict]:
+    return {key: _jsonable(value) for key, value in row.items()} if row else None
+
+
+def fetch_all(cursor) -> List[dict]:
+    return [row_dict(row) for row in cursor.fetchall()]
+
+
+def fetch_one(cursor) -> Optional[dict]:
+    return row_dict(cursor.fetchone())
+
+
+def adapt(value: Any, json_columns: Optional[Set[str]] = None, column: str = "") -> Any:
+    """
+    psycopg2 parameter for a PostgREST-style value. Dicts and lists are sent as
+    JSON - or, when the table's `json_columns` are known, only for those
+    columns, so lists for array columns stay Postgres arrays.
+    """
+    if json_columns is not None:
+        return Json(value) if column in json_columns and value is not None else value
+    return Json(value) if isinstance(value, (dict, list)) else value
+
+
+def json_columns(cursor, table: str) -> Set[str]:
+    """The json/jsonb columns of `table`."""
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND data_type IN ('json', 'jsonb')",
+        (table,),
+    )
+    return {row["column_name"] for row in cursor.fetchall()}
+
+
+def insert_rows(
+    cursor,
+    table: str,
+    rows: Iterable[dict],
+    on_conflict: str = "",
+    returning: str = "*",
+    json_columns: Optional[Set[str]] = None,
+) -> List[dict]:
+    """
+    Multi-row INSERT of dicts sharing the same keys; returns the inserted rows.
+    `on_conflict` is an optional "ON CONFLICT ..." clause; see `adapt` for `json_columns`.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    columns = list(rows[0].keys())
+    inserted = execute_values(
+        cursor,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s {on_conflict} RETURNING {returning}",
+        [tuple(adapt(row.get(column), json_columns, column) for column in columns) for row in rows],
+        fetch=True,
+    )
+    return [row_dict(row) for row in inserted]
@@ -175,7 +175,8 @@ User's dietary restrictions:
 - Preferences: {preferences}
 - Remaining calorie budget: {calories_remaining} kcal
 
-Return a JSON object with recommendations for healthy choices from the menu."""
+Return a JSON object with recommendations for healthy choices from the menu:
+{{"suggestions": [{{"dish_name": "...", "calories": 000, "reasoning": "why it fits (or not)", "recommended": true}}]}}"""
 
 
 COOKING_HELPER_PROMPT = """Analyze this image of pantry/fridge contents and suggest healthy recipes.
@@ -185,7 +186,9 @@ User's dietary restrictions:
 - Medical conditions: {conditions}
 - Preferences: {preferences}
 
-Return a JSON object with recipe suggestions using the visible ingredients."""
+Return a JSON object with recipe suggestions using the visible ingredients:
+{{"recipes": [{{"name": "...", "ingredients": ["..."], "instructions": "...", "calories": 000, "macros": {{"p": 00, "c": 00, "f": 00}}}}],
+ "missing_ingredients": ["items worth buying to complete the recipes"]}}"""
 
 
 CHAT_SYSTEM_PROMPT = """You are Fit Buddy, a friendly and knowledgeable AI health assistant for the FitFlow app.
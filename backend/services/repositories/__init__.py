@@ -0,0 +1,39 @@
+"""
+Repositories: table access behind one interface per table or aggregate, with
+a backend chosen by DATABASE_BACKEND.
+
+  - supabase: PostgREST over HTTPS through the Supabase client (default)
+  - postgres: direct, pooled Postgres connections (services/postgres.py);
+              multi-step writes run in a single transaction
+  - memory:   process-local tables with simulated latency
+              (MEMORY_DB_LATENCY_MS), for hermetic benchmarks
+"""
+
+from services.repositories.stores import (
+    DuplicateKey,
+    MemoryStore,
+    PostgresStore,
+    SupabaseStore,
+    TableStore,
+    create_store,
+)
+from services.repositories.tables import (
+    analysis_jobs,
+    burn_tasks,
+    chat_memory,
+    chat_messages,
+    daily_logs,
+    google_fit_sync,
+    grocery_items,
+    increment_params,
+    llm_result_cache,
+    meal_history,
+    profiles,
+)
+from services.repositories.meals import (
+    MealRepository,
+    PostgresMealRepository,
+    StepwiseMealRepository,
+    create_meal_repository,
+    meal_repository,
+)
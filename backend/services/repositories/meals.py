@@ -0,0 +1,157 @@
+"""
+Meal logging and deletion: `meal_history`, its `burn_tasks` and the day's
+`daily_logs` counters change together.
+
+The Supabase and memory backends make one store call per step (insert meal,
+increment the daily log, insert tasks / select meal, increment, delete tasks,
+delete meal) - four round trips and no transaction; when a step after the meal
+insert fails, the meal and its tasks are deleted again so a retry can log it.
+The Postgres backend runs the same steps in one transaction on one pooled
+connection.
+"""
+
+from datetime import date, datetime, timezone
+from typing import List, Optional, Protocol, Tuple
+
+from config import settings
+from services.postgres import fetch_all, fetch_one, insert_rows, run_transaction
+from services.repositories import tables
+from services.repositories.stores import DuplicateKey
+from services.repositories.tables import increment_params
+
+
+def meal_log_date(meal: dict) -> str:
+    """
+    The daily_logs date a meal's calories were counted on: its `log_date`.
+    Meals logged before that column existed were logged on the server's local
+    `date.today()`, so their UTC created_at is converted to local time before
+    taking its date.
+    """
+    if meal.get("log_date"):
+        return meal["log_date"]
+    created_at = meal.get("created_at")
+    if not created_at:
+        return date.today().isoformat()
+    logged_at = datetime.fromisoformat(created_at)
+    if logged_at.tzinfo is None:
+        logged_at = logged_at.replace(tzinfo=timezone.utc)
+    return logged_at.astimezone().date().isoformat()
+
+
+class MealRepository(Protocol):
+    async def log_meal(self, meal: dict, burn_tasks: List[dict], log_date: str) -> Optional[dict]:
+        """
+        Insert `meal` (recording `log_date` on it), add its calories to the
+        `log_date` daily log and insert its burn tasks. Returns the updated daily_logs row, or None when a meal
+        with the same id already exists (nothing is written).
+        """
+
+    async def get_meal_tasks(self, meal_id: str) -> List[dict]:
+        """Burn tasks created for a meal."""
+
+    async def delete_meal(self, user_id: str, meal_id: str) -> Optional[Tuple[dict, dict]]:
+        """
+        Delete the user's meal and its burn tasks and take its calories off the
+        day it was logged. Returns (meal, updated daily_logs row), or None when
+        the user has no such meal.
+        """
+
+
+class StepwiseMealRepository:
+    """One store call per step, through the table repositories (Supabase and memory backends)."""
+
+    async def log_meal(self, meal: dict, burn_tasks: List[dict], log_date: str) -> Optional[dict]:
+        try:
+            await tables.meal_history.insert([{**meal, "log_date": log_date}])
+        except DuplicateKey:
+            return None
+
+        counted = False
+        try:
+            daily_log = await tables.daily_logs.increment(meal["user_id"], calories_in=meal["calories"], log_date=log_date)
+            counted = True
+            if burn_tasks:
+                await tables.burn_tasks.insert(burn_tasks)
+        except Exception:
+            # Undo the earlier steps, or a retry would find the meal already
+            # logged and never add its calories and tasks
+            print(f"[WARN] Logging meal {meal['id']} failed, removing it")
+            if counted:
+                await tables.daily_logs.increment(meal["user_id"], calories_in=-meal["calories"], log_date=log_date)
+            await tables.burn_tasks.delete_for_meal(meal["id"])
+            await tables.meal_history.delete(meal["id"])
+            raise
+        return daily_log or {}
+
+    async def get_meal_tasks(self, meal_id: str) -> List[dict]:
+        return await tables.burn_tasks.for_meal(meal_id)
+
+    async def delete_meal(self, user_id: str, meal_id: str) -> Optional[Tuple[dict, dict]]:
+        meal = await tables.meal_history.get(user_id, meal_id)
+        if meal is None:
+            return None
+
+        daily_log = await tables.daily_logs.increment(
+            user_id, calories_in=-(meal.get("calories") or 0), log_date=meal_log_date(meal)
+        )
+        await tables.burn_tasks.delete_for_meal(meal_id)
+        await tables.meal_history.delete(meal_id)
+        return meal, daily_log or {}
+
+
+class PostgresMealRepository:
+    INCREMENT_SQL = (
+        "SELECT * FROM increment_daily_metrics("
+        "%(p_user_id)s, %(p_date)s, %(p_calories_in)s, %(p_calories_out)s, %(p_water_ml)s)"
+    )
+
+    async def log_meal(self, meal: dict, burn_tasks: List[dict], log_date: str) -> Optional[dict]:
+        def log(cursor) -> Optional[dict]:
+            if not insert_rows(cursor, "meal_history", [{**meal, "log_date": log_date}], on_conflict="ON CONFLICT (id) DO NOTHING", returning="id"):
+                return None
+            cursor.execute(self.INCREMENT_SQL, increment_params(meal["user_id"], calories_in=meal["calories"], log_date=log_date))
+            daily_log = fetch_one(cursor)
+            insert_rows(cursor, "burn_tasks", burn_tasks, returning="id")
+            return daily_log or {}
+
+        return await run_transaction(log)
+
+    async def get_meal_tasks(self, meal_id: str) -> List[dict]:
+        def load(cursor) -> List[dict]:
+            cursor.execute("SELECT * FROM burn_tasks WHERE meal_id = %s", (meal_id,))
+            return fetch_all(cursor)
+
+        return await run_transaction(load)
+
+    async def delete_meal(self, user_id: str, meal_id: str) -> Optional[Tuple[dict, dict]]:
+        def delete(cursor) -> Optional[Tuple[dict, dict]]:
+            # Row lock: a concurrent delete of the same meal waits, then finds nothing
+            cursor.execute(
+                "SELECT * FROM meal_history WHERE id = %s AND user_id = %s FOR UPDATE",
+                (meal_id, user_id),
+            )
+            meal = fetch_one(cursor)
+            if meal is None:
+                return None
+            cursor.execute(self.INCREMENT_SQL, increment_params(
+                user_id, calories_in=-(meal.get("calories") or 0), log_date=meal_log_date(meal)
+            ))
+            daily_log = fetch_one(cursor) or {}
+            cursor.execute("DELETE FROM burn_tasks WHERE meal_id = %s", (meal_id,))
+            cursor.execute("DELETE FROM meal_history WHERE id = %s", (meal_id,))
+            return meal, daily_log
+
+        return await run_transaction(delete)
+
+
+def create_meal_repository() -> MealRepository:
+    """Build the repository configured by DATABASE_BACKEND."""
+    backend_name = settings.database_backend.lower()
+    if backend_name in ("supabase", "memory"):
+        return StepwiseMealRepository()
+    if backend_name == "postgres":
+        return PostgresMealRepository()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {settings.database_backend}")
+
+
+meal_repository = create_meal_repository()
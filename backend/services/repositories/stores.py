@@ -0,0 +1,500 @@
+"""
+Table access backends for the repositories (DATABASE_BACKEND).
+
+A store runs single-table operations - select with filters, order and
+limit, insert, upsert, update, delete - and the RPC functions the backend
+calls. The repositories in tables.py are written against this interface, so
+the same route code runs on:
+
+  supabase  PostgREST through the supabase-py client (default)
+  postgres  the psycopg2 pool (services/postgres.py), one transaction per call
+  memory    process-local tables with MEMORY_DB_LATENCY_MS of simulated
+            round-trip latency per call - hermetic benchmarks and load tests,
+            no Supabase project needed
+
+Filters are (column, op, value) tuples, op one of eq, neq, gt, gte, lt, lte
+or in; they are ANDed. A tuple of columns compared with a tuple of values is
+a row comparison - `(("created_at", "id"), "lt", (created_at, id))` is the
+keyset filter for the page after a row. Order is a list of (column,
+descending) pairs. Every
+call returns the affected rows as dicts; writes that hit a unique key raise
+DuplicateKey whatever the backend.
+"""
+
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence, Set, Tuple, Union
+
+from postgrest.exceptions import APIError
+from psycopg2 import errors, sql
+
+from config import settings
+from services.db import run_query, run_sync
+from services.idempotency import is_unique_violation
+from services.postgres import adapt, fetch_all, insert_rows, json_columns, run_transaction
+
+Condition = Tuple[Union[str, Tuple[str, ...]], str, Any]
+Order = Sequence[Tuple[str, bool]]
+
+SQL_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class DuplicateKey(Exception):
+    """A write hit a primary key or unique constraint."""
+
+
+class TableStore(Protocol):
+    async def select(
+        self,
+        table: str,
+        where: Sequence[Condition] = (),
+        columns: str = "*",
+        order: Order = (),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[dict]: ...
+
+    async def insert(self, table: str, rows: List[dict]) -> List[dict]: ...
+
+    async def upsert(self, table: str, rows: List[dict], on_conflict: str = "id", ignore_duplicates: bool = False) -> List[dict]:
+        """Insert rows, updating (or with `ignore_duplicates`, skipping) those whose `on_conflict` columns exist."""
+
+    async def update(self, table: str, values: dict, where: Sequence[Condition]) -> List[dict]: ...
+
+    async def delete(self, table: str, where: Sequence[Condition]) -> List[dict]: ...
+
+    async def rpc(self, name: str, params: dict) -> List[Any]:
+        """Call a database function; the rows (or scalar) it returned."""
+
+
+def _columns(on_conflict: str) -> List[str]:
+    return [column.strip() for column in on_conflict.split(",") if column.strip()]
+
+
+def _row_comparison_filter(columns: Tuple[str, ...], op: str, values: Sequence[Any]) -> str:
+    """PostgREST `or` filter for (c1, c2, ...) op (v1, v2, ...): c1 op v1, or c1 = v1 and c2 op v2, ..."""
+    branches = []
+    for i, column in enumerate(columns):
+        terms = [f'{c}.eq."{v}"' for c, v in zip(columns[:i], values[:i])]
+        terms.append(f'{column}.{op}."{values[i]}"')
+        branches.append(terms[0] if len(terms) == 1 else f"and({','.join(terms)})")
+    return ",".join(branches)
+
+
+# --- Supabase (PostgREST) ---
+
+class SupabaseStore:
+    @property
+    def supabase(self):
+        from services.supabase_client import get_supabase
+        return get_supabase()
+
+    @staticmethod
+    def _filter(query, where: Sequence[Condition]):
+        for column, op, value in where:
+            if isinstance(column, tuple):
+                query = query.or_(_row_comparison_filter(column, op, value))
+            else:
+                query = getattr(query, "in_" if op == "in" else op)(column, value)
+        return query
+
+    async def _execute(self, query) -> List[Any]:
+        try:
+            result = await run_query(query)
+        except APIError as e:
+            if is_unique_violation(e):
+                raise DuplicateKey(str(e)) from e
+            raise
+        if result.data is None:
+            return []
+        return result.data if isinstance(result.data, list) else [result.data]
+
+    async def select(self, table, where=(), columns="*", order=(), limit=None, offset=0):
+        query = self._filter(self.supabase.table(table).select(columns), where)
+        for column, descending in order:
+            query = query.order(column, desc=descending)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1) if offset else query.limit(limit)
+        return await self._execute(query)
+
+    async def insert(self, table, rows):
+        return await self._execute(self.supabase.table(table).insert(rows))
+
+    async def upsert(self, table, rows, on_conflict="id", ignore_duplicates=False):
+        return await self._execute(
+            self.supabase.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+        )
+
+    async def update(self, table, values, where):
+        return await self._execute(self._filter(self.supabase.table(table).update(values), where))
+
+    async def delete(self, table, where):
+        return await self._execute(self._filter(self.supabase.table(table).delete(), where))
+
+    async def rpc(self, name, params):
+        return await self._execute(self.supabase.rpc(name, params))
+
+
+# --- Direct Postgres ---
+
+class PostgresStore:
+    def __init__(self):
+        # Per-table json/jsonb columns: PostgREST takes JSON for both array and
+        # jsonb columns, psycopg2 needs to know which one a list is for
+        self._json_columns: Dict[str, Set[str]] = {}
+
+    def _json(self, cursor, table: str) -> Set[str]:
+        if table not in self._json_columns:
+            self._json_columns[table] = json_columns(cursor, table)
+        return self._json_columns[table]
+
+    @staticmethod
+    def _where(where: Sequence[Condition]) -> Tuple[sql.Composable, list]:
+        clauses, params = [], []
+        for column, op, value in where:
+            if isinstance(column, tuple):
+                clauses.append(sql.SQL("({}) {} ({})").format(
+                    sql.SQL(", ").join(sql.Identifier(c) for c in column),
+                    sql.SQL(SQL_OPERATORS[op]),
+                    sql.SQL(", ").join(sql.Placeholder() for _ in column),
+                ))
+                params.extend(adapt(v) for v in value)
+            elif op == "in":
+                if not value:
+                    clauses.append(sql.SQL("FALSE"))
+                    continue
+                clauses.append(sql.SQL("{} IN %s").format(sql.Identifier(column)))
+                params.append(tuple(value))
+            else:
+                clauses.append(sql.SQL("{} {} %s").format(sql.Identifier(column), sql.SQL(SQL_OPERATORS[op])))
+                params.append(adapt(value))
+        if not clauses:
+            return sql.SQL(""), params
+        return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(clauses), params
+
+    @staticmethod
+    def _select_list(columns: str) -> sql.Composable:
+        if columns.strip() == "*":
+            return sql.SQL("*")
+        return sql.SQL(", ").join(sql.Identifier(column) for column in _columns(columns))
+
+    async def _run(self, fn: Callable[[Any], Any]) -> Any:
+        try:
+            return await run_transaction(fn)
+        except errors.UniqueViolation as e:
+            raise DuplicateKey(str(e)) from e
+
+    async def _fetch(self, statement: sql.Composable, params: list) -> List[dict]:
+        def run(cursor) -> List[dict]:
+            cursor.execute(statement, params)
+            return fetch_all(cursor)
+
+        return await self._run(run)
+
+    async def select(self, table, where=(), columns="*", order=(), limit=None, offset=0):
+        clause, params = self._where(where)
+        statement = sql.SQL("SELECT {} FROM {}").format(self._select_list(columns), sql.Identifier(table)) + clause
+        if order:
+            statement += sql.SQL(" ORDER BY ") + sql.SQL(", ").join(
+                sql.SQL("{} DESC" if descending else "{} ASC").format(sql.Identifier(column))
+                for column, descending in order
+            )
+        if limit is not None:
+            statement += sql.SQL(" LIMIT %s OFFSET %s")
+            params += [limit, offset]
+        return await self._fetch(statement, params)
+
+    async def insert(self, table, rows):
+        return await self._run(lambda cursor: insert_rows(cursor, table, rows, json_columns=self._json(cursor, table)))
+
+    async def upsert(self, table, rows, on_conflict="id", ignore_duplicates=False):
+        keys = _columns(on_conflict)
+        updates = [column for column in (rows[0] if rows else {}) if column not in keys]
+        if ignore_duplicates or not updates:
+            action = "DO NOTHING"
+        else:
+            action = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in updates)
+        on_conflict_clause = f"ON CONFLICT ({', '.join(keys)}) {action}"
+        return await self._run(lambda cursor: insert_rows(
+            cursor, table, rows, on_conflict=on_conflict_clause, json_columns=self._json(cursor, table)
+        ))
+
+    async def update(self, table, values, where):
+        clause, params = self._where(where)
+        assignments = sql.SQL(", ").join(
+            sql.SQL("{} = %s").format(sql.Identifier(column)) for column in values
+        )
+        statement = sql.SQL("UPDATE {} SET {}").format(sql.Identifier(table), assignments) + clause
+
+        def run(cursor) -> List[dict]:
+            json_cols = self._json(cursor, table)
+            cursor.execute(
+                statement + sql.SQL(" RETURNING *"),
+                [adapt(value, json_cols, column) for column, value in values.items()] + params,
+            )
+            return fetch_all(cursor)
+
+        return await self._run(run)
+
+    async def delete(self, table, where):
+        clause, params = self._where(where)
+        statement = sql.SQL("DELETE FROM {}").format(sql.Identifier(table)) + clause
+        return await self._fetch(statement + sql.SQL(" RETURNING *"), params)
+
+    async def rpc(self, name, params):
+        arguments = sql.SQL(", ").join(
+            sql.SQL("{} => %s").format(sql.Identifier(key)) for key in params
+        )
+        statement = sql.SQL("SELECT * FROM {}({})").format(sql.Identifier(name), arguments)
+        return await self._fetch(statement, [adapt(value) for value in params.values()])
+
+
+# --- In-memory ---
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Unique keys per table, primary key first (the memory backend enforces them)
+TABLE_KEYS = {
+    "profiles": [("id",)],
+    "daily_logs": [("id",), ("user_id", "date")],
+    "chat_memory": [("user_id",)],
+    "grocery_items": [("id",), ("user_id", "item_name")],
+    "google_fit_sync": [("id",), ("user_id",)],
+    "llm_result_cache": [("key",)],
+}
+
+# Column defaults from migrations/0001_tables.sql; id and created_at are filled for every table
+TABLE_DEFAULTS = {
+    "profiles": {
+        "medical_conditions": [], "allergies": [], "preferences": [],
+        "daily_calorie_target": 2000, "daily_water_target": 2500, "notification_enabled": True,
+    },
+    "daily_logs": {
+        "calories_in": 0, "calories_out": 0, "water_ml": 0, "steps": 0, "active_minutes": 0,
+        "google_fit_data": {},
+    },
+    "meal_history": {"macros": {"p": 0, "c": 0, "f": 0}, "source": "photo"},
+    "burn_tasks": {"status": "pending"},
+    "chat_messages": {"metadata": {}},
+    "chat_memory": {"summary": ""},
+    "grocery_items": {"category": "other", "suggested_by_ai": False, "is_purchased": False},
+    "google_fit_sync": {"sync_enabled": False, "sync_data": []},
+    "analysis_jobs": {"status": "queued", "attempts": 0},
+}
+
+
+def _matches(row: dict, where: Sequence[Condition]) -> bool:
+    for column, op, value in where:
+        if isinstance(column, tuple):
+            current = tuple(row.get(c) for c in column)
+            if None in current:
+                return False
+            value = tuple(value)
+        else:
+            current = row.get(column)
+        if op == "in":
+            if current not in value:
+                return False
+        elif current is None or value is None:
+            return False  # NULL never compares true in SQL
+        elif op == "eq" and not current == value:
+            return False
+        elif op == "neq" and not current != value:
+            return False
+        elif op == "gt" and not current > value:
+            return False
+        elif op == "gte" and not current >= value:
+            return False
+        elif op == "lt" and not current < value:
+            return False
+        elif op == "lte" and not current <= value:
+            return False
+    return True
+
+
+def _sort_key(value: Any) -> Tuple[bool, Any]:
+    return (value is None, 0 if value is None else value)
+
+
+class MemoryStore:
+    """
+    Tables as lists of dicts behind one lock. Each call first sleeps
+    `latency_seconds` on the DB thread pool, like a network round trip would,
+    so pool limits and concurrency behave as they do against a real database.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.tables: Dict[str, List[dict]] = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.functions = {
+            "increment_daily_metrics": self._increment_daily_metrics,
+            "trim_chat_messages": self._trim_chat_messages,
+            "purge_llm_result_cache": self._purge_llm_result_cache,
+            "claim_analysis_job": self._claim_analysis_job,
+        }
+
+    def _call(self, fn: Callable[[], Any]) -> Any:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        with self._lock:
+            self.calls += 1
+            return copy.deepcopy(fn())
+
+    async def _run(self, fn: Callable[[], Any]) -> Any:
+        return await run_sync(self._call, fn)
+
+    def _rows(self, table: str) -> List[dict]:
+        return self.tables.setdefault(table, [])
+
+    def _find(self, table: str, row: dict, key: Tuple[str, ...]) -> Optional[dict]:
+        if any(row.get(column) is None for column in key):
+            return None
+        return next(
+            (existing for existing in self._rows(table) if all(existing.get(c) == row.get(c) for c in key)),
+            None,
+        )
+
+    def _new_row(self, table: str, row: dict) -> dict:
+        new_row = {"id": str(uuid.uuid4()), **copy.deepcopy(TABLE_DEFAULTS.get(table, {})), "created_at": _now()}
+        new_row.update(copy.deepcopy(row))
+        return new_row
+
+    def _insert(self, table: str, rows: List[dict]) -> List[dict]:
+        new_rows = [self._new_row(table, row) for row in rows]
+        for key in TABLE_KEYS.get(table, [("id",)]):
+            seen = set()
+            for row in new_rows:
+                value = tuple(row.get(column) for column in key)
+                if value in seen or self._find(table, row, key) is not None:
+                    raise DuplicateKey(f"duplicate key value violates unique constraint on {table} {key}")
+                seen.add(value)
+        self._rows(table).extend(new_rows)
+        return new_rows
+
+    async def select(self, table, where=(), columns="*", order=(), limit=None, offset=0):
+        def run() -> List[dict]:
+            rows = [row for row in self._rows(table) if _matches(row, where)]
+            for column, descending in reversed(list(order)):
+                # NULLs sort last ascending and first descending, like Postgres
+                rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=descending)
+            rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+            if columns.strip() == "*":
+                return rows
+            return [{column: row.get(column) for column in _columns(columns)} for row in rows]
+
+        return await self._run(run)
+
+    async def insert(self, table, rows):
+        return await self._run(lambda: self._insert(table, rows))
+
+    async def upsert(self, table, rows, on_conflict="id", ignore_duplicates=False):
+        key = tuple(_columns(on_conflict))
+
+        def run() -> List[dict]:
+            written = []
+            for row in rows:
+                existing = self._find(table, row, key)
+                if existing is None:
+                    written.extend(self._insert(table, [row]))
+                elif not ignore_duplicates:
+                    existing.update(copy.deepcopy(row))
+                    written.append(existing)
+            return written
+
+        return await self._run(run)
+
+    async def update(self, table, values, where):
+        def run() -> List[dict]:
+            rows = [row for row in self._rows(table) if _matches(row, where)]
+            for row in rows:
+                row.update(copy.deepcopy(values))
+            return rows
+
+        return await self._run(run)
+
+    async def delete(self, table, where):
+        def run() -> List[dict]:
+            deleted = [row for row in self._rows(table) if _matches(row, where)]
+            self.tables[table] = [row for row in self._rows(table) if not _matches(row, where)]
+            return deleted
+
+        return await self._run(run)
+
+    async def rpc(self, name, params):
+        if name not in self.functions:
+            raise ValueError(f"Unknown database function: {name}")
+        return await self._run(lambda: self.functions[name](**params))
+
+    # Python versions of the SQL functions in docs/database-architecture.md
+
+    def _increment_daily_metrics(self, p_user_id, p_date, p_calories_in=0, p_calories_out=0, p_water_ml=0) -> List[dict]:
+        row = self._find("daily_logs", {"user_id": p_user_id, "date": p_date}, ("user_id", "date"))
+        if row is None:
+            row = self._insert("daily_logs", [{"user_id": p_user_id, "date": p_date}])[0]
+        row["calories_in"] = max((row.get("calories_in") or 0) + p_calories_in, 0)
+        row["calories_out"] = max((row.get("calories_out") or 0) + p_calories_out, 0)
+        row["water_ml"] = max((row.get("water_ml") or 0) + p_water_ml, 0)
+        row["updated_at"] = _now()
+        return [row]
+
+    def _trim_chat_messages(self, p_user_id, p_keep=50) -> List[int]:
+        mine = sorted(
+            (row for row in self._rows("chat_messages") if row.get("user_id") == p_user_id),
+            key=lambda row: row["created_at"],
+            reverse=True,
+        )
+        stale = {id(row) for row in mine[p_keep:]}
+        self.tables["chat_messages"] = [row for row in self._rows("chat_messages") if id(row) not in stale]
+        return [len(stale)]
+
+    def _purge_llm_result_cache(self, p_max_rows=2000) -> List[int]:
+        now = _now()
+        rows = self._rows("llm_result_cache")
+        live = sorted((row for row in rows if row["expires_at"] > now), key=lambda row: row["created_at"], reverse=True)
+        self.tables["llm_result_cache"] = live[:p_max_rows]
+        return [len(rows) - len(self.tables["llm_result_cache"])]
+
+    def _claim_analysis_job(self, p_worker_id, p_lease_seconds=60, p_max_attempts=3) -> List[dict]:
+        now = _now()
+
+        def lease_expired(job: dict) -> bool:
+            return job["status"] == "running" and job.get("lease_expires_at") is not None and job["lease_expires_at"] <= now
+
+        jobs = self._rows("analysis_jobs")
+        for job in jobs:
+            if lease_expired(job) and job["attempts"] >= p_max_attempts:
+                job.update(status="failed", input=None, worker_id=None, lease_expires_at=None, updated_at=now,
+                           error={"detail": f"Job abandoned after {job['attempts']} attempts", "status": 500})
+        runnable = [
+            job for job in jobs
+            if (job["status"] == "queued" and (job.get("available_at") or now) <= now) or lease_expired(job)
+        ]
+        if not runnable:
+            return []
+        job = min(runnable, key=lambda job: job["created_at"])
+        lease_expires_at = (datetime.now(timezone.utc) + timedelta(seconds=p_lease_seconds)).isoformat()
+        job.update(status="running", worker_id=p_worker_id, attempts=job["attempts"] + 1,
+                   lease_expires_at=lease_expires_at, updated_at=now)
+        return [job]
+
+
+def create_store() -> TableStore:
+    """Build the store configured by DATABASE_BACKEND."""
+    backend_name = settings.database_backend.lower()
+    if backend_name == "supabase":
+        return SupabaseStore()
+    if backend_name == "postgres":
+        return PostgresStore()
+    if backend_name == "memory":
+        return MemoryStore(settings.memory_db_latency_ms / 1000)
+    raise ValueError(f"Unknown DATABASE_BACKEND: {settings.database_backend}")
+
+
+store = create_store()
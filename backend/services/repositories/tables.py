@@ -0,0 +1,296 @@
+"""
+One repository per table: the reads and writes the routes and services make,
+by name, on top of the configured store (stores.py).
+
+The store is looked up on every call rather than captured, so a benchmark
+can swap in `stores.store = MemoryStore(latency)` after import.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from services.repositories import stores
+from services.repositories.stores import Condition, TableStore
+
+# Stable newest-first order; `id` breaks created_at ties so keyset pages never overlap
+NEWEST_FIRST = [("created_at", True), ("id", True)]
+
+
+def _older_than(keyset: Optional[Tuple[str, str]]) -> List[Condition]:
+    """Keyset filter for rows before (created_at, id) `keyset` in NEWEST_FIRST order (none when None)."""
+    return [(("created_at", "id"), "lt", keyset)] if keyset else []
+
+
+def _in(seconds: float) -> str:
+    """UTC timestamp `seconds` from now (negative for the past)."""
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def increment_params(
+    user_id: str,
+    calories_in: int = 0,
+    calories_out: int = 0,
+    water_ml: int = 0,
+    log_date: Optional[str] = None,
+) -> dict:
+    """Arguments of the `increment_daily_metrics` function."""
+    return {
+        "p_user_id": user_id,
+        "p_date": log_date or date.today().isoformat(),
+        "p_calories_in": int(calories_in),
+        "p_calories_out": int(calories_out),
+        "p_water_ml": int(water_ml),
+    }
+
+
+class TableRepository:
+    table = ""
+    # Named projections for the API's `fields` parameter: "detail" is the full row
+    views: Dict[str, str] = {"detail": "*"}
+
+    @property
+    def store(self) -> TableStore:
+        return stores.store
+
+    def project(self, row: dict, view: str) -> dict:
+        """`row` cut down to the columns of `view`, for rows that were not read through it."""
+        columns = self.views[view]
+        if columns.strip() == "*":
+            return row
+        return {column.strip(): row.get(column.strip()) for column in columns.split(",")}
+
+    async def _first(self, where, columns: str = "*") -> Optional[dict]:
+        rows = await self.store.select(self.table, where, columns=columns, limit=1)
+        return rows[0] if rows else None
+
+    async def insert(self, rows: List[dict]) -> List[dict]:
+        return await self.store.insert(self.table, rows)
+
+
+class ProfileRepository(TableRepository):
+    table = "profiles"
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        return await self._first([("id", "eq", user_id)])
+
+    async def upsert(self, row: dict) -> Optional[dict]:
+        rows = await self.store.upsert(self.table, [row])
+        return rows[0] if rows else None
+
+    async def update(self, user_id: str, values: dict) -> List[dict]:
+        return await self.store.update(self.table, values, [("id", "eq", user_id)])
+
+
+class DailyLogRepository(TableRepository):
+    table = "daily_logs"
+    views = {
+        "list": "id, date, calories_in, calories_out, water_ml, steps, active_minutes",
+        "detail": "*",
+    }
+
+    async def get(self, user_id: str, log_date: str, columns: str = "*") -> Optional[dict]:
+        return await self._first([("user_id", "eq", user_id), ("date", "eq", log_date)], columns=columns)
+
+    async def list_range(self, user_id: str, start: str, end: Optional[str] = None, columns: str = "*") -> List[dict]:
+        """Logs from `start` (to `end`) inclusive, oldest first."""
+        where = [("user_id", "eq", user_id), ("date", "gte", start)]
+        if end:
+            where.append(("date", "lte", end))
+        return await self.store.select(self.table, where, columns=columns, order=[("date", False)])
+
+    async def create_if_missing(self, row: dict) -> Optional[dict]:
+        """Insert the day's log unless one exists (unique on user_id, date); the new row, or None."""
+        rows = await self.store.upsert(self.table, [row], on_conflict="user_id,date", ignore_duplicates=True)
+        return rows[0] if rows else None
+
+    async def update(self, log_id: str, values: dict) -> List[dict]:
+        return await self.store.update(self.table, values, [("id", "eq", log_id)])
+
+    async def increment(self, user_id: str, calories_in: int = 0, calories_out: int = 0, water_ml: int = 0,
+                        log_date: Optional[str] = None) -> Optional[dict]:
+        """Atomically add deltas to a day's counters; the updated row."""
+        rows = await self.store.rpc(
+            "increment_daily_metrics", increment_params(user_id, calories_in, calories_out, water_ml, log_date)
+        )
+        return rows[0] if rows else None
+
+    async def delete_before(self, user_id: str, cutoff_date: str) -> List[dict]:
+        return await self.store.delete(self.table, [("user_id", "eq", user_id), ("date", "lt", cutoff_date)])
+
+
+class MealHistoryRepository(TableRepository):
+    table = "meal_history"
+    # Lists skip the long reasoning, ingredients and image_description texts
+    views = {
+        "list": "id, food_name, calories, macros, plate_grade, source, created_at",
+        "detail": "*",
+    }
+
+    async def get(self, user_id: str, meal_id: str) -> Optional[dict]:
+        return await self._first([("id", "eq", meal_id), ("user_id", "eq", user_id)])
+
+    async def delete(self, meal_id: str) -> List[dict]:
+        return await self.store.delete(self.table, [("id", "eq", meal_id)])
+
+    async def list_recent(self, user_id: str, since: Optional[str] = None, limit: Optional[int] = None,
+                          offset: int = 0, columns: str = "*",
+                          older_than: Optional[Tuple[str, str]] = None) -> List[dict]:
+        """The user's meals, newest first; optionally only those logged since `since` and past `older_than`."""
+        where = [("user_id", "eq", user_id)] + _older_than(older_than)
+        if since:
+            where.append(("created_at", "gte", since))
+        return await self.store.select(
+            self.table, where, columns=columns, order=NEWEST_FIRST, limit=limit, offset=offset
+        )
+
+    async def delete_before(self, user_id: str, cutoff: str) -> List[dict]:
+        return await self.store.delete(self.table, [("user_id", "eq", user_id), ("created_at", "lt", cutoff)])
+
+
+class BurnTaskRepository(TableRepository):
+    table = "burn_tasks"
+    views = {
+        "list": "id, meal_id, task_type, name, duration_minutes, calories_to_burn, steps, status, created_at",
+        "detail": "*",
+    }
+
+    async def get(self, user_id: str, task_id: str) -> Optional[dict]:
+        return await self._first([("id", "eq", task_id), ("user_id", "eq", user_id)])
+
+    async def for_meal(self, meal_id: str) -> List[dict]:
+        return await self.store.select(self.table, [("meal_id", "eq", meal_id)])
+
+    async def list_by_status(self, user_id: str, status: str, since: str, limit: Optional[int] = None,
+                             older_than: Optional[Tuple[str, str]] = None, columns: str = "*") -> List[dict]:
+        """The user's tasks in `status` created since `since` (and past `older_than`), newest first."""
+        where = [("user_id", "eq", user_id), ("status", "eq", status), ("created_at", "gte", since)]
+        return await self.store.select(
+            self.table, where + _older_than(older_than), columns=columns, order=NEWEST_FIRST, limit=limit
+        )
+
+    async def update(self, task_id: str, values: dict) -> List[dict]:
+        return await self.store.update(self.table, values, [("id", "eq", task_id)])
+
+    async def delete(self, task_id: str) -> List[dict]:
+        return await self.store.delete(self.table, [("id", "eq", task_id)])
+
+    async def delete_for_meal(self, meal_id: str) -> List[dict]:
+        return await self.store.delete(self.table, [("meal_id", "eq", meal_id)])
+
+
+class ChatMessageRepository(TableRepository):
+    table = "chat_messages"
+
+    async def recent(self, user_id: str, limit: int, columns: str = "*",
+                     older_than: Optional[Tuple[str, str]] = None) -> List[dict]:
+        """The user's newest `limit` messages (past `older_than`), newest first."""
+        return await self.store.select(
+            self.table, [("user_id", "eq", user_id)] + _older_than(older_than), columns=columns,
+            order=NEWEST_FIRST, limit=limit
+        )
+
+    async def after(self, user_id: str, after: Optional[str], limit: int, columns: str = "*") -> List[dict]:
+        """Up to `limit` messages created after `after` (all when None), oldest first."""
+        where = [("user_id", "eq", user_id)]
+        if after:
+            where.append(("created_at", "gt", after))
+        return await self.store.select(
+            self.table, where, columns=columns, order=[("created_at", False)], limit=limit
+        )
+
+    async def trim(self, user_id: str, keep: int) -> None:
+        """Keep only the newest `keep` messages (one set-based DELETE)."""
+        await self.store.rpc("trim_chat_messages", {"p_user_id": user_id, "p_keep": keep})
+
+    async def delete_all(self, user_id: str) -> List[dict]:
+        return await self.store.delete(self.table, [("user_id", "eq", user_id)])
+
+    async def delete_before(self, user_id: str, cutoff: str) -> List[dict]:
+        return await self.store.delete(self.table, [("user_id", "eq", user_id), ("created_at", "lt", cutoff)])
+
+
+class ChatMemoryRepository(TableRepository):
+    table = "chat_memory"
+
+    async def get(self, user_id: str, columns: str = "*") -> Optional[dict]:
+        return await self._first([("user_id", "eq", user_id)], columns=columns)
+
+    async def save(self, row: dict) -> None:
+        await self.store.upsert(self.table, [row], on_conflict="user_id")
+
+    async def delete(self, user_id: str) -> None:
+        await self.store.delete(self.table, [("user_id", "eq", user_id)])
+
+
+class GroceryItemRepository(TableRepository):
+    table = "grocery_items"
+
+    async def add_missing(self, rows: List[dict]) -> List[dict]:
+        """Insert items not already on the user's list (unique on user_id, item_name)."""
+        return await self.store.upsert(self.table, rows, on_conflict="user_id,item_name", ignore_duplicates=True)
+
+
+class GoogleFitSyncRepository(TableRepository):
+    table = "google_fit_sync"
+
+    async def get(self, user_id: str, columns: str = "*") -> Optional[dict]:
+        return await self._first([("user_id", "eq", user_id)], columns=columns)
+
+    async def update(self, user_id: str, values: dict) -> List[dict]:
+        return await self.store.update(self.table, values, [("user_id", "eq", user_id)])
+
+
+class LLMResultCacheRepository(TableRepository):
+    table = "llm_result_cache"
+
+    async def get_live(self, key: str) -> Optional[dict]:
+        """The cached value for `key` unless it has expired."""
+        row = await self._first([("key", "eq", key), ("expires_at", "gt", _in(0))], columns="value")
+        return row["value"] if row else None
+
+    async def put(self, key: str, value: dict, ttl_seconds: float) -> None:
+        await self.store.upsert(self.table, [{"key": key, "value": value, "expires_at": _in(ttl_seconds)}], on_conflict="key")
+
+    async def purge(self, max_rows: int) -> None:
+        """Delete expired rows, then the oldest beyond `max_rows`."""
+        await self.store.rpc("purge_llm_result_cache", {"p_max_rows": max_rows})
+
+
+class AnalysisJobRepository(TableRepository):
+    table = "analysis_jobs"
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._first([("id", "eq", job_id)])
+
+    async def claim(self, worker_id: str, lease_seconds: int, max_attempts: int) -> Optional[dict]:
+        """Lease the oldest runnable job to `worker_id` (claim_analysis_job); None when there is none."""
+        rows = await self.store.rpc("claim_analysis_job", {
+            "p_worker_id": worker_id,
+            "p_lease_seconds": lease_seconds,
+            "p_max_attempts": max_attempts,
+        })
+        return rows[0] if rows else None
+
+    async def update_owned(self, job_id: str, worker_id: str, values: dict) -> List[dict]:
+        """Update the job only while `worker_id` still holds it; the updated rows."""
+        # The table's trigger sets updated_at too; the memory store has no triggers
+        return await self.store.update(
+            self.table,
+            {**values, "updated_at": _in(0)},
+            [("id", "eq", job_id), ("worker_id", "eq", worker_id), ("status", "eq", "running")],
+        )
+
+    async def delete_finished_before(self, statuses: List[str], cutoff: str) -> List[dict]:
+        return await self.store.delete(self.table, [("status", "in", statuses), ("updated_at", "lt", cutoff)])
+
+
+profiles = ProfileRepository()
+daily_logs = DailyLogRepository()
+meal_history = MealHistoryRepository()
+burn_tasks = BurnTaskRepository()
+chat_messages = ChatMessageRepository()
+chat_memory = ChatMemoryRepository()
+grocery_items = GroceryItemRepository()
+google_fit_sync = GoogleFitSyncRepository()
+llm_result_cache = LLMResultCacheRepository()
+analysis_jobs = AnalysisJobRepository()
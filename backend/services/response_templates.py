@@ -0,0 +1,192 @@
+"""
+Deterministic chat replies rendered from UI card data.
+
+After the agent runs tools, the card already shows the data - the reply only
+needs to confirm it. Each renderer picks a localized template for its card
+type and fills it from the card's `data`, so most tool turns need no second
+(synthesis) LLM call. How replies are produced is set by CHAT_RESPONSE_MODE:
+
+  - llm:      always ask the LLM to write the reply (one extra call per tool turn)
+  - template: always render templates; cards without one get a generic line
+  - hybrid:   render templates when every card has one, otherwise ask the LLM
+
+Card types in LLM_CARD_TYPES (errors) are worth an LLM reply in hybrid mode:
+the model can explain what went wrong and suggest what to do next.
+
+Languages are picked from the request's Accept-Language header; anything not
+in TEMPLATES falls back to CHAT_DEFAULT_LANGUAGE, then English.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+from config import settings
+
+TEMPLATES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "water": "Logged {added} ml of water 💧 You're at {total} ml of your {target} ml goal ({left} ml to go).",
+        "water_goal_met": "Logged {added} ml of water 💧 That's {total} ml today - you've hit your {target} ml goal!",
+        "summary": "Here's your day so far: {calories_in} kcal in, {calories_out} kcal burned - {remaining} kcal left of your {target} kcal target. Water is at {water} of {water_target} ml.",
+        "summary_over": "Here's your day so far: {calories_in} kcal in, {calories_out} kcal burned - {over} kcal over your {target} kcal target. Water is at {water} of {water_target} ml.",
+        "meal_log": "{food} comes to about {calories} kcal (grade {grade}). Tap Confirm & Log to save it.",
+        "meal_log_unknown": "I couldn't estimate {food} - tap Edit to add the details.",
+        "goal_update": "Ready to change your daily target from {current} to {new} kcal. Tap Apply to confirm.",
+        "recipe": "Here's a recipe for {name} - about {calories} kcal, ready in {cook_time} min.",
+        "recipe_short": "Here's a recipe for {name}.",
+        "meal_suggestions": "Here are {count} ideas for {meal_type} under {max_calories} kcal.",
+        "meal_suggestions_any": "Here are {count} meal ideas under {max_calories} kcal.",
+        "dynamic_ui": "Here's {title}.",
+        "error": "Sorry, something went wrong: {message}",
+        "generic": "Done! Take a look at the card above.",
+    },
+    "hi": {
+        "water": "{added} ml पानी दर्ज किया 💧 आज आप {target} ml के लक्ष्य में से {total} ml पर हैं ({left} ml बाकी)।",
+        "water_goal_met": "{added} ml पानी दर्ज किया 💧 आज {total} ml हो गया - आपने {target} ml का लक्ष्य पूरा कर लिया!",
+        "summary": "आज अब तक: {calories_in} kcal लिया, {calories_out} kcal बर्न किया - {target} kcal के लक्ष्य में से {remaining} kcal बाकी। पानी {water_target} ml में से {water} ml।",
+        "summary_over": "आज अब तक: {calories_in} kcal लिया, {calories_out} kcal बर्न किया - {target} kcal के लक्ष्य से {over} kcal ज़्यादा। पानी {water_target} ml में से {water} ml।",
+        "meal_log": "{food} लगभग {calories} kcal है (ग्रेड {grade})। सेव करने के लिए Confirm & Log दबाएँ।",
+        "meal_log_unknown": "मैं {food} का अनुमान नहीं लगा पाया - जानकारी जोड़ने के लिए Edit दबाएँ।",
+        "goal_update": "आपका दैनिक लक्ष्य {current} से {new} kcal करने के लिए तैयार। पुष्टि के लिए Apply दबाएँ।",
+        "recipe": "{name} की रेसिपी - लगभग {calories} kcal, {cook_time} मिनट में तैयार।",
+        "recipe_short": "{name} की रेसिपी यह रही।",
+        "meal_suggestions": "{meal_type} के लिए {max_calories} kcal से कम के {count} सुझाव।",
+        "meal_suggestions_any": "{max_calories} kcal से कम के {count} भोजन सुझाव।",
+        "dynamic_ui": "{title} यह रहा।",
+        "error": "माफ़ कीजिए, कुछ गड़बड़ हो गई: {message}",
+        "generic": "हो गया! ऊपर कार्ड देखें।",
+    },
+}
+
+# Card types whose reply is better written by the LLM in hybrid mode
+LLM_CARD_TYPES = {"error"}
+
+RESPONSE_MODES = ("llm", "template", "hybrid")
+
+
+def _water_card(data: dict) -> Tuple[str, dict]:
+    total = data.get("total_water_ml", 0)
+    target = data.get("water_target_ml", 2500)
+    values = {
+        "added": data.get("amount_added_ml", 0),
+        "total": total,
+        "target": target,
+        "left": max(target - total, 0),
+    }
+    return ("water_goal_met" if total >= target else "water"), values
+
+
+def _daily_summary_card(data: dict) -> Tuple[str, dict]:
+    values = {
+        "calories_in": data.get("calories_in", 0),
+        "calories_out": data.get("calories_out", 0),
+        "remaining": data.get("calories_remaining", 0),
+        "over": max(data.get("net_calories", 0) - data.get("calorie_target", 0), 0),
+        "target": data.get("calorie_target", 0),
+        "water": data.get("water_ml", 0),
+        "water_target": data.get("water_target_ml", 0),
+    }
+    return ("summary_over" if data.get("is_over_budget") else "summary"), values
+
+
+def _meal_log_card(data: dict) -> Tuple[str, dict]:
+    food = data.get("food_name") or data.get("food_description", "")
+    if data.get("error") or data.get("needs_estimation"):
+        return "meal_log_unknown", {"food": food}
+    return "meal_log", {
+        "food": food,
+        "calories": data.get("calories", 0),
+        "grade": data.get("plate_grade", "B"),
+    }
+
+
+def _goal_update_card(data: dict) -> Tuple[str, dict]:
+    return "goal_update", {
+        "current": data.get("current_target", 0),
+        "new": data.get("new_target", 0),
+    }
+
+
+def _recipe_card(data: dict) -> Tuple[str, dict]:
+    values = {
+        "name": data.get("name", ""),
+        "calories": data.get("calories", 0),
+        "cook_time": data.get("cook_time", 0),
+    }
+    return ("recipe" if values["calories"] and values["cook_time"] else "recipe_short"), values
+
+
+def _meal_suggestions_card(data: dict) -> Tuple[str, dict]:
+    meal_type = (data.get("meal_type") or "Any").lower()
+    values = {
+        "count": len(data.get("suggestions") or []),
+        "meal_type": meal_type,
+        "max_calories": data.get("max_calories", 0),
+    }
+    return ("meal_suggestions_any" if meal_type == "any" else "meal_suggestions"), values
+
+
+def _dynamic_ui_card(data: dict) -> Tuple[str, dict]:
+    return "dynamic_ui", {"title": data.get("title", "")}
+
+
+def _error_card(data: dict) -> Tuple[str, dict]:
+    return "error", {"message": data.get("message", "")}
+
+
+RENDERERS: Dict[str, Callable[[dict], Tuple[str, dict]]] = {
+    "water_card": _water_card,
+    "daily_summary_card": _daily_summary_card,
+    "meal_log_card": _meal_log_card,
+    "goal_update_card": _goal_update_card,
+    "recipe_card": _recipe_card,
+    "meal_suggestions_card": _meal_suggestions_card,
+    "dynamic_ui_card": _dynamic_ui_card,
+    "error": _error_card,
+}
+
+
+def resolve_language(accept_language: Optional[str]) -> str:
+    """First supported language in an Accept-Language header (q-values are ignored)."""
+    for part in (accept_language or "").split(","):
+        code = part.split(";")[0].strip().lower().split("-")[0]
+        if code in TEMPLATES:
+            return code
+    return settings.chat_default_language if settings.chat_default_language in TEMPLATES else "en"
+
+
+def render_card(card: dict, language: str = "en") -> Optional[str]:
+    """Reply line for one card, or None if its type has no template."""
+    renderer = RENDERERS.get(card.get("card_type"))
+    if renderer is None:
+        return None
+    key, values = renderer(card.get("data") or {})
+    catalog = TEMPLATES.get(language, TEMPLATES["en"])
+    return catalog.get(key, TEMPLATES["en"][key]).format(**values)
+
+
+def render_cards(cards: List[dict], language: str = "en") -> Optional[str]:
+    """Reply text for a list of cards, or None if any card has no template."""
+    lines = []
+    for card in cards:
+        line = render_card(card, language)
+        if line is None:
+            return None
+        lines.append(line)
+    return " ".join(lines) if lines else None
+
+
+def template_reply(cards: List[dict], language: str = "en") -> Optional[str]:
+    """
+    Reply for a tool turn under CHAT_RESPONSE_MODE, or None when the LLM
+    should write it (llm mode, no cards, or - in hybrid mode - a card type
+    without a template or listed in LLM_CARD_TYPES).
+    """
+    mode = settings.chat_response_mode
+    if mode == "llm" or not cards:
+        return None
+
+    if mode == "template":
+        catalog = TEMPLATES.get(language, TEMPLATES["en"])
+        return " ".join(render_card(card, language) or catalog["generic"] for card in cards)
+
+    if any(card.get("card_type") in LLM_CARD_TYPES for card in cards):
+        return None
+    return render_cards(cards, language)
@@ -0,0 +1,43 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When a call with the same key is already in flight, later callers await the
+first call's result instead of starting their own. Nothing is remembered once
+the call finishes - this only deduplicates concurrent work (double taps, app
+retries while the first request is still running). Results that should
+outlive the call belong in a cache.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from services.metrics import metrics
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` unless a call for `key` is in flight; either way return its result."""
+        future = self._calls.get(key)
+        if future is not None:
+            print(f"[DEBUG] Joined in-flight {self.name} call")
+            metrics.incr(f"singleflight.{self.name}.shared")
+        else:
+            metrics.incr(f"singleflight.{self.name}.calls")
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shielded so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()  # Mark retrieved even if every caller went away
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,229 @@
+"""
+Schema-validated JSON from Gemini analysis calls.
+
+With GEMINI_STRUCTURED_OUTPUT on, meal/menu/pantry calls ask Gemini for JSON
+matching a Pydantic model (`generation_config(model)`: JSON mime type plus
+a response schema). Either way, `parse_structured` turns the reply into a
+dict the routes can use:
+
+  1. extract: the first complete JSON object in the text - code fences and
+     prose before or after it are ignored - validated against the model;
+  2. local repair: trailing commas, Python literals, raw newlines in strings
+     and a truncated tail (unclosed strings/brackets) are fixed in-process;
+  3. LLM repair (GEMINI_JSON_REPAIR): one small text-only call gets the
+     broken reply, the errors and the schema. The image is not sent again,
+     so a bad reply no longer costs a second vision call or a re-upload.
+
+Counters `llm_parse.<kind>.responses|failures|repaired|repair_failed` and
+gauges `llm_parse.<kind>.failure_rate|repair_rate` are served at /metrics.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Type
+
+import google.generativeai as genai
+from pydantic import BaseModel, ValidationError
+
+from config import settings
+from services.llm_clients import get_gemini_model
+from services.llm_resilience import call_llm
+from services.metrics import metrics
+
+# Schema keywords Gemini's response schema understands; everything else
+# (titles, defaults, additionalProperties) is dropped
+GEMINI_SCHEMA_KEYS = ("type", "enum", "nullable")
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+REPAIR_PROMPT = """The text below should be a JSON object matching this JSON schema, but it is not valid: {problem}
+
+Schema:
+{schema}
+
+Text:
+{text}
+
+Return only the corrected JSON object. Keep every value from the text as it is; only fix the syntax and fill
+missing required fields with sensible values derived from the rest of the text."""
+
+
+# --- Schemas ---
+
+def _gemini_node(node: dict, defs: dict) -> dict:
+    if "$ref" in node:
+        node = {**defs[node["$ref"].rsplit("/", 1)[-1]], **{k: v for k, v in node.items() if k != "$ref"}}
+    if "anyOf" in node:
+        # Optional[X] -> X with nullable
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        rest = {k: v for k, v in node.items() if k != "anyOf"}
+        out = _gemini_node({**options[0], **rest}, defs)
+        if len(options) < len(node["anyOf"]):
+            out["nullable"] = True
+        return out
+
+    out = {k: v for k, v in node.items() if k in GEMINI_SCHEMA_KEYS}
+    if "items" in node:
+        out["items"] = _gemini_node(node["items"], defs)
+    if "properties" in node:
+        out["properties"] = {name: _gemini_node(prop, defs) for name, prop in node["properties"].items()}
+        if node.get("required"):
+            out["required"] = list(node["required"])
+    return out
+
+
+@lru_cache(maxsize=None)
+def gemini_schema(model: Type[BaseModel]) -> dict:
+    """
+    `model`'s JSON schema in the subset Gemini accepts: refs inlined, Optional
+    as nullable. (google-generativeai's own conversion keeps `default`, which
+    the API rejects.)
+    """
+    schema = model.model_json_schema()
+    return _gemini_node(schema, schema.get("$defs", {}))
+
+
+def generation_config(model: Type[BaseModel]) -> genai.GenerationConfig:
+    """Gemini JSON mode constrained to `model`'s schema."""
+    return genai.GenerationConfig(response_mime_type="application/json", response_schema=gemini_schema(model))
+
+
+# --- Extraction and local repair ---
+
+def extract_json(text: str) -> dict:
+    """The first complete JSON object in `text`; raises ValueError when there is none."""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"\{", text or ""):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    raise ValueError("no JSON object in the response")
+
+
+def _close(out: list, closer: str) -> None:
+    """Append `closer` after dropping a trailing comma or a key left without a value."""
+    tail = "".join(out).rstrip()
+    tail = re.sub(r'[,{]\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', lambda m: m.group(0)[0], tail) if closer == "}" else tail
+    tail = re.sub(r",\s*$", "", tail)
+    out[:] = [tail, closer]
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort syntax repair of the first JSON object in `text`: trailing
+    commas, True/False/None, raw newlines inside strings, and a reply cut off
+    mid-way (open strings and brackets are closed).
+    """
+    start = (text or "").find("{")
+    if start < 0:
+        return text or ""
+
+    out = []
+    stack = []
+    in_string = escaped = False
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            _close(out, stack.pop())
+            if not stack:
+                break  # End of the object; anything after it is prose
+        elif ch.isalpha():
+            word = re.match(r"\w+", text[i:]).group(0)
+            out.append(PYTHON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if in_string:
+        out.append('"')
+    while stack:
+        _close(out, stack.pop())
+    return "".join(out)
+
+
+# --- Parsing ---
+
+def _validate(model: Type[BaseModel], data: dict) -> dict:
+    # Fields Gemini left out stay out, so the routes' own fallbacks still apply
+    return model.model_validate(data).model_dump(exclude_unset=True)
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in e['loc']) or 'response'}: {e['msg']}" for e in error.errors()[:5]
+        )
+    return str(error)
+
+
+def _update_rates(kind: str) -> None:
+    prefix = f"llm_parse.{kind}"
+    metrics.set_gauge(f"{prefix}.failure_rate", metrics.ratio(f"{prefix}.failures", f"{prefix}.responses"))
+    metrics.set_gauge(f"{prefix}.repair_rate", metrics.ratio(f"{prefix}.repaired", f"{prefix}.failures"))
+
+
+async def _llm_repair(kind: str, text: str, model: Type[BaseModel], error: Exception) -> dict:
+    prompt = REPAIR_PROMPT.format(
+        problem=_describe(error),
+        schema=json.dumps(gemini_schema(model)),
+        text=text,
+    )
+    response = await call_llm(f"{kind}_repair", lambda: get_gemini_model().generate_content_async(
+        prompt, generation_config=generation_config(model)
+    ))
+    return _validate(model, extract_json(response.text))
+
+
+async def parse_structured(kind: str, text: str, model: Type[BaseModel]) -> dict:
+    """Gemini reply `text` as a dict validated against `model`, repairing it if needed."""
+    metrics.incr(f"llm_parse.{kind}.responses")
+    try:
+        result = _validate(model, extract_json(text))
+        _update_rates(kind)
+        return result
+    except ValueError as e:  # JSON and validation errors alike
+        error = e
+
+    metrics.incr(f"llm_parse.{kind}.failures")
+    print(f"[WARN] {kind} response failed to parse ({_describe(error)}), repairing")
+    try:
+        try:
+            result = _validate(model, extract_json(repair_json(text)))
+            metrics.incr(f"llm_parse.{kind}.repaired_locally")
+        except ValueError as e:
+            if not settings.gemini_json_repair:
+                raise
+            result = await _llm_repair(kind, text, model, e)
+    except Exception:
+        metrics.incr(f"llm_parse.{kind}.repair_failed")
+        _update_rates(kind)
+        raise
+
+    metrics.incr(f"llm_parse.{kind}.repaired")
+    _update_rates(kind)
+    return result
@@ -0,0 +1,112 @@
+"""
+Per-user context snapshot: the profile row and today's daily_logs row.
+
+Almost every request needs one or both of these rows - the chat prompt, the
+agent tools, meal analysis personalization, menu suggestions. A UserContext
+loads each row at most once per request (FastAPI caches the `get_user_context`
+dependency for the duration of a request), and sits in front of a process-wide
+TTL cache so back-to-back requests from the same user reuse the rows too.
+
+Write paths that touch either row must keep the snapshot honest, either with
+`set_profile()` / `set_daily_log()` when the fresh row is at hand, or with
+`invalidate()` otherwise.
+"""
+
+import asyncio
+from datetime import date
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Depends
+from config import settings
+from services.auth import get_user_id
+from services.repositories import daily_logs, profiles
+from services.ttl_cache import TTLCache
+
+# Row snapshots shared by all requests in the process
+snapshot_cache = TTLCache(max_entries=10000)
+
+
+def _profile_key(user_id: str) -> Tuple:
+    return ("profile", user_id)
+
+
+def _daily_log_key(user_id: str, log_date: str) -> Tuple:
+    return ("daily_log", user_id, log_date)
+
+
+def invalidate_user_context(user_id: str, profile: bool = True, daily_log: bool = True) -> None:
+    """Drop cached snapshots for a user (today's daily log only)."""
+    if profile:
+        snapshot_cache.pop(_profile_key(user_id))
+    if daily_log:
+        snapshot_cache.pop(_daily_log_key(user_id, date.today().isoformat()))
+
+
+class UserContext:
+    """
+    Lazily loaded profile + today's daily log for one user.
+
+    Both getters return `{}` when the row does not exist yet. The returned dicts
+    are copies - mutate them freely.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.date = date.today().isoformat()
+        self._loads: Dict[str, asyncio.Future] = {}
+
+    async def _load(self, name: str, key: Tuple, loader: Callable[[], Awaitable[Optional[dict]]]) -> dict:
+        # Request-scoped memo - concurrent callers share one in-flight load.
+        # Shielded so a caller that times out does not cancel it for the others.
+        if name not in self._loads:
+            self._loads[name] = asyncio.ensure_future(self._fetch(key, loader))
+        return dict(await asyncio.shield(self._loads[name]))
+
+    async def _fetch(self, key: Tuple, loader: Callable[[], Awaitable[Optional[dict]]]) -> dict:
+        cached = snapshot_cache.get(key)
+        if cached is not None:
+            return cached
+        row = await loader() or {}
+        snapshot_cache.set(key, row, settings.user_context_ttl_seconds)
+        return row
+
+    async def get_profile(self) -> dict:
+        return await self._load(
+            "profile",
+            _profile_key(self.user_id),
+            lambda: profiles.get(self.user_id),
+        )
+
+    async def get_daily_log(self) -> dict:
+        return await self._load(
+            "daily_log",
+            _daily_log_key(self.user_id, self.date),
+            lambda: daily_logs.get(self.user_id, self.date),
+        )
+
+    def _store(self, name: str, key: Tuple, row: dict) -> None:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(dict(row))
+        self._loads[name] = future
+        snapshot_cache.set(key, dict(row), settings.user_context_ttl_seconds)
+
+    def set_profile(self, row: dict) -> None:
+        """Replace the snapshot with a freshly written profile row."""
+        self._store("profile", _profile_key(self.user_id), row)
+
+    def set_daily_log(self, row: dict) -> None:
+        """Replace the snapshot with a freshly written daily_logs row for today."""
+        if row.get("date", self.date) == self.date:
+            self._store("daily_log", _daily_log_key(self.user_id, self.date), row)
+
+    def invalidate(self, profile: bool = True, daily_log: bool = True) -> None:
+        """Forget the snapshot after a write whose resulting row is not at hand."""
+        if profile:
+            self._loads.pop("profile", None)
+        if daily_log:
+            self._loads.pop("daily_log", None)
+        invalidate_user_context(self.user_id, profile=profile, daily_log=daily_log)
+
+
+def get_user_context(user_id: str = Depends(get_user_id)) -> UserContext:
+    """FastAPI dependency - one UserContext per request."""
+    return UserContext(user_id)
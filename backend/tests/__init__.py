@@ -0,0 +1,10 @@
+# Backend Tests
+#
+# Run from backend/: python -m unittest discover -s tests -t .
+
+import os
+
+# config.Settings needs these before any service is imported
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test")
+os.environ.setdefault("GEMINI_API_KEY", "test")
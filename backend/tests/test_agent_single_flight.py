@@ -0,0 +1,37 @@
+"""A double-tapped chat message runs the agent once and saves the turn once."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from services import agent_service
+
+
+class ChatWithAgentSingleFlightTest(unittest.TestCase):
+    def test_joined_calls_share_the_result_and_save_once(self):
+        runs, saved = [], []
+
+        async def run_agent(*args):
+            runs.append(args)
+            await asyncio.sleep(0.05)
+            return {"response": "Logged 250 ml of water", "ui_cards": [], "actions_taken": ["log_water"]}
+
+        async def save(result):
+            saved.append(result)
+
+        async def double_tap():
+            return await asyncio.gather(*[
+                agent_service.chat_with_agent("log a glass of water", "user-1", {}, [], {}, [], on_result=save)
+                for _ in range(2)
+            ])
+
+        with mock.patch.object(agent_service, "_run_agent", run_agent):
+            first, second = asyncio.run(double_tap())
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(len(saved), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
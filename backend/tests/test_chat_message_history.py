@@ -0,0 +1,41 @@
+"""Chat history with a rolling summary still converts to a valid Gemini request."""
+
+import unittest
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_google_genai.chat_models import _parse_chat_history
+
+from services import agent_service, langchain_chat
+from services.chat_memory import build_prompt_history
+
+
+class MessageHistoryWithSummaryTest(unittest.TestCase):
+    def setUp(self):
+        rows = [
+            {"role": "user", "content": "I had poha for breakfast"},
+            {"role": "assistant", "content": "Nice, logged it!"},
+        ]
+        self.history = build_prompt_history(rows, "User is vegetarian and training for a 10k.")
+
+    def test_summary_is_folded_into_the_system_prompt(self):
+        for module in (agent_service, langchain_chat):
+            with self.subTest(module=module.__name__):
+                messages = module.build_message_history(self.history, "You are Fit Buddy.")
+                messages.append(HumanMessage(content="What should I eat for lunch?"))
+
+                self.assertEqual(sum(isinstance(m, SystemMessage) for m in messages), 1)
+                self.assertIn("training for a 10k", messages[0].content)
+
+                system_instruction, contents = _parse_chat_history(messages)
+                self.assertIn("training for a 10k", system_instruction.parts[0].text)
+                self.assertEqual([content.role for content in contents], ["user", "model", "user"])
+
+    def test_history_without_summary(self):
+        history = build_prompt_history([{"role": "user", "content": "hi"}], None)
+        messages = agent_service.build_message_history(history, "You are Fit Buddy.")
+        self.assertEqual(messages[0].content, "You are Fit Buddy.")
+        _parse_chat_history(messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""The daily summary card degrades instead of failing when a context read fails."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from services import agent_tools
+from services.repositories import stores
+from services.repositories.stores import MemoryStore
+
+
+class FailingUserContext:
+    user_id = "user-1"
+
+    async def get_profile(self) -> dict:
+        raise ConnectionError("profile read failed")
+
+    async def get_daily_log(self) -> dict:
+        raise ConnectionError("daily log read failed")
+
+
+class DailySummaryCardTest(unittest.TestCase):
+    def test_failed_profile_and_daily_log_reads_fall_back(self):
+        with mock.patch.object(stores, "store", MemoryStore()):
+            card = asyncio.run(agent_tools.daily_summary_card(FailingUserContext()))
+
+        self.assertEqual(card["card_type"], "daily_summary_card")
+        self.assertEqual(card["data"]["calories_in"], 0)
+        self.assertEqual(card["data"]["calorie_target"], 2000)
+        self.assertEqual(card["data"]["water_target_ml"], 2500)
+
+
+if __name__ == "__main__":
+    unittest.main()
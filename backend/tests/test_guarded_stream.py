@@ -0,0 +1,65 @@
+"""guarded_stream: a stalled stream is timed out, trips the breaker and frees its slot."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from config import settings
+from services import llm_resilience
+from services.llm_resilience import CircuitBreaker, deadline_scope, guarded_stream
+from services.llm_scheduler import LLMOverloaded, llm_scheduler
+
+
+async def stream(*chunks, stall_after: bool = False):
+    for chunk in chunks:
+        yield chunk
+    if stall_after:
+        await asyncio.sleep(3600)
+
+
+class GuardedStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=30)
+        patches = (
+            mock.patch.object(llm_resilience, "circuit_breaker", self.breaker),
+            mock.patch.object(settings, "llm_call_timeout_seconds", 0.05),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def consume(self, source, deadline: float = 5):
+        chunks = []
+
+        async def run():
+            with deadline_scope(deadline):
+                async with guarded_stream("test", "user-1") as timed:
+                    async for chunk in timed(source):
+                        chunks.append(chunk)
+
+        try:
+            asyncio.run(run())
+        finally:
+            self.assertEqual(llm_scheduler._in_flight, 0)
+        return chunks
+
+    def test_complete_stream(self):
+        self.assertEqual(self.consume(stream("a", "b")), ["a", "b"])
+        self.assertIsNone(self.breaker._opened_at)
+
+    def test_stalled_stream_is_a_provider_failure(self):
+        with self.assertRaises(LLMOverloaded) as raised:
+            self.consume(stream("a", stall_after=True))
+        self.assertEqual((raised.exception.status_code, raised.exception.reason), (503, "provider_error"))
+        self.assertIsNotNone(self.breaker._opened_at)
+
+    def test_stall_past_the_deadline_is_not_held_against_the_provider(self):
+        settings.llm_call_timeout_seconds = 5
+        with self.assertRaises(LLMOverloaded) as raised:
+            self.consume(stream("a", stall_after=True), deadline=0.05)
+        self.assertEqual((raised.exception.status_code, raised.exception.reason), (504, "deadline"))
+        self.assertIsNone(self.breaker._opened_at)
+
+
+if __name__ == "__main__":
+    unittest.main()
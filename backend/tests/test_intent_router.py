@@ -0,0 +1,71 @@
+"""Rule-based chat fast path: quantity parsing and what must fall through to the agent."""
+
+import unittest
+
+from services.intent_router import Intent, classify_intent, parse_quantity_ml
+
+
+class ParseQuantityTest(unittest.TestCase):
+    def test_units(self):
+        cases = [
+            ("500", "ml", 500),
+            ("250", "millilitres", 250),
+            ("1.5", "l", 1500),
+            ("2", "litres", 2000),
+            ("1", "ltr", 1000),
+            ("2", "glasses", 500),
+            ("3", "cups", 750),
+            ("1", "bottle", 500),
+        ]
+        for number, unit, expected in cases:
+            with self.subTest(number=number, unit=unit):
+                self.assertEqual(parse_quantity_ml(number, unit), expected)
+
+    def test_word_numbers(self):
+        self.assertEqual(parse_quantity_ml("a", "glass"), 250)
+        self.assertEqual(parse_quantity_ml("two", "bottles"), 1000)
+        self.assertEqual(parse_quantity_ml("half a", "litre"), 500)
+        self.assertEqual(parse_quantity_ml("half", "glass"), 125)
+
+    def test_unknown_number_or_unit(self):
+        self.assertIsNone(parse_quantity_ml("several", "glasses"))
+        self.assertIsNone(parse_quantity_ml("2", "spoons"))
+
+
+class ClassifyIntentTest(unittest.TestCase):
+    def test_water_messages(self):
+        cases = [
+            ("drank a glass of water", 250),
+            ("I just had 500ml water", 500),
+            ("Had 2 glasses of water today!", 500),
+            ("logged 1.5 L of water", 1500),
+            ("finished half a bottle of water", 250),
+            ("added three cups water now", 750),
+        ]
+        for message, amount_ml in cases:
+            with self.subTest(message=message):
+                self.assertEqual(classify_intent(message), Intent("log_water", {"amount_ml": amount_ml}))
+
+    def test_summary_messages(self):
+        for message in ("How am I doing?", "hey how's my day going", "What's my progress today", "show me my stats"):
+            with self.subTest(message=message):
+                self.assertEqual(classify_intent(message), Intent("get_daily_summary"))
+
+    def test_messages_left_to_the_agent(self):
+        for message in (
+            "I didn't drink a glass of water",          # negation
+            "should I drink 2 glasses of water?",       # question about water
+            "drank a glass of water and ate a samosa",  # extra content
+            "had a glass of milk",                      # not water
+            "drank 10 litres of water",                 # above MAX_WATER_ML
+            "had 20 ml water",                          # below MIN_WATER_ML
+            "had some water",                           # no quantity
+            "how am I doing with my protein?",          # summary plus a specific question
+            "",
+        ):
+            with self.subTest(message=message):
+                self.assertIsNone(classify_intent(message))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""StepwiseMealRepository on the memory store: undoing a half-logged meal and the log date."""
+
+import asyncio
+import unittest
+import uuid
+from datetime import date, timedelta
+from unittest import mock
+
+from services.repositories import stores, tables
+from services.repositories.meals import StepwiseMealRepository
+from services.repositories.stores import MemoryStore
+
+
+class StepwiseMealRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(stores, "store", MemoryStore())
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.repository = StepwiseMealRepository()
+        self.user_id = str(uuid.uuid4())
+        self.today = date.today().isoformat()
+
+    def meal(self) -> dict:
+        return {"id": str(uuid.uuid4()), "user_id": self.user_id, "food_name": "Dal and rice", "calories": 450}
+
+    def task(self, meal_id: str) -> dict:
+        return {"user_id": self.user_id, "meal_id": meal_id, "name": "Brisk walk", "calories_to_burn": 100}
+
+    def calories_in(self, log_date: str) -> int:
+        daily_log = asyncio.run(tables.daily_logs.get(self.user_id, log_date))
+        return daily_log["calories_in"] if daily_log else 0
+
+    def test_failed_step_is_undone_and_retry_logs_the_meal(self):
+        meal = self.meal()
+        for failing in ("increment", "tasks"):
+            with self.subTest(failing=failing):
+                target = tables.daily_logs if failing == "increment" else tables.burn_tasks
+                method = "increment" if failing == "increment" else "insert"
+                with mock.patch.object(target, method, side_effect=ConnectionError("lost")):
+                    with self.assertRaises(ConnectionError):
+                        asyncio.run(self.repository.log_meal(meal, [self.task(meal["id"])], self.today))
+
+                self.assertIsNone(asyncio.run(tables.meal_history.get(self.user_id, meal["id"])))
+                self.assertEqual(asyncio.run(self.repository.get_meal_tasks(meal["id"])), [])
+                self.assertEqual(self.calories_in(self.today), 0)
+
+        daily_log = asyncio.run(self.repository.log_meal(meal, [self.task(meal["id"])], self.today))
+        self.assertEqual(daily_log["calories_in"], 450)
+        self.assertEqual(len(asyncio.run(self.repository.get_meal_tasks(meal["id"]))), 1)
+
+    def test_delete_uses_the_log_date(self):
+        # A meal photo job that finishes after midnight logs to the upload day
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        meal = self.meal()
+        asyncio.run(self.repository.log_meal(meal, [], yesterday))
+        self.assertEqual(self.calories_in(yesterday), 450)
+
+        _, daily_log = asyncio.run(self.repository.delete_meal(self.user_id, meal["id"]))
+        self.assertEqual(daily_log["date"], yesterday)
+        self.assertEqual(self.calories_in(yesterday), 0)
+        self.assertEqual(self.calories_in(self.today), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
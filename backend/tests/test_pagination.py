@@ -0,0 +1,95 @@
+"""Keyset cursors: round-trips, paging without gaps or duplicates, and 400 for bad cursors."""
+
+import asyncio
+import base64
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from fastapi import HTTPException
+
+from services.pagination import decode_cursor, encode_cursor, split_page
+from services.repositories import stores
+from services.repositories.stores import MemoryStore
+from services.repositories.tables import chat_messages
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        row = {"created_at": "2024-05-01T10:15:30.123456+00:00", "id": uuid.uuid4()}
+        self.assertEqual(decode_cursor(encode_cursor(row)), (row["created_at"], str(row["id"])))
+
+    def test_first_page(self):
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor(""))
+
+    def test_malformed_or_tampered(self):
+        row_id = str(uuid.uuid4())
+        for cursor in (
+            "not a cursor!",                                                  # not base64
+            b64(b"\xff\xfe"),                                                 # not UTF-8
+            b64(b"[2024"),                                                    # not JSON
+            b64(b"42"),                                                       # not a pair
+            b64(json.dumps(["2024-05-01T10:15:30+00:00"]).encode()),          # one value
+            b64(json.dumps(["2024-05-01T10:15:30+00:00", row_id, 1]).encode()),
+            b64(json.dumps(["yesterday", row_id]).encode()),                  # bad timestamp
+            b64(json.dumps(["2024-05-01T10:15:30+00:00", "1 OR 1=1"]).encode()),  # bad id
+            b64(json.dumps([20240501, row_id]).encode()),                     # wrong type
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as raised:
+                    decode_cursor(cursor)
+                self.assertEqual(raised.exception.status_code, 400)
+
+
+class SplitPageTest(unittest.TestCase):
+    def test_last_page(self):
+        rows = [{"created_at": "2024-05-01T10:00:00+00:00", "id": str(uuid.uuid4())}]
+        self.assertEqual(split_page(rows, 2), (rows, None))
+
+    def test_more_rows(self):
+        rows = [{"created_at": f"2024-05-01T10:00:0{i}+00:00", "id": str(uuid.uuid4())} for i in (3, 2, 1)]
+        page, cursor = split_page(rows, 2)
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(cursor), (rows[1]["created_at"], rows[1]["id"]))
+
+
+class PagingTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(stores, "store", MemoryStore())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_pages_cover_every_row_once(self):
+        # Several rows share a timestamp, so the id has to break the ties
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": "user-1",
+                "role": "user",
+                "content": f"message {i}",
+                "created_at": f"2024-05-01T10:00:0{i // 3}+00:00",
+            }
+            for i in range(8)
+        ]
+        asyncio.run(stores.store.insert("chat_messages", rows))
+
+        seen, cursor = [], None
+        while True:
+            fetched = asyncio.run(chat_messages.recent("user-1", 3 + 1, older_than=decode_cursor(cursor)))
+            page, cursor = split_page(fetched, 3)
+            seen.extend(row["id"] for row in page)
+            if cursor is None:
+                break
+
+        expected = sorted(rows, key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        self.assertEqual(seen, [row["id"] for row in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Smoke test of PostgresMealRepository against a real Postgres database.
+
+Skipped unless POSTGRES_TEST_DATABASE_URL points at a disposable database;
+the migrations are applied to it first. Run from backend/:
+
+    POSTGRES_TEST_DATABASE_URL=postgresql://... python -m unittest tests.test_postgres_meal_repository
+"""
+
+import asyncio
+import os
+import unittest
+import uuid
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from config import settings
+from services.postgres import close_pool, fetch_all, run_transaction
+from services.repositories.meals import PostgresMealRepository
+
+TEST_DATABASE_URL = os.environ.get("POSTGRES_TEST_DATABASE_URL", "")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "POSTGRES_TEST_DATABASE_URL is not set")
+class PostgresMealRepositoryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from migrations.runner import apply_migrations
+
+        apply_migrations(TEST_DATABASE_URL)
+        # The pool is built from settings on first use
+        close_pool()
+        cls.database_url = mock.patch.object(settings, "database_url", TEST_DATABASE_URL)
+        cls.database_url.start()
+        cls.repository = PostgresMealRepository()
+
+    @classmethod
+    def tearDownClass(cls):
+        close_pool()
+        cls.database_url.stop()
+
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.today = date.today()
+
+    def tearDown(self):
+        self.run_sql("DELETE FROM burn_tasks WHERE user_id = %s", (self.user_id,))
+        self.run_sql("DELETE FROM meal_history WHERE user_id = %s", (self.user_id,))
+        self.run_sql("DELETE FROM daily_logs WHERE user_id = %s", (self.user_id,))
+
+    def run_sql(self, sql: str, params: tuple):
+        def execute(cursor):
+            cursor.execute(sql, params)
+            return fetch_all(cursor) if cursor.description else None
+
+        return asyncio.run(run_transaction(execute))
+
+    def meal(self, calories: int, **fields) -> dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": self.user_id,
+            "food_name": "Dal and rice",
+            "calories": calories,
+            "macros": {"p": 12, "c": 60, "f": 8},
+            "source": "text",
+            **fields,
+        }
+
+    def task(self, meal_id: str) -> dict:
+        return {
+            "user_id": self.user_id,
+            "meal_id": meal_id,
+            "task_type": "walk",
+            "name": "Brisk walk",
+            "duration_minutes": 20,
+            "calories_to_burn": 100,
+            "status": "pending",
+            "date": self.today.isoformat(),
+        }
+
+    def test_log_and_delete_meal(self):
+        meal = self.meal(450)
+        daily_log = asyncio.run(self.repository.log_meal(meal, [self.task(meal["id"])], self.today.isoformat()))
+        self.assertEqual(daily_log["calories_in"], 450)
+        self.assertEqual(daily_log["date"], self.today.isoformat())
+        self.assertEqual(len(asyncio.run(self.repository.get_meal_tasks(meal["id"]))), 1)
+
+        # Same id again: nothing is written
+        self.assertIsNone(asyncio.run(self.repository.log_meal(meal, [self.task(meal["id"])], self.today.isoformat())))
+
+        deleted_meal, daily_log = asyncio.run(self.repository.delete_meal(self.user_id, meal["id"]))
+        self.assertEqual(deleted_meal["id"], meal["id"])
+        self.assertEqual(daily_log["calories_in"], 0)
+        self.assertEqual(daily_log["date"], self.today.isoformat())
+        self.assertEqual(asyncio.run(self.repository.get_meal_tasks(meal["id"])), [])
+        self.assertIsNone(asyncio.run(self.repository.delete_meal(self.user_id, meal["id"])))
+
+    def test_delete_meal_logged_near_midnight(self):
+        # Logged just after and just before local midnight; with the server
+        # off UTC one of these falls on another UTC date than its log date
+        yesterday = self.today - timedelta(days=1)
+        for log_date, logged_at in (
+            (self.today, datetime.combine(self.today, time(0, 5))),
+            (yesterday, datetime.combine(yesterday, time(23, 55))),
+        ):
+            meal = self.meal(300, created_at=logged_at.astimezone().isoformat())
+            asyncio.run(self.repository.log_meal(meal, [], log_date.isoformat()))
+            _, daily_log = asyncio.run(self.repository.delete_meal(self.user_id, meal["id"]))
+            self.assertEqual(daily_log["date"], log_date.isoformat())
+            self.assertEqual(daily_log["calories_in"], 0)
+
+        rows = self.run_sql("SELECT date, calories_in FROM daily_logs WHERE user_id = %s ORDER BY date", (self.user_id,))
+        self.assertEqual(rows, [
+            {"date": yesterday.isoformat(), "calories_in": 0},
+            {"date": self.today.isoformat(), "calories_in": 0},
+        ])
+
+    def test_delete_meal_logged_to_an_earlier_day(self):
+        # A meal photo job that finishes after midnight logs to the upload day
+        yesterday = (self.today - timedelta(days=1)).isoformat()
+        meal = self.meal(300)
+        asyncio.run(self.repository.log_meal(meal, [], yesterday))
+        _, daily_log = asyncio.run(self.repository.delete_meal(self.user_id, meal["id"]))
+        self.assertEqual(daily_log["date"], yesterday)
+        self.assertEqual(daily_log["calories_in"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Extraction and local repair of Gemini JSON replies."""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from config import settings
+from models import MealAnalysisResult
+from services.structured_output import extract_json, parse_structured, repair_json
+
+MEAL = {
+    "food": "Dal and rice",
+    "total_calories": 450,
+    "plate_grade": "B",
+    "reasoning": "Balanced",
+    "macros": {"p": 12.5, "c": 60, "f": 8.2},
+    "items": [{"name": "Dal", "calories": 180.5, "quantity": "1 bowl"}],
+}
+
+
+class ExtractJsonTest(unittest.TestCase):
+    def test_fenced(self):
+        text = "```json\n" + json.dumps(MEAL, indent=2) + "\n```"
+        self.assertEqual(extract_json(text), MEAL)
+
+    def test_wrapped_in_prose(self):
+        text = "Here is the analysis: " + json.dumps(MEAL) + " Let me know if you need more! {not json}"
+        self.assertEqual(extract_json(text), MEAL)
+
+    def test_no_object(self):
+        with self.assertRaises(ValueError):
+            extract_json("Sorry, I can't see any food in this image.")
+
+
+class RepairJsonTest(unittest.TestCase):
+    def repaired(self, text: str):
+        return json.loads(repair_json(text))
+
+    def test_truncated_mid_string(self):
+        self.assertEqual(
+            self.repaired('{"food": "Dal", "items": [{"name": "Ri'),
+            {"food": "Dal", "items": [{"name": "Ri"}]},
+        )
+
+    def test_truncated_after_key_or_comma(self):
+        self.assertEqual(self.repaired('{"food": "Dal", "calories": 450, "macros": {"p": 12,'), {
+            "food": "Dal", "calories": 450, "macros": {"p": 12},
+        })
+        self.assertEqual(self.repaired('{"food": "Dal", "calories":'), {"food": "Dal"})
+
+    def test_fenced_with_trailing_commas_and_python_literals(self):
+        text = '```json\n{"dish_name": "Salad", "recommended": True, "notes": None, "tags": ["veg",],}\n```'
+        self.assertEqual(self.repaired(text), {"dish_name": "Salad", "recommended": True, "notes": None, "tags": ["veg"]})
+
+    def test_prose_and_raw_newlines(self):
+        text = 'Sure! {"description": "Walk\nbriskly", "steps": 2000} Hope this helps.'
+        self.assertEqual(self.repaired(text), {"description": "Walk\nbriskly", "steps": 2000})
+
+
+@mock.patch.object(settings, "gemini_json_repair", False)
+class ParseStructuredTest(unittest.TestCase):
+    def test_fractional_grams(self):
+        result = asyncio.run(parse_structured("test_meal", json.dumps(MEAL), MealAnalysisResult))
+        self.assertEqual(result["macros"], {"p": 12.5, "c": 60, "f": 8.2})
+        self.assertEqual(result["items"][0]["calories"], 180.5)
+
+    def test_truncated_reply_repaired_locally(self):
+        # Cut off inside the last item's quantity
+        text = "```json\n" + json.dumps(MEAL)[:-8]
+        result = asyncio.run(parse_structured("test_meal", text, MealAnalysisResult))
+        self.assertEqual(result["total_calories"], 450)
+        self.assertEqual(result["items"], [{"name": "Dal", "calories": 180.5, "quantity": "1 "}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Standalone worker for background meal analysis jobs.
+
+Runs the job worker pool without the HTTP API, for deployments where the API
+runs as serverless functions (vercel.json) that are frozen between requests.
+Point it at the shared queue (JOB_QUEUE_BACKEND=database) and set
+ANALYSIS_JOB_WORKERS=0 on the API.
+
+Usage (from backend/):
+    python worker.py --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+
+# Suppress noisy LangChain schema warnings
+logging.getLogger("langchain_google_genai").setLevel(logging.ERROR)
+
+from config import settings
+import routes.meals  # noqa: F401 - registers the meal_photo job handler
+from services.analysis_jobs import JobWorkerPool, job_queue
+from services.image_processing import shutdown_image_pool
+from services.llm_clients import warm_up
+from services.postgres import close_pool
+
+
+async def run(workers: int) -> None:
+    warm_up()
+    try:
+        await JobWorkerPool(job_queue, workers).run_forever()
+    finally:
+        shutdown_image_pool()
+        close_pool()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(settings.analysis_job_workers, 1))
+    args = parser.parse_args()
+
+    if settings.job_queue_backend.lower() == "memory":
+        print("[WARN] JOB_QUEUE_BACKEND=memory: this worker only sees jobs queued in its own process")
+    try:
+        asyncio.run(run(args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main_cli()